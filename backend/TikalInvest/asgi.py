@@ -1,17 +1,8 @@
 import os
 from django.core.asgi import get_asgi_application
-from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tikalinvest.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'TikalInvest.settings')
 
-django_asgi_app = get_asgi_application()
-
-application = ProtocolTypeRouter({
-    'http': django_asgi_app,
-    'websocket': AuthMiddlewareStack(
-        URLRouter([
-            # WebSocket URLs aquí
-        ])
-    ),
-})
+# Servido con uvicorn (ver infrastructure/docker-compose.yml): las vistas async y el
+# stream SSE de stocks necesitan un servidor ASGI
+application = get_asgi_application()
@@ -52,7 +52,7 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'tikalinvest.urls'
+ROOT_URLCONF = 'TikalInvest.urls'
 
 TEMPLATES = [
     {
@@ -70,8 +70,8 @@ TEMPLATES = [
     },
 ]
 
-WSGI_APPLICATION = 'tikalinvest.wsgi.application'
-ASGI_APPLICATION = 'tikalinvest.asgi.application'
+WSGI_APPLICATION = 'TikalInvest.wsgi.application'
+ASGI_APPLICATION = 'TikalInvest.asgi.application'
 
 # Database
 DATABASES = {
@@ -135,7 +135,8 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '100/hour',
-        'user': '1000/hour'
+        'user': '1000/hour',
+        'typeahead': '120/minute'
     }
 }
 
@@ -207,6 +208,86 @@ EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 # Zerobounce API
 ZEROBOUNCE_API_KEY = os.getenv('ZEROBOUNCE')
 
+# Redis (caché compartida). Sin REDIS_URL se usa una caché LRU en memoria
+REDIS_URL = os.getenv('REDIS_URL', '')
+REDIS_SOCKET_TIMEOUT = float(os.getenv('REDIS_SOCKET_TIMEOUT', '0.5'))
+REDIS_RETRY_INTERVAL = int(os.getenv('REDIS_RETRY_INTERVAL', '30'))
+LOCAL_CACHE_MAX_ENTRIES = int(os.getenv('LOCAL_CACHE_MAX_ENTRIES', '2048'))
+CACHE_REFRESH_LOCK_TIMEOUT = int(os.getenv('CACHE_REFRESH_LOCK_TIMEOUT', '30'))
+
+# Caché de cotizaciones de Yahoo Finance (segundos)
+QUOTE_CACHE_TTLS = {
+    'stock': int(os.getenv('QUOTE_CACHE_TTL_STOCK', '60')),
+    'crypto': int(os.getenv('QUOTE_CACHE_TTL_CRYPTO', '30')),
+}
+QUOTE_CACHE_STALE_TTL = int(os.getenv('QUOTE_CACHE_STALE_TTL', '300'))
+QUOTE_BATCH_SIZE = int(os.getenv('QUOTE_BATCH_SIZE', '50'))
+
+# Ingesta de datos de mercado (manage.py ingest_market_data)
+MARKET_DATA_INGEST_INTERVAL = int(os.getenv('MARKET_DATA_INGEST_INTERVAL', '30'))
+MARKET_SNAPSHOT_MAX_AGE = int(os.getenv('MARKET_SNAPSHOT_MAX_AGE', '600'))
+
+# Almacén local de histórico OHLCV (modelo PriceBar)
+PRICE_HISTORY_BACKFILL_PERIOD = os.getenv('PRICE_HISTORY_BACKFILL_PERIOD', 'max')
+PRICE_HISTORY_SYNC_INTERVAL = int(os.getenv('PRICE_HISTORY_SYNC_INTERVAL', '900'))
+
+# /api/stocks/history/: puntos por defecto, tope de max_points y caché del histórico intradía
+HISTORY_DEFAULT_MAX_POINTS = int(os.getenv('HISTORY_DEFAULT_MAX_POINTS', '500'))
+HISTORY_MAX_POINTS_LIMIT = int(os.getenv('HISTORY_MAX_POINTS_LIMIT', '5000'))
+INTRADAY_HISTORY_CACHE_TTL = int(os.getenv('INTRADAY_HISTORY_CACHE_TTL', '60'))
+
+# Single-flight: agrupa consultas concurrentes idénticas a Yahoo (entre workers vía Redis)
+SINGLE_FLIGHT_LOCK_TIMEOUT = int(os.getenv('SINGLE_FLIGHT_LOCK_TIMEOUT', '30'))
+SINGLE_FLIGHT_RESULT_TTL = int(os.getenv('SINGLE_FLIGHT_RESULT_TTL', '5'))
+SINGLE_FLIGHT_WAIT_TIMEOUT = int(os.getenv('SINGLE_FLIGHT_WAIT_TIMEOUT', '30'))
+
+# Pool compartido (hilos + sesión HTTP keep-alive) para las llamadas a Yahoo Finance
+YAHOO_POOL_MAX_WORKERS = int(os.getenv('YAHOO_POOL_MAX_WORKERS', '8'))
+YAHOO_POOL_MAX_QUEUE = int(os.getenv('YAHOO_POOL_MAX_QUEUE', '256'))
+YAHOO_POOL_SUBMIT_TIMEOUT = float(os.getenv('YAHOO_POOL_SUBMIT_TIMEOUT', '5'))
+
+# Circuit breaker y rate limiter adaptativo para Yahoo Finance
+YAHOO_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('YAHOO_CIRCUIT_FAILURE_THRESHOLD', '5'))
+YAHOO_CIRCUIT_RECOVERY_TIMEOUT = int(os.getenv('YAHOO_CIRCUIT_RECOVERY_TIMEOUT', '30'))
+YAHOO_RATE_LIMIT = float(os.getenv('YAHOO_RATE_LIMIT', '5'))  # peticiones por segundo
+YAHOO_RATE_BURST = int(os.getenv('YAHOO_RATE_BURST', '10'))
+YAHOO_RATE_MIN = float(os.getenv('YAHOO_RATE_MIN', '0.5'))
+YAHOO_RATE_ACQUIRE_TIMEOUT = float(os.getenv('YAHOO_RATE_ACQUIRE_TIMEOUT', '2'))
+QUOTE_LKG_TTL = int(os.getenv('QUOTE_LKG_TTL', str(7 * 24 * 3600)))
+
+# Vistas ASGI: llamadas simultáneas a Yahoo por event loop
+ASYNC_UPSTREAM_CONCURRENCY = int(os.getenv('ASYNC_UPSTREAM_CONCURRENCY', '16'))
+
+# Stream SSE de cotizaciones (/api/stocks/async/stream/)
+QUOTE_STREAM_INTERVAL = float(os.getenv('QUOTE_STREAM_INTERVAL', '5'))  # segundos entre consultas
+QUOTE_STREAM_HEARTBEAT = float(os.getenv('QUOTE_STREAM_HEARTBEAT', '15'))
+QUOTE_STREAM_MAX_DURATION = int(os.getenv('QUOTE_STREAM_MAX_DURATION', '300'))
+QUOTE_STREAM_RETRY_MS = int(os.getenv('QUOTE_STREAM_RETRY_MS', '3000'))
+QUOTE_STREAM_MAX_SYMBOLS = int(os.getenv('QUOTE_STREAM_MAX_SYMBOLS', '100'))
+
+# Directorio de símbolos y typeahead
+SYMBOL_INDEX_CHECK_INTERVAL = int(os.getenv('SYMBOL_INDEX_CHECK_INTERVAL', '60'))  # segundos
+SYMBOL_FUZZY_MIN_SIMILARITY = float(os.getenv('SYMBOL_FUZZY_MIN_SIMILARITY', '0.5'))
+
+# Componentes del detalle de una acción (la cotización usa QUOTE_CACHE_TTLS)
+FUNDAMENTALS_CACHE_TTL = int(os.getenv('FUNDAMENTALS_CACHE_TTL', str(6 * 3600)))
+FUNDAMENTALS_STALE_TTL = int(os.getenv('FUNDAMENTALS_STALE_TTL', str(24 * 3600)))
+DETAIL_HISTORY_CACHE_TTL = int(os.getenv('DETAIL_HISTORY_CACHE_TTL', '900'))
+
+# Dashboard del portafolio cacheado por usuario (se invalida con cada cambio del usuario)
+DASHBOARD_CACHE_TTL = int(os.getenv('DASHBOARD_CACHE_TTL', '30'))
+
+# Ejecución de órdenes: antigüedad máxima de la cotización usada como precio (segundos)
+# y reintentos de la transacción ante bloqueos de la base de datos; máximo de órdenes por lote
+TRADE_QUOTE_MAX_AGE = int(os.getenv('TRADE_QUOTE_MAX_AGE', '60'))
+TRADE_LOCK_RETRIES = int(os.getenv('TRADE_LOCK_RETRIES', '5'))
+TRADE_BATCH_MAX_ORDERS = int(os.getenv('TRADE_BATCH_MAX_ORDERS', '100'))
+
+# Órdenes límite y stop (comando match_orders): segundos entre cotizaciones y entre
+# recargas completas del libro de órdenes
+ORDER_MATCH_INTERVAL = float(os.getenv('ORDER_MATCH_INTERVAL', '5'))
+ORDER_BOOK_RELOAD_INTERVAL = int(os.getenv('ORDER_BOOK_RELOAD_INTERVAL', '300'))
+
 # Logging
 LOGGING = {
     'version': 1,
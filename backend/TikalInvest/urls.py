@@ -10,6 +10,7 @@ router.register(r'stocks', StocksViewSet, basename='stocks')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/stocks/async/', include('apps.stocks.urls')),
     path('api/', include(router.urls)),
     path('api/', include('apps.users.urls')),
     path('api/auth/', include('apps.auth.urls')),
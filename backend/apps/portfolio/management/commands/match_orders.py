@@ -0,0 +1,83 @@
+import signal
+import time
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from services.order_book import OrderMatcher
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Proceso que ejecuta las órdenes límite y stop.
+
+    Mantiene las órdenes abiertas en un libro en memoria (OrderBook) y en cada
+    ciclo pide en un solo lote las cotizaciones de los símbolos con órdenes; cada
+    cotización se compara solo con las cimas del libro de su símbolo. Las órdenes
+    nuevas se agregan en cada ciclo y el libro se recarga completo cada
+    ORDER_BOOK_RELOAD_INTERVAL segundos. Debe correr una sola instancia.
+
+    Uso:
+        python manage.py match_orders
+        python manage.py match_orders --interval 2
+        python manage.py match_orders --once
+    """
+
+    help = 'Ejecuta las órdenes límite y stop a medida que cambian las cotizaciones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=getattr(settings, 'ORDER_MATCH_INTERVAL', 5),
+            help='Segundos entre cotizaciones (por defecto ORDER_MATCH_INTERVAL)'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Evalúa las órdenes abiertas una sola vez y termina'
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        reload_interval = getattr(settings, 'ORDER_BOOK_RELOAD_INTERVAL', 300)
+        self._running = True
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        matcher = OrderMatcher()
+        loaded_at = None
+        self.stdout.write(f"Ejecución de órdenes iniciada (cada {interval}s)")
+        while self._running:
+            started = time.monotonic()
+            try:
+                if loaded_at is None or started - loaded_at >= reload_interval:
+                    count = matcher.load()
+                    loaded_at = started
+                    self.stdout.write(f"Libro de órdenes cargado: {count} órdenes abiertas")
+                else:
+                    matcher.sync()
+                processed = matcher.poll()
+                if processed:
+                    self.stdout.write(
+                        f"{len(processed)} órdenes procesadas (total: {matcher.stats['filled']} ejecutadas, "
+                        f"{matcher.stats['rejected']} rechazadas)"
+                    )
+            except Exception as e:
+                logger.error(f"Error en la ejecución de órdenes: {str(e)}")
+
+            if options['once']:
+                break
+
+            # Dormir en pasos cortos para responder rápido a SIGTERM
+            next_run = started + interval
+            while self._running and time.monotonic() < next_run:
+                time.sleep(min(0.5, max(0.0, next_run - time.monotonic())))
+
+        self.stdout.write('Ejecución de órdenes detenida')
+
+    def _stop(self, signum, frame):
+        self._running = False
@@ -0,0 +1,36 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from services.position_service import PositionService
+
+
+class Command(BaseCommand):
+    """
+    Reconstruye el libro de posiciones (modelo Position) desde las transacciones
+    completadas. Sirve para reparar el libro o para poblarlo por primera vez.
+
+    Uso:
+        python manage.py rebuild_positions
+        python manage.py rebuild_positions --user usuario@correo.com
+        python manage.py rebuild_positions --user usuario@correo.com --symbol AAPL
+    """
+
+    help = 'Reconstruye las posiciones de los portafolios desde las transacciones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', help='Email del usuario (se puede repetir)')
+        parser.add_argument('--symbol', action='append', help='Símbolo a reconstruir (se puede repetir)')
+
+    def handle(self, *args, **options):
+        user_ids = None
+        if options['user']:
+            User = get_user_model()
+            users = dict(User.objects.filter(email__in=options['user']).values_list('email', 'id'))
+            missing = set(options['user']) - set(users)
+            if missing:
+                raise CommandError(f"Usuarios no encontrados: {', '.join(sorted(missing))}")
+            user_ids = list(users.values())
+        symbols = [symbol.upper() for symbol in options['symbol']] if options['symbol'] else None
+
+        count = PositionService.rebuild(user_ids=user_ids, symbols=symbols)
+        self.stdout.write(self.style.SUCCESS(f"Posiciones reconstruidas: {count}"))
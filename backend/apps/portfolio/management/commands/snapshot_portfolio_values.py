@@ -0,0 +1,47 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from services.portfolio_history_service import PortfolioHistoryService
+
+
+class Command(BaseCommand):
+    """
+    Guarda el valor diario de cada portafolio a precio de cierre (PortfolioValueSnapshot).
+
+    Se programa una vez por día después del cierre del mercado (cron, Celery beat,
+    etc.). Con --backfill-from reconstruye los días pasados desde las transacciones.
+
+    Uso:
+        python manage.py snapshot_portfolio_values
+        python manage.py snapshot_portfolio_values --backfill-from 2024-01-01
+        python manage.py snapshot_portfolio_values --backfill-from 2024-01-01 --to 2024-06-30
+    """
+
+    help = 'Guarda el valor diario de los portafolios para las gráficas de rendimiento'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backfill-from', type=self._date, help='Reconstruye desde esta fecha (YYYY-MM-DD)')
+        parser.add_argument('--to', type=self._date, help='Última fecha del backfill (por defecto hoy)')
+
+    @staticmethod
+    def _date(value):
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            raise CommandError(f"Fecha inválida: {value} (formato YYYY-MM-DD)")
+
+    def handle(self, *args, **options):
+        if options['backfill_from']:
+            end = options['to'] or timezone.localdate()
+            if options['backfill_from'] > end:
+                raise CommandError('--backfill-from debe ser anterior a --to')
+            saved = PortfolioHistoryService.backfill(options['backfill_from'], end)
+            self.stdout.write(self.style.SUCCESS(
+                f"Backfill {options['backfill_from']} a {end}: {saved} valores diarios guardados"
+            ))
+            return
+
+        saved = PortfolioHistoryService.snapshot()
+        self.stdout.write(self.style.SUCCESS(f"Valor del día guardado para {saved} portafolios"))
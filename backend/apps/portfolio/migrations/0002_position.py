@@ -0,0 +1,83 @@
+# Generated by Django 4.2.7 on 2026-10-17 20:27
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+from decimal import Decimal
+
+
+CENT = Decimal('0.01')
+
+
+def apply_fill(position, transaction_type, shares, total):
+    """
+    Copia congelada de PositionService.apply_fill (costo promedio) al momento de
+    esta migración: la migración no debe cambiar si el servicio cambia después
+    """
+    if transaction_type == 'buy':
+        position.shares += shares
+        position.cost_basis += total
+        return
+
+    sold = min(shares, position.shares)
+    if sold <= 0 or shares <= 0:
+        return
+    cost = (position.cost_basis * sold / position.shares).quantize(CENT)
+    proceeds = (total * sold / shares).quantize(CENT)
+    position.realized_pnl += proceeds - cost
+    position.shares -= sold
+    position.cost_basis -= cost
+    if position.shares == 0:
+        position.cost_basis = Decimal('0')
+
+
+def build_positions(apps, schema_editor):
+    """Pobla el libro de posiciones con las transacciones existentes"""
+    StockTransaction = apps.get_model('portfolio', 'StockTransaction')
+    Position = apps.get_model('portfolio', 'Position')
+    positions = {}
+    transactions = StockTransaction.objects.filter(status='completed').order_by('created_at', 'id')
+    for txn in transactions.iterator(chunk_size=2000):
+        key = (txn.user_id, txn.symbol)
+        if key not in positions:
+            positions[key] = Position(
+                user_id=txn.user_id, symbol=txn.symbol, name=txn.name,
+                shares=Decimal('0'), cost_basis=Decimal('0'), realized_pnl=Decimal('0'),
+            )
+        apply_fill(positions[key], txn.transaction_type, txn.shares, txn.total)
+    Position.objects.bulk_create(positions.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('portfolio', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Position',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('symbol', models.CharField(max_length=10)),
+                ('name', models.CharField(max_length=255)),
+                ('shares', models.DecimalField(decimal_places=4, default=0, max_digits=15)),
+                ('cost_basis', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('realized_pnl', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='positions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'positions',
+                'ordering': ['symbol'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='position',
+            constraint=models.UniqueConstraint(fields=('user', 'symbol'), name='unique_position_user_symbol'),
+        ),
+        migrations.RunPython(build_positions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-17 20:33
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('portfolio', '0002_position'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PortfolioValueSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('market_value', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('cost_basis', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='value_snapshots', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'portfolio_value_snapshots',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='portfoliovaluesnapshot',
+            constraint=models.UniqueConstraint(fields=('user', 'date'), name='unique_value_snapshot_user_date'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-17 20:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0003_portfolio_value_snapshot'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='stocktransaction',
+            name='stock_trans_user_id_940cd6_idx',
+        ),
+        migrations.AddIndex(
+            model_name='stocktransaction',
+            index=models.Index(fields=['user', 'symbol', '-created_at'], name='stock_trans_user_id_aea739_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-17 20:44
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('portfolio', '0004_stock_transaction_symbol_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Order',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('symbol', models.CharField(max_length=10)),
+                ('name', models.CharField(max_length=255)),
+                ('order_type', models.CharField(choices=[('limit', 'Límite'), ('stop', 'Stop')], max_length=10)),
+                ('transaction_type', models.CharField(choices=[('buy', 'Compra'), ('sell', 'Venta')], max_length=10)),
+                ('shares', models.DecimalField(decimal_places=4, max_digits=15)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('reserved', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('status', models.CharField(choices=[('open', 'Abierta'), ('filled', 'Ejecutada'), ('cancelled', 'Cancelada'), ('rejected', 'Rechazada')], default='open', max_length=20)),
+                ('message', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('filled_at', models.DateTimeField(blank=True, null=True)),
+                ('transaction', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='order', to='portfolio.stocktransaction')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='orders', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'orders',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user', '-created_at'], name='orders_user_id_535113_idx'), models.Index(fields=['status', 'symbol'], name='orders_status_c3d130_idx')],
+            },
+        ),
+    ]
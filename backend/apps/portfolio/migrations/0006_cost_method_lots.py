@@ -0,0 +1,78 @@
+# Generated by Django 4.2.7 on 2026-10-17 20:47
+
+from django.db import migrations, models
+from decimal import Decimal
+
+
+CENT = Decimal('0.01')
+
+
+def apply_fill(position, transaction_type, shares, total):
+    """
+    Copia congelada de PositionService.apply_fill al momento de esta migración, solo
+    con costo promedio: todas las posiciones existentes quedan con cost_method
+    'average' y sin lotes. Retorna la ganancia realizada por la venta (None en compras)
+    """
+    if transaction_type == 'buy':
+        position['shares'] += shares
+        position['cost_basis'] += total
+        return None
+
+    sold = min(shares, position['shares'])
+    if sold <= 0 or shares <= 0:
+        return Decimal('0')
+    cost = (position['cost_basis'] * sold / position['shares']).quantize(CENT)
+    realized = (total * sold / shares).quantize(CENT) - cost
+    position['shares'] -= sold
+    position['cost_basis'] -= cost
+    if position['shares'] == 0:
+        position['cost_basis'] = Decimal('0')
+    return realized
+
+
+def fill_realized_pnl(apps, schema_editor):
+    """Guarda la ganancia realizada de las ventas existentes (costo promedio, como las posiciones)"""
+    StockTransaction = apps.get_model('portfolio', 'StockTransaction')
+    positions = {}
+    sells = []
+    transactions = StockTransaction.objects.filter(status='completed').order_by('created_at', 'id')
+    for txn in transactions.iterator(chunk_size=2000):
+        position = positions.setdefault(
+            (txn.user_id, txn.symbol), {'shares': Decimal('0'), 'cost_basis': Decimal('0')}
+        )
+        realized = apply_fill(position, txn.transaction_type, txn.shares, txn.total)
+        if realized is not None:
+            txn.realized_pnl = realized
+            sells.append(txn)
+    StockTransaction.objects.bulk_update(sells, ['realized_pnl'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0005_order'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='portfolio',
+            name='cost_method',
+            field=models.CharField(choices=[('average', 'Costo promedio'), ('fifo', 'FIFO'), ('lifo', 'LIFO')], default='average', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='position',
+            name='cost_method',
+            field=models.CharField(choices=[('average', 'Costo promedio'), ('fifo', 'FIFO'), ('lifo', 'LIFO')], default='average', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='position',
+            name='lots',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='stocktransaction',
+            name='realized_pnl',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True),
+        ),
+        migrations.RunPython(fill_realized_pnl, migrations.RunPython.noop),
+    ]
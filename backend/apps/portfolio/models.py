@@ -1,11 +1,16 @@
 import uuid
+import logging
 from django.db import models
+from django.db.models import Sum, Count, Q, F, Case, When, DecimalField
 from django.contrib.auth import get_user_model
 from django.utils import timezone
+from django.utils.functional import cached_property
 from decimal import Decimal
 
 User = get_user_model()
 
+logger = logging.getLogger(__name__)
+
 
 class StockTransaction(models.Model):
     """Modelo para registrar compras y ventas de acciones"""
@@ -30,6 +35,8 @@ class StockTransaction(models.Model):
     price_per_share = models.DecimalField(max_digits=15, decimal_places=2)  # Precio unitario
     total = models.DecimalField(max_digits=15, decimal_places=2)  # Total (shares * price_per_share)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='completed')
+    # Ganancia realizada por la venta con el método de costo del usuario (NULL en compras)
+    realized_pnl = models.DecimalField(max_digits=15, decimal_places=2, null=True, blank=True)
     
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -38,7 +45,7 @@ class StockTransaction(models.Model):
         db_table = 'stock_transactions'
         indexes = [
             models.Index(fields=['user', '-created_at']),
-            models.Index(fields=['user', 'symbol']),
+            models.Index(fields=['user', 'symbol', '-created_at']),
             models.Index(fields=['user', 'transaction_type']),
         ]
         ordering = ['-created_at']
@@ -55,8 +62,15 @@ class StockTransaction(models.Model):
 
 class Portfolio(models.Model):
     """Modelo para almacenar acciones del portafolio del usuario"""
+    COST_METHOD_CHOICES = [
+        ('average', 'Costo promedio'),
+        ('fifo', 'FIFO'),
+        ('lifo', 'LIFO'),
+    ]
+    
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='portfolio')
+    cost_method = models.CharField(max_length=10, choices=COST_METHOD_CHOICES, default='average')
     updated_at = models.DateTimeField(auto_now=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
@@ -66,62 +80,346 @@ class Portfolio(models.Model):
     def __str__(self):
         return f"Portfolio de {self.user.email}"
     
+    def _completed_transactions(self):
+        return StockTransaction.objects.filter(user_id=self.user_id, status='completed')
+    
+    @staticmethod
+    def _totals_aggregates():
+        """Sumas condicionales por tipo de transacción (se resuelven en SQL)"""
+        zero = Decimal('0')
+        is_buy = Q(transaction_type='buy')
+        is_sell = Q(transaction_type='sell')
+        return {
+            'shares_bought': Sum('shares', filter=is_buy, default=zero),
+            'shares_sold': Sum('shares', filter=is_sell, default=zero),
+            'total_bought': Sum('total', filter=is_buy, default=zero),
+            'total_sold': Sum('total', filter=is_sell, default=zero),
+            'total_invested': Sum(
+                Case(
+                    When(is_buy, then=F('total')),
+                    When(is_sell, then=-F('total')),
+                    default=zero,
+                    output_field=DecimalField(max_digits=15, decimal_places=2),
+                ),
+                default=zero,
+            ),
+            'transactions': Count('id'),
+        }
+    
+    @staticmethod
+    def _round_totals(row) -> dict:
+        """Lleva las sumas a la precisión de los campos (SQLite suma decimales como float)"""
+        for key in ('shares_bought', 'shares_sold'):
+            row[key] = Decimal(row[key]).quantize(Decimal('0.0001'))
+        for key in ('total_bought', 'total_sold', 'total_invested'):
+            row[key] = Decimal(row[key]).quantize(Decimal('0.01'))
+        return row
+    
+    def get_transaction_totals(self) -> dict:
+        """Totales de compras y ventas completadas en una sola consulta"""
+        return self._round_totals(self._completed_transactions().aggregate(**self._totals_aggregates()))
+    
+    def get_symbol_totals(self) -> dict:
+        """Totales de compras y ventas por símbolo (GROUP BY symbol en una sola consulta)"""
+        rows = (
+            self._completed_transactions()
+            .order_by()
+            .values('symbol')
+            .annotate(**self._totals_aggregates())
+            .order_by('symbol')
+        )
+        return {
+            row['symbol']: {**row, 'net_shares': row['shares_bought'] - row['shares_sold']}
+            for row in map(self._round_totals, rows)
+        }
+    
+    def get_realized_pnl(self, start=None, end=None) -> dict:
+        """
+        Ganancia realizada por las ventas entre start y end (fechas incluidas), total y
+        por símbolo. Suma la ganancia guardada en cada venta: no recorre el historial
+        """
+        sells = self._completed_transactions().filter(transaction_type='sell')
+        if start is not None:
+            sells = sells.filter(created_at__date__gte=start)
+        if end is not None:
+            sells = sells.filter(created_at__date__lte=end)
+        aggregates = {
+            'realized_pnl': Sum('realized_pnl', default=Decimal('0')),
+            'shares_sold': Sum('shares', default=Decimal('0')),
+            'sells': Count('id'),
+        }
+        rows = sells.order_by().values('symbol').annotate(**aggregates).order_by('symbol')
+        symbols = {}
+        for row in rows:
+            row['realized_pnl'] = Decimal(row['realized_pnl']).quantize(Decimal('0.01'))
+            row['shares_sold'] = Decimal(row['shares_sold']).quantize(Decimal('0.0001'))
+            symbols[row['symbol']] = row
+        return {
+            'realized_pnl': sum((row['realized_pnl'] for row in symbols.values()), Decimal('0')),
+            'sells': sum(row['sells'] for row in symbols.values()),
+            'symbols': symbols,
+        }
+    
     def get_total_invested(self) -> Decimal:
         """Calcula la inversión total (compras - ventas)"""
-        transactions = self.user.stock_transactions.filter(status='completed')
-        total = Decimal('0')
-        for transaction in transactions:
-            if transaction.transaction_type == 'buy':
-                total += transaction.total
-            else:  # sell
-                total -= transaction.total
-        return total
+        return self.get_transaction_totals()['total_invested']
     
     def get_current_value(self) -> Decimal:
         """Calcula el valor actual del portafolio basado en el precio actual de cada acción"""
-        # Por ahora retorna la inversión total
-        # En una implementación real, traería los precios actuales de Yahoo Finance
-        return self.get_total_invested()
+        return self.get_snapshot().current_value
+    
+    def get_valuation(self) -> dict:
+        """
+        Valoriza los holdings a precio de mercado.
+        
+        Todas las cotizaciones se piden en una sola consulta por lotes a la caché de
+        YahooFinanceService. Un símbolo sin cotización se valora a su costo promedio
+        (price_available = False) para no distorsionar el total.
+        """
+        from services.yahoo_finance_service import YahooFinanceService
+        
+        # Una sola lectura del libro: las posiciones cerradas aportan su ganancia realizada
+        positions = list(Position.objects.filter(user_id=self.user_id).order_by('symbol'))
+        holdings = {position.symbol: position.as_holding() for position in positions if position.shares > 0}
+        quotes = {}
+        if holdings:
+            try:
+                quotes = YahooFinanceService.get_quotes(list(holdings))
+            except Exception as e:
+                logger.warning(f"No se pudieron obtener cotizaciones del portafolio: {str(e)}")
+        
+        cent = Decimal('0.01')
+        market_value = Decimal('0')
+        cost_basis = Decimal('0')
+        day_change = Decimal('0')
+        for symbol, holding in holdings.items():
+            quote = quotes.get(symbol)
+            price_available = bool(quote and quote.get('price'))
+            if price_available:
+                price = Decimal(str(quote['price']))
+                holding['day_change'] = (holding['shares'] * Decimal(str(quote.get('change') or 0))).quantize(cent)
+            else:
+                price = holding['average_price']
+                holding['day_change'] = Decimal('0')
+            holding['current_price'] = price.quantize(cent)
+            holding['price_available'] = price_available
+            holding['market_value'] = (holding['shares'] * price).quantize(cent)
+            holding['unrealized_pnl'] = holding['market_value'] - holding['total_invested']
+            holding['unrealized_pnl_percent'] = (
+                (holding['unrealized_pnl'] / holding['total_invested'] * 100).quantize(cent)
+                if holding['total_invested'] > 0 else Decimal('0')
+            )
+            market_value += holding['market_value']
+            cost_basis += holding['total_invested']
+            day_change += holding['day_change']
+        
+        for holding in holdings.values():
+            holding['weight'] = (
+                (holding['market_value'] / market_value * 100).quantize(cent)
+                if market_value > 0 else Decimal('0')
+            )
+        
+        unrealized_pnl = market_value - cost_basis
+        return {
+            'holdings': holdings,
+            'market_value': market_value,
+            'cost_basis': cost_basis,
+            'unrealized_pnl': unrealized_pnl,
+            'unrealized_pnl_percent': (
+                (unrealized_pnl / cost_basis * 100).quantize(cent) if cost_basis > 0 else Decimal('0')
+            ),
+            'realized_pnl': sum((position.realized_pnl for position in positions), Decimal('0')),
+            'day_change': day_change,
+        }
     
     def get_total_gains(self) -> Decimal:
         """Calcula las ganancias totales (valor actual - inversión)"""
-        return self.get_current_value() - self.get_total_invested()
+        return self.get_snapshot().total_gains
+    
+    def get_snapshot(self, refresh=False) -> 'PortfolioSnapshot':
+        """
+        Snapshot de los cálculos del portafolio, compartido por todos los consumidores
+        de esta instancia (una por petición). refresh=True descarta el anterior
+        """
+        if refresh or getattr(self, '_snapshot', None) is None:
+            self._snapshot = PortfolioSnapshot(self)
+        return self._snapshot
     
     def get_portfolio_holdings(self) -> dict:
-        """Retorna las acciones actuales agrupadas por símbolo"""
-        transactions = self.user.stock_transactions.filter(status='completed').order_by('symbol')
-        holdings = {}
-        
-        for transaction in transactions:
-            if transaction.symbol not in holdings:
-                holdings[transaction.symbol] = {
-                    'symbol': transaction.symbol,
-                    'name': transaction.name,
-                    'shares': Decimal('0'),
-                    'average_price': Decimal('0'),
-                    'total_invested': Decimal('0'),
-                }
-            
-            holding = holdings[transaction.symbol]
-            if transaction.transaction_type == 'buy':
-                # Actualizar promedio de precio
-                old_total = holding['total_invested']
-                new_total = old_total + transaction.total
-                old_shares = holding['shares']
-                new_shares = old_shares + transaction.shares
-                
-                if new_shares > 0:
-                    holding['average_price'] = new_total / new_shares
-                
-                holding['total_invested'] = new_total
-                holding['shares'] = new_shares
-            else:  # sell
-                holding['shares'] = max(Decimal('0'), holding['shares'] - transaction.shares)
-                # Restamos proporcionalmente la inversión
-                if holding['shares'] == 0:
-                    holding['total_invested'] = Decimal('0')
-                else:
-                    holding['total_invested'] -= transaction.total
-        
-        # Filtrar holdings sin acciones
-        return {k: v for k, v in holdings.items() if v['shares'] > 0}
+        """Retorna las acciones actuales agrupadas por símbolo (desde el libro de posiciones)"""
+        positions = Position.objects.filter(user_id=self.user_id, shares__gt=0).order_by('symbol')
+        return {position.symbol: position.as_holding() for position in positions}
+
+
+class PortfolioSnapshot:
+    """
+    Cálculos del portafolio hechos una sola vez: totales de transacciones (una
+    consulta agregada) y holdings valorizados (una lectura del libro de posiciones
+    y una consulta de cotizaciones por lotes). Cada valor se calcula al pedirlo
+    por primera vez y después se reutiliza.
+    """
+    
+    def __init__(self, portfolio):
+        self.portfolio = portfolio
+    
+    @cached_property
+    def totals(self) -> dict:
+        return self.portfolio.get_transaction_totals()
+    
+    @cached_property
+    def valuation(self) -> dict:
+        return self.portfolio.get_valuation()
+    
+    @property
+    def holdings(self) -> dict:
+        return self.valuation['holdings']
+    
+    @property
+    def total_invested(self) -> Decimal:
+        return self.totals['total_invested']
+    
+    @property
+    def current_value(self) -> Decimal:
+        return self.valuation['market_value']
+    
+    @property
+    def total_gains(self) -> Decimal:
+        return self.current_value - self.total_invested
+    
+    @property
+    def gains_percentage(self) -> Decimal:
+        if self.total_invested > 0:
+            return (self.total_gains / self.total_invested) * 100
+        return Decimal('0')
+
+
+class Position(models.Model):
+    """
+    Posición materializada por usuario y símbolo.
+
+    Se actualiza en la misma transacción de base de datos que crea cada
+    StockTransaction completada (ver signals.py), así los holdings no dependen
+    del largo del historial. `python manage.py rebuild_positions` la reconstruye
+    desde las transacciones. Con FIFO o LIFO `lots` guarda los lotes abiertos,
+    del más antiguo al más nuevo, como pares [acciones, costo]; con costo
+    promedio queda vacío.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='positions')
+    symbol = models.CharField(max_length=10)
+    name = models.CharField(max_length=255)
+    shares = models.DecimalField(max_digits=15, decimal_places=4, default=0)  # Acciones en cartera
+    cost_basis = models.DecimalField(max_digits=15, decimal_places=2, default=0)  # Costo de las acciones en cartera
+    realized_pnl = models.DecimalField(max_digits=15, decimal_places=2, default=0)  # Ganancia realizada en ventas
+    cost_method = models.CharField(max_length=10, choices=Portfolio.COST_METHOD_CHOICES, default='average')
+    lots = models.JSONField(default=list, blank=True)  # Lotes abiertos [[acciones, costo], ...]
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'positions'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'symbol'], name='unique_position_user_symbol'),
+        ]
+        ordering = ['symbol']
+    
+    def __str__(self):
+        return f"{self.user.email} - {self.shares} {self.symbol} (costo ${self.cost_basis})"
+    
+    @property
+    def average_price(self) -> Decimal:
+        if self.shares > 0:
+            return self.cost_basis / self.shares
+        return Decimal('0')
+    
+    def as_holding(self) -> dict:
+        """Formato que usan los serializadores y vistas de holdings"""
+        return {
+            'symbol': self.symbol,
+            'name': self.name,
+            'shares': self.shares,
+            'average_price': self.average_price,
+            'total_invested': self.cost_basis,
+            'realized_pnl': self.realized_pnl,
+        }
+
+
+class PortfolioValueSnapshot(models.Model):
+    """
+    Valor diario de los holdings de cada usuario a precio de cierre.
+
+    Lo escribe el comando nocturno `snapshot_portfolio_values`; las gráficas de
+    rendimiento leen un rango de fechas con el índice (user, date).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='value_snapshots')
+    date = models.DateField()
+    market_value = models.DecimalField(max_digits=15, decimal_places=2)  # Holdings a precio de cierre
+    cost_basis = models.DecimalField(max_digits=15, decimal_places=2)  # Costo de esos holdings
+    
+    class Meta:
+        db_table = 'portfolio_value_snapshots'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date'], name='unique_value_snapshot_user_date'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.email} {self.date}: ${self.market_value}"
+
+
+class Order(models.Model):
+    """
+    Orden límite o stop que queda abierta hasta que la cotización la dispara.
+
+    - Límite de compra / stop de venta: se ejecuta cuando el precio baja a `price` o menos.
+    - Límite de venta / stop de compra: se ejecuta cuando el precio sube a `price` o más.
+    Una compra aparta `reserved` del balance disponible al crearse; se devuelve al
+    cancelarla y se descuenta el total real al ejecutarla. El comando `match_orders`
+    evalúa las órdenes abiertas contra cada actualización de cotizaciones.
+    """
+    ORDER_TYPE_CHOICES = [
+        ('limit', 'Límite'),
+        ('stop', 'Stop'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('open', 'Abierta'),
+        ('filled', 'Ejecutada'),
+        ('cancelled', 'Cancelada'),
+        ('rejected', 'Rechazada'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='orders')
+    symbol = models.CharField(max_length=10)
+    name = models.CharField(max_length=255)
+    order_type = models.CharField(max_length=10, choices=ORDER_TYPE_CHOICES)
+    transaction_type = models.CharField(max_length=10, choices=StockTransaction.TRANSACTION_TYPE_CHOICES)
+    shares = models.DecimalField(max_digits=15, decimal_places=4)
+    price = models.DecimalField(max_digits=15, decimal_places=2)  # Precio límite o de disparo
+    reserved = models.DecimalField(max_digits=15, decimal_places=2, default=0)  # Balance apartado (compras)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='open')
+    message = models.CharField(max_length=255, blank=True)  # Motivo del rechazo
+    transaction = models.OneToOneField(
+        StockTransaction, on_delete=models.SET_NULL, null=True, blank=True, related_name='order'
+    )
+    
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    filled_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'orders'
+        indexes = [
+            models.Index(fields=['user', '-created_at']),
+            models.Index(fields=['status', 'symbol']),
+        ]
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.user.email} - {self.order_type} {self.transaction_type} {self.shares} {self.symbol} @ ${self.price}"
+    
+    @property
+    def triggers_below(self) -> bool:
+        """True si la orden se dispara cuando el precio baja a `price` (límite de compra, stop de venta)"""
+        return (self.order_type == 'limit') == (self.transaction_type == 'buy')
@@ -0,0 +1,14 @@
+from rest_framework.pagination import CursorPagination
+
+
+class TransactionCursorPagination(CursorPagination):
+    """
+    Paginación por cursor sobre el índice (user, -created_at) de stock_transactions.
+
+    Cada página es un rango del índice a partir de la posición del cursor: no hay
+    COUNT(*) ni OFFSET, así que el costo no crece con la profundidad.
+    """
+    ordering = '-created_at'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
@@ -1,28 +1,87 @@
+from django.conf import settings
 from rest_framework import serializers
-from .models import StockTransaction, Portfolio
+from .models import StockTransaction, Portfolio, Order
 from decimal import Decimal
 
 
-class StockTransactionSerializer(serializers.ModelSerializer):
+class SparseFieldsetMixin:
+    """
+    Permite pedir solo algunos campos con `?fields=symbol,total,created_at`.
+    Los nombres desconocidos se ignoran; sin el parámetro se devuelven todos
+    """
+    
+    @classmethod
+    def requested_fields(cls, request):
+        """Campos pedidos en la query que existen en el serializador (None: todos)"""
+        if request is None or not request.query_params.get('fields'):
+            return None
+        requested = {field.strip() for field in request.query_params['fields'].split(',')}
+        fields = [field for field in cls.Meta.fields if field in requested]
+        return fields or None
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.requested_fields(self.context.get('request'))
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class StockTransactionSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializador para transacciones de acciones"""
     class Meta:
         model = StockTransaction
-        fields = ['id', 'symbol', 'name', 'transaction_type', 'shares', 'price_per_share', 'total', 'status', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        fields = [
+            'id', 'symbol', 'name', 'transaction_type', 'shares', 'price_per_share', 'total', 'status',
+            'realized_pnl', 'created_at', 'updated_at'
+        ]
+        read_only_fields = ['id', 'realized_pnl', 'created_at', 'updated_at']
 
 
-class StockTransactionCreateSerializer(serializers.ModelSerializer):
-    """Serializador para crear transacciones de acciones"""
-    class Meta:
-        model = StockTransaction
-        fields = ['symbol', 'name', 'transaction_type', 'shares', 'price_per_share']
+class TradeOrderSerializer(serializers.Serializer):
+    """
+    Orden de mercado. El precio lo pone el servidor con la cotización actual;
+    name y price_per_share enviados por el cliente se ignoran
+    """
+    symbol = serializers.CharField(max_length=10)
+    transaction_type = serializers.ChoiceField(choices=StockTransaction.TRANSACTION_TYPE_CHOICES)
+    shares = serializers.DecimalField(max_digits=15, decimal_places=4, min_value=Decimal('0.0001'))
+    
+    def validate_symbol(self, value):
+        return value.strip().upper()
+
+
+class TradeBatchSerializer(serializers.Serializer):
+    """Lote de órdenes de mercado (hasta TRADE_BATCH_MAX_ORDERS)"""
+    orders = TradeOrderSerializer(
+        many=True,
+        allow_empty=False,
+        max_length=getattr(settings, 'TRADE_BATCH_MAX_ORDERS', 100),
+    )
+
+
+class OrderSerializer(serializers.ModelSerializer):
+    """Serializador para órdenes límite y stop"""
+    transaction = StockTransactionSerializer(read_only=True)
     
-    def create(self, validated_data):
-        """Calcula el total automáticamente"""
-        shares = validated_data.get('shares')
-        price = validated_data.get('price_per_share')
-        validated_data['total'] = shares * price
-        return super().create(validated_data)
+    class Meta:
+        model = Order
+        fields = [
+            'id', 'symbol', 'name', 'order_type', 'transaction_type', 'shares', 'price', 'reserved',
+            'status', 'message', 'transaction', 'created_at', 'updated_at', 'filled_at'
+        ]
+        read_only_fields = fields
+
+
+class OrderCreateSerializer(TradeOrderSerializer):
+    """Orden límite o stop: `price` es el precio límite o el de disparo"""
+    order_type = serializers.ChoiceField(choices=Order.ORDER_TYPE_CHOICES)
+    price = serializers.DecimalField(max_digits=15, decimal_places=2, min_value=Decimal('0.01'))
+
+
+class CostMethodSerializer(serializers.Serializer):
+    """Método de costo para las posiciones y la ganancia realizada"""
+    cost_method = serializers.ChoiceField(choices=Portfolio.COST_METHOD_CHOICES)
 
 
 class PortfolioHoldingSerializer(serializers.Serializer):
@@ -32,6 +91,14 @@ class PortfolioHoldingSerializer(serializers.Serializer):
     shares = serializers.DecimalField(max_digits=15, decimal_places=4)
     average_price = serializers.DecimalField(max_digits=15, decimal_places=2)
     total_invested = serializers.DecimalField(max_digits=15, decimal_places=2)
+    realized_pnl = serializers.DecimalField(max_digits=15, decimal_places=2)
+    current_price = serializers.DecimalField(max_digits=15, decimal_places=2)
+    price_available = serializers.BooleanField()
+    market_value = serializers.DecimalField(max_digits=15, decimal_places=2)
+    unrealized_pnl = serializers.DecimalField(max_digits=15, decimal_places=2)
+    unrealized_pnl_percent = serializers.DecimalField(max_digits=10, decimal_places=2)
+    day_change = serializers.DecimalField(max_digits=15, decimal_places=2)
+    weight = serializers.DecimalField(max_digits=5, decimal_places=2)
 
 
 class PortfolioSerializer(serializers.ModelSerializer):
@@ -43,25 +110,27 @@ class PortfolioSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Portfolio
-        fields = ['id', 'holdings', 'total_invested', 'current_value', 'total_gains', 'created_at', 'updated_at']
+        fields = ['id', 'cost_method', 'holdings', 'total_invested', 'current_value', 'total_gains', 'created_at', 'updated_at']
+        # El método de costo se cambia con POST cost_method (recalcula las posiciones)
+        read_only_fields = ['cost_method']
     
     def get_holdings(self, obj):
-        """Retorna los holdings actuales"""
-        holdings_dict = obj.get_portfolio_holdings()
+        """Retorna los holdings actuales valorizados a precio de mercado"""
+        holdings_dict = obj.get_snapshot().holdings
         serializer = PortfolioHoldingSerializer(holdings_dict.values(), many=True)
         return serializer.data
     
     def get_total_invested(self, obj):
         """Retorna la inversión total"""
-        return str(obj.get_total_invested())
+        return str(obj.get_snapshot().total_invested)
     
     def get_current_value(self, obj):
         """Retorna el valor actual"""
-        return str(obj.get_current_value())
+        return str(obj.get_snapshot().current_value)
     
     def get_total_gains(self, obj):
         """Retorna las ganancias totales"""
-        return str(obj.get_total_gains())
+        return str(obj.get_snapshot().total_gains)
 
 
 class DashboardStatsSerializer(serializers.Serializer):
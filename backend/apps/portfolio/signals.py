@@ -0,0 +1,50 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from .models import StockTransaction
+from services.dashboard_cache_service import DashboardCacheService
+from services.position_service import PositionService, LEDGER_FIELDS
+
+
+@receiver(pre_save, sender=StockTransaction)
+def remember_ledger_fields(sender, instance, raw=False, **kwargs):
+    """Guarda los valores anteriores de una transacción existente para detectar cambios"""
+    instance._ledger_previous = None
+    if raw or instance._state.adding:
+        return
+    instance._ledger_previous = (
+        StockTransaction.objects.filter(pk=instance.pk).values(*LEDGER_FIELDS).first()
+    )
+
+
+@receiver(post_save, sender=StockTransaction)
+def update_position(sender, instance, created, raw=False, **kwargs):
+    """Actualiza la posición del usuario al crear o modificar una transacción"""
+    if raw:
+        return
+    if created:
+        if instance.status == 'completed':
+            PositionService.apply_transaction(instance)
+        return
+
+    previous = getattr(instance, '_ledger_previous', None)
+    if previous is None:
+        return
+    current = {field: getattr(instance, field) for field in LEDGER_FIELDS}
+    affects_ledger = 'completed' in (previous['status'], instance.status)
+    if affects_ledger and previous != current:
+        # Caso poco frecuente (edición, cancelación): se recalcula solo ese símbolo
+        PositionService.rebuild(user_ids=[instance.user_id], symbols={previous['symbol'], instance.symbol})
+
+
+@receiver(post_delete, sender=StockTransaction)
+def remove_from_position(sender, instance, **kwargs):
+    """Recalcula la posición cuando se elimina una transacción completada"""
+    if instance.status == 'completed':
+        PositionService.rebuild(user_ids=[instance.user_id], symbols=[instance.symbol])
+
+
+@receiver(post_save, sender=StockTransaction)
+@receiver(post_delete, sender=StockTransaction)
+def invalidate_dashboard(sender, instance, **kwargs):
+    """Descarta el dashboard cacheado del usuario (holdings, totales o recientes cambiaron)"""
+    DashboardCacheService.invalidate(instance.user_id)
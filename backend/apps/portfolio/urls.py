@@ -1,9 +1,10 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import StockTransactionViewSet, PortfolioViewSet
+from .views import StockTransactionViewSet, PortfolioViewSet, OrderViewSet
 
 router = DefaultRouter()
 router.register(r'transactions', StockTransactionViewSet, basename='stock-transaction')
+router.register(r'orders', OrderViewSet, basename='order')
 router.register(r'portfolio', PortfolioViewSet, basename='portfolio')
 
 urlpatterns = [
@@ -2,43 +2,123 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Sum, F, Case, When, DecimalField
+from django.conf import settings
+from django.http import HttpResponse
 from django.utils import timezone
-from datetime import timedelta
+from datetime import date, timedelta
 from decimal import Decimal
 
-from .models import StockTransaction, Portfolio
+from .models import StockTransaction, Portfolio, Order
+from .pagination import TransactionCursorPagination
 from .serializers import (
     StockTransactionSerializer, 
-    StockTransactionCreateSerializer,
+    TradeOrderSerializer,
+    TradeBatchSerializer,
+    OrderSerializer,
+    OrderCreateSerializer,
+    CostMethodSerializer,
     PortfolioSerializer,
     DashboardStatsSerializer
 )
+from services.dashboard_cache_service import DashboardCacheService
+from services.portfolio_history_service import PortfolioHistoryService
+from services.position_service import PositionService
+from services.trade_execution_service import TradeExecutionService, TradeError, QuoteUnavailableError
+
+
+def as_floats(row):
+    """Convierte los Decimal de un diccionario a float para la respuesta JSON"""
+    return {key: float(value) if isinstance(value, Decimal) else value for key, value in row.items()}
+
+
+def valuation_payload(valuation):
+    """Totales y holdings valorizados (Portfolio.get_valuation) listos para la respuesta"""
+    totals = as_floats({key: value for key, value in valuation.items() if key != 'holdings'})
+    return totals, [as_floats(holding) for holding in valuation['holdings'].values()]
 
 
 class StockTransactionViewSet(viewsets.ModelViewSet):
     """ViewSet para manejar transacciones de acciones"""
     serializer_class = StockTransactionSerializer
     permission_classes = [IsAuthenticated]
+    # Las transacciones ejecutadas no se editan ni se borran: mueven balance y posiciones
+    http_method_names = ['get', 'post', 'head', 'options']
+    pagination_class = TransactionCursorPagination
+    # El cursor recorre el índice (user, -created_at): no se ordena por otros campos
+    ordering_fields = ['created_at']
+    ordering = ['-created_at']
     
     def get_queryset(self):
         """Solo retorna transacciones del usuario autenticado"""
-        return StockTransaction.objects.filter(user=self.request.user)
+        queryset = StockTransaction.objects.filter(user=self.request.user)
+        fields = StockTransactionSerializer.requested_fields(self.request)
+        if fields is not None:
+            # Con ?fields= solo se leen esas columnas (más las que usa el cursor)
+            queryset = queryset.only('id', 'created_at', *fields)
+        return queryset
     
     def create(self, request, *args, **kwargs):
-        """Crear una nueva transacción"""
-        serializer = StockTransactionCreateSerializer(data=request.data)
-        if serializer.is_valid():
-            # Crear la transacción asociada al usuario
-            serializer.save(user=request.user)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        """Ejecuta una orden de mercado (compra o venta) al precio actual"""
+        serializer = TradeOrderSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            stock_transaction = TradeExecutionService.execute(request.user, **serializer.validated_data)
+        except QuoteUnavailableError as e:
+            return Response({
+                'success': False,
+                'message': str(e)
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        except TradeError as e:
+            return Response({
+                'success': False,
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(StockTransactionSerializer(stock_transaction).data, status=status.HTTP_201_CREATED)
+    
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """
+        Ejecuta un lote de órdenes de mercado en una sola transacción.
+        Cada orden se ejecuta o se rechaza por separado; la respuesta trae el resultado de cada una
+        """
+        serializer = TradeBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        outcomes = TradeExecutionService.execute_batch(request.user, serializer.validated_data['orders'])
+        results = []
+        for index, outcome in enumerate(outcomes):
+            if isinstance(outcome, TradeError):
+                results.append({'index': index, 'success': False, 'message': str(outcome)})
+            else:
+                results.append({
+                    'index': index,
+                    'success': True,
+                    'transaction': StockTransactionSerializer(outcome).data
+                })
+        executed = sum(result['success'] for result in results)
+        if executed:
+            response_status = status.HTTP_201_CREATED
+        elif all(isinstance(outcome, QuoteUnavailableError) for outcome in outcomes):
+            # Sin cotizaciones recientes (Yahoo caído): igual que una orden individual
+            response_status = status.HTTP_503_SERVICE_UNAVAILABLE
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response({
+            'success': executed > 0,
+            'executed': executed,
+            'rejected': len(results) - executed,
+            'results': results
+        }, status=response_status)
     
     @action(detail=False, methods=['get'])
     def recent(self, request):
         """Obtiene las últimas 5 transacciones"""
         transactions = self.get_queryset()[:5]
-        serializer = StockTransactionSerializer(transactions, many=True)
+        serializer = self.get_serializer(transactions, many=True)
         return Response({
             'success': True,
             'count': len(transactions),
@@ -47,7 +127,7 @@ class StockTransactionViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def by_symbol(self, request):
-        """Obtiene transacciones filtradas por símbolo"""
+        """Obtiene transacciones filtradas por símbolo, paginadas por cursor"""
         symbol = request.query_params.get('symbol')
         if not symbol:
             return Response({
@@ -55,13 +135,108 @@ class StockTransactionViewSet(viewsets.ModelViewSet):
                 'message': 'Symbol parameter required'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        transactions = self.get_queryset().filter(symbol=symbol)
-        serializer = StockTransactionSerializer(transactions, many=True)
+        transactions = self.paginate_queryset(self.get_queryset().filter(symbol=symbol))
+        serializer = self.get_serializer(transactions, many=True)
         return Response({
             'success': True,
             'count': len(transactions),
+            'next': self.paginator.get_next_link(),
+            'previous': self.paginator.get_previous_link(),
             'transactions': serializer.data
         })
+    
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        """Totales de compras y ventas completadas, globales y por símbolo"""
+        portfolio, _ = Portfolio.objects.get_or_create(user=request.user)
+        totals = portfolio.get_transaction_totals()
+        
+        return Response({
+            'success': True,
+            'totals': as_floats(totals),
+            'symbols': [as_floats(row) for row in portfolio.get_symbol_totals().values()]
+        })
+    
+    @action(detail=False, methods=['get'])
+    def realized_pnl(self, request):
+        """
+        Ganancia realizada por las ventas en un rango de fechas, total y por símbolo.
+        Query: start y end (YYYY-MM-DD, opcionales)
+        """
+        try:
+            start, end = (
+                date.fromisoformat(request.query_params[key]) if request.query_params.get(key) else None
+                for key in ('start', 'end')
+            )
+        except ValueError:
+            return Response({
+                'success': False,
+                'message': 'start y end deben tener formato YYYY-MM-DD'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        portfolio, _ = Portfolio.objects.get_or_create(user=request.user)
+        realized = portfolio.get_realized_pnl(start, end)
+        return Response({
+            'success': True,
+            'cost_method': portfolio.cost_method,
+            'realized_pnl': float(realized['realized_pnl']),
+            'sells': realized['sells'],
+            'symbols': [as_floats(row) for row in realized['symbols'].values()]
+        })
+
+
+class OrderViewSet(viewsets.ModelViewSet):
+    """ViewSet para órdenes límite y stop"""
+    serializer_class = OrderSerializer
+    permission_classes = [IsAuthenticated]
+    # Una orden solo se crea o se cancela (POST cancel): nunca se edita
+    http_method_names = ['get', 'post', 'head', 'options']
+    # orders tiene el mismo índice (user, -created_at) que recorre el cursor
+    pagination_class = TransactionCursorPagination
+    ordering_fields = ['created_at']
+    ordering = ['-created_at']
+    
+    def get_queryset(self):
+        """Órdenes del usuario autenticado; ?status=open filtra por estado"""
+        queryset = Order.objects.filter(user=self.request.user).select_related('transaction')
+        order_status = self.request.query_params.get('status')
+        if order_status:
+            queryset = queryset.filter(status=order_status)
+        return queryset
+    
+    def create(self, request, *args, **kwargs):
+        """Crea una orden límite o stop que queda abierta hasta que el precio la dispare"""
+        serializer = OrderCreateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            order = TradeExecutionService.place_order(request.user, **serializer.validated_data)
+        except QuoteUnavailableError as e:
+            return Response({
+                'success': False,
+                'message': str(e)
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        except TradeError as e:
+            return Response({
+                'success': False,
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
+    
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        """Cancela una orden abierta y devuelve el balance apartado"""
+        try:
+            order = TradeExecutionService.cancel_order(request.user, self.get_object().pk)
+        except TradeError as e:
+            return Response({
+                'success': False,
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(OrderSerializer(order).data)
 
 
 class PortfolioViewSet(viewsets.ModelViewSet):
@@ -84,10 +259,31 @@ class PortfolioViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(portfolio)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['post'])
+    def cost_method(self, request):
+        """Cambia el método de costo (average, fifo, lifo) y recalcula posiciones y ganancias"""
+        serializer = CostMethodSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        method = serializer.validated_data['cost_method']
+        PositionService.set_cost_method(request.user.id, method)
+        return Response({
+            'success': True,
+            'cost_method': method
+        })
+    
     @action(detail=False, methods=['get'])
     def dashboard_stats(self, request):
-        """Retorna estadísticas del dashboard para el usuario"""
+        """
+        Retorna estadísticas del dashboard para el usuario.
+        La respuesta completa se cachea por usuario y se invalida con cada cambio
+        en sus transacciones, balance o depósitos (ver signals.py)
+        """
         user = request.user
+        cached_body, cache_version = DashboardCacheService.get(user.id)
+        if cached_body is not None:
+            return HttpResponse(cached_body, content_type='application/json')
         
         # Obtener o crear portafolio
         portfolio, _ = Portfolio.objects.get_or_create(user=user)
@@ -99,12 +295,9 @@ class PortfolioViewSet(viewsets.ModelViewSet):
         except:
             total_balance = Decimal('0')
         
-        # Calcular inversiones y ganancias
-        total_invested = portfolio.get_total_invested()
-        total_gains = portfolio.get_total_gains()
-        gains_percentage = Decimal('0')
-        if total_invested > 0:
-            gains_percentage = (total_gains / total_invested) * 100
+        # Inversión, valor y ganancias se calculan una sola vez (PortfolioSnapshot)
+        snapshot = portfolio.get_snapshot()
+        total_invested = snapshot.total_invested
         
         # Obtener últimas 5 transacciones
         recent_transactions = StockTransaction.objects.filter(
@@ -112,50 +305,79 @@ class PortfolioViewSet(viewsets.ModelViewSet):
             status='completed'
         ).order_by('-created_at')[:5]
         
-        # Generar datos para la gráfica de rendimiento (últimos 7 días)
-        performance_data = []
-        for i in range(6, -1, -1):
-            date = timezone.now() - timedelta(days=i)
-            date_str = date.strftime('%a')  # Lun, Mar, etc
-            
-            # Simular valor del portafolio en ese día
-            # En producción, esto debería ser más sofisticado
-            day_value = total_balance + (total_invested * (Decimal(i) / 6))
-            performance_data.append({
-                'date': date_str,
-                'value': float(day_value)
-            })
+        # Gráfica de rendimiento (últimos 7 días): valores diarios guardados por
+        # `snapshot_portfolio_values` más el valor en vivo de hoy
+        today = timezone.localdate()
+        performance_data = [
+            {'date': date.fromisoformat(point['date']).strftime('%a'), 'value': point['value']}
+            for point in PortfolioHistoryService.get_series(user.id, '1w')
+            if point['date'] >= (today - timedelta(days=6)).isoformat() and point['date'] < today.isoformat()
+        ]
+        performance_data.append({
+            'date': today.strftime('%a'),  # Lun, Mar, etc
+            'value': float(snapshot.current_value)
+        })
         
-        return Response({
+        valuation_totals, holdings = valuation_payload(snapshot.valuation)
+        body = DashboardCacheService.set(user.id, cache_version, {
             'success': True,
             'stats': {
                 'total_balance': float(total_balance),
                 'total_invested': float(total_invested),
-                'total_gains': float(total_gains),
-                'gains_percentage': float(gains_percentage),
-                'portfolio_value': float(total_balance + total_invested),
+                'total_gains': float(snapshot.total_gains),
+                'gains_percentage': float(snapshot.gains_percentage),
+                'portfolio_value': float(total_balance + snapshot.current_value),
+                'valuation': valuation_totals,
+                'holdings': holdings,
                 'recent_transactions': StockTransactionSerializer(recent_transactions, many=True).data,
                 'performance_data': performance_data
             }
         })
+        return HttpResponse(body, content_type='application/json')
+    
+    @action(detail=False, methods=['get'])
+    def performance(self, request):
+        """
+        Valor diario del portafolio para las gráficas de rendimiento.
+        Query: range (1w, 1m, 3m, 6m, 1y, all) y max_points
+        """
+        range_key = request.query_params.get('range', '1m')
+        try:
+            max_points = int(request.query_params.get('max_points', settings.HISTORY_DEFAULT_MAX_POINTS))
+        except ValueError:
+            return Response({
+                'success': False,
+                'message': 'max_points debe ser un número entero'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            data = PortfolioHistoryService.get_series(
+                request.user.id,
+                range_key,
+                max_points=min(max(max_points, 10), settings.HISTORY_MAX_POINTS_LIMIT),
+            )
+        except ValueError as e:
+            return Response({
+                'success': False,
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'success': True,
+            'range': range_key,
+            'count': len(data),
+            'data': data
+        })
     
     @action(detail=False, methods=['get'])
     def holdings(self, request):
-        """Retorna los holdings actuales del portafolio"""
+        """Retorna los holdings actuales del portafolio valorizados a precio de mercado"""
         portfolio = self.get_object()
-        holdings = portfolio.get_portfolio_holdings()
+        totals, holdings = valuation_payload(portfolio.get_snapshot().valuation)
         
         return Response({
             'success': True,
             'count': len(holdings),
-            'holdings': [
-                {
-                    'symbol': h['symbol'],
-                    'name': h['name'],
-                    'shares': float(h['shares']),
-                    'average_price': float(h['average_price']),
-                    'total_invested': float(h['total_invested']),
-                }
-                for h in holdings.values()
-            ]
+            'totals': totals,
+            'holdings': holdings
         })
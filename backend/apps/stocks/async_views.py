@@ -0,0 +1,275 @@
+"""
+Variantes asíncronas (ASGI) de los endpoints de mercado de StocksViewSet.
+
+Mismas respuestas que /api/stocks/..., servidas en /api/stocks/async/...
+Con un servidor ASGI (uvicorn, daphne) cada petición espera a Yahoo en el event
+loop en lugar de retener un hilo; las llamadas al servicio externo se reparten en
+paralelo sobre el pool compartido con concurrencia acotada (ASYNC_UPSTREAM_CONCURRENCY).
+"""
+import json
+import time
+import logging
+import functools
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+from rest_framework.exceptions import APIException, Throttled
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from services.async_market_service import AsyncMarketService
+from services.quote_stream import get_quote_hub
+from services.yahoo_finance_service import YahooFinanceService
+from apps.stocks.views import history_params, partial_stock_detail
+
+logger = logging.getLogger(__name__)
+
+
+def error_response(message, status):
+    return JsonResponse({'success': False, 'message': message}, status=status)
+
+
+def check_throttles(request):
+    """Autenticación y throttling de DRF (DEFAULT_*_CLASSES), igual que en StocksViewSet"""
+    drf_request = Request(
+        request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    )
+    waits = []
+    for throttle_class in api_settings.DEFAULT_THROTTLE_CLASSES:
+        throttle = throttle_class()
+        if not throttle.allow_request(drf_request, None):
+            waits.append(throttle.wait())
+    if waits:
+        waits = [wait for wait in waits if wait is not None]
+        raise Throttled(max(waits) if waits else None)
+
+
+def market_view(view):
+    """
+    Solo GET y check_throttles antes de la vista asíncrona
+    (require_GET de Django 4.2 no admite vistas async)
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET'])
+        try:
+            await sync_to_async(check_throttles)(request)
+        except APIException as e:
+            response = JsonResponse({'detail': str(e.detail)}, status=e.status_code)
+            if isinstance(e, Throttled) and e.wait is not None:
+                response['Retry-After'] = str(int(e.wait))
+            return response
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+async def snapshot_response(endpoint):
+    """Respuesta pre-serializada del snapshot o None si no hay uno vigente"""
+    try:
+        body = await AsyncMarketService.get_snapshot(endpoint)
+    except Exception as e:
+        logger.warning(f"Error leyendo snapshot {endpoint}: {str(e)}")
+        return None
+    if body is None:
+        return None
+    return HttpResponse(body, content_type='application/json')
+
+
+@market_view
+async def popular(request):
+    """GET /api/stocks/async/popular/"""
+    cached = await snapshot_response('popular')
+    if cached is not None:
+        return cached
+
+    try:
+        stocks = await AsyncMarketService.get_popular_stocks()
+        return JsonResponse({
+            'success': True,
+            'stocks': stocks,
+            'count': len(stocks)
+        })
+    except Exception as e:
+        logger.error(f"Error obteniendo acciones populares: {str(e)}")
+        return error_response('Error obteniendo datos de acciones', 500)
+
+
+@market_view
+async def market_data(request):
+    """GET /api/stocks/async/market_data/"""
+    cached = await snapshot_response('market_data')
+    if cached is not None:
+        return cached
+
+    try:
+        data = await AsyncMarketService.get_all_market_data()
+        return JsonResponse({
+            'success': True,
+            'data': data
+        })
+    except Exception as e:
+        logger.error(f"Error obteniendo datos del mercado: {str(e)}")
+        return error_response('Error obteniendo datos del mercado', 500)
+
+
+@market_view
+async def cryptos(request):
+    """GET /api/stocks/async/cryptos/"""
+    cached = await snapshot_response('cryptos')
+    if cached is not None:
+        return cached
+
+    try:
+        cryptos = await AsyncMarketService.get_popular_cryptos()
+        return JsonResponse({
+            'success': True,
+            'cryptos': cryptos,
+            'count': len(cryptos)
+        })
+    except Exception as e:
+        logger.error(f"Error obteniendo criptomonedas: {str(e)}")
+        return error_response('Error obteniendo criptomonedas', 500)
+
+
+@market_view
+async def search(request):
+    """GET /api/stocks/async/search/?symbol=AAPL"""
+    symbol = request.GET.get('symbol')
+    if not symbol:
+        return error_response('Símbolo requerido', 400)
+
+    try:
+        stock = await AsyncMarketService.search_stock(symbol)
+        if not stock:
+            return error_response(f'No se encontró {symbol}', 404)
+        return JsonResponse({
+            'success': True,
+            'stock': stock
+        })
+    except Exception as e:
+        logger.error(f"Error buscando {symbol}: {str(e)}")
+        return error_response('Error buscando acción', 500)
+
+
+@market_view
+async def history(request):
+    """GET /api/stocks/async/history/?symbol=AAPL&period=5y&interval=1d&max_points=300&method=ohlc"""
+    symbol = request.GET.get('symbol')
+    if not symbol:
+        return error_response('Símbolo requerido', 400)
+
+    try:
+        params = history_params(request.GET)
+        historical = await AsyncMarketService.get_history(symbol, **params)
+        return JsonResponse({
+            'success': True,
+            'symbol': symbol.upper(),
+            'period': params['period'],
+            'interval': params['interval'],
+            'historical': historical,
+            'count': len(historical),
+            'timestamp': datetime.now().isoformat()
+        })
+    except ValueError as e:
+        return error_response(str(e), 400)
+    except Exception as e:
+        logger.error(f"Error obteniendo histórico de {symbol}: {str(e)}")
+        return JsonResponse({
+            'success': False,
+            'message': f'Error obteniendo histórico para {symbol}',
+            'historical': [],
+            'timestamp': datetime.now().isoformat()
+        }, status=500)
+
+
+@market_view
+async def detail(request):
+    """GET /api/stocks/async/detail/?symbol=AAPL"""
+    symbol = request.GET.get('symbol')
+    if not symbol:
+        return error_response('Símbolo requerido', 400)
+
+    try:
+        stock = await AsyncMarketService.get_stock_detail(symbol)
+        if not stock:
+            return error_response(f'No se encontró {symbol}', 404)
+        return JsonResponse({
+            'success': True,
+            'stock': stock
+        })
+    except Exception as e:
+        logger.error(f"Error obteniendo detalles de {symbol}: {str(e)}")
+        return JsonResponse({
+            'success': True,
+            'stock': partial_stock_detail(symbol),
+            'message': 'Datos parciales - algunos campos no disponibles'
+        })
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def quote_events(symbols):
+    """
+    Genera el stream SSE: un evento `snapshot` con todas las cotizaciones y luego
+    eventos `quotes` solo con las que cambiaron. Sin cambios se envía un comentario
+    como heartbeat. La conexión se cierra tras QUOTE_STREAM_MAX_DURATION segundos
+    y EventSource reconecta solo (así no quedan streams huérfanos en Django 4.2,
+    que no detecta la desconexión del cliente).
+    """
+    hub = get_quote_hub()
+    subscriber = hub.subscribe(symbols)
+    heartbeat = getattr(settings, 'QUOTE_STREAM_HEARTBEAT', 15)
+    deadline = time.monotonic() + getattr(settings, 'QUOTE_STREAM_MAX_DURATION', 300)
+    try:
+        yield f"retry: {getattr(settings, 'QUOTE_STREAM_RETRY_MS', 3000)}\n\n"
+        quotes = await hub.snapshot(subscriber)
+        yield sse_event('snapshot', {
+            'quotes': [quotes[symbol] for symbol in symbols if symbol in quotes],
+            'timestamp': datetime.now().isoformat()
+        })
+        while time.monotonic() < deadline:
+            changes = await subscriber.next_changes(heartbeat)
+            if not changes:
+                yield ': heartbeat\n\n'
+                continue
+            yield sse_event('quotes', {
+                'quotes': list(changes.values()),
+                'timestamp': datetime.now().isoformat()
+            })
+    finally:
+        hub.unsubscribe(subscriber)
+
+
+@market_view
+async def stream(request):
+    """
+    Stream de cotizaciones en tiempo real (Server-Sent Events, requiere ASGI)
+    GET /api/stocks/async/stream/?symbols=AAPL,MSFT,BTC-USD
+    Sin `symbols` se observan las acciones y criptomonedas populares
+    """
+    if not isinstance(request, ASGIRequest):
+        # Bajo WSGI la respuesta se consume completa antes de enviarse: el cliente no
+        # recibiría ningún evento y el worker quedaría tomado por el stream
+        return error_response('El stream de cotizaciones requiere un servidor ASGI (uvicorn)', 503)
+
+    requested = request.GET.get('symbols')
+    if requested:
+        symbols = list(dict.fromkeys(s.strip().upper() for s in requested.split(',') if s.strip()))
+    else:
+        symbols = YahooFinanceService.POPULAR_STOCKS + YahooFinanceService.POPULAR_CRYPTOS
+
+    max_symbols = getattr(settings, 'QUOTE_STREAM_MAX_SYMBOLS', 100)
+    if not symbols or len(symbols) > max_symbols:
+        return error_response(f'Se requieren entre 1 y {max_symbols} símbolos', 400)
+
+    response = StreamingHttpResponse(quote_events(symbols), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # nginx no debe acumular el stream en su buffer
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,70 @@
+import signal
+import time
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from services.market_snapshot_service import MarketSnapshotService
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Proceso de ingesta de datos de mercado.
+
+    Refresca periódicamente las cotizaciones de POPULAR_STOCKS y POPULAR_CRYPTOS
+    y publica un snapshot versionado que leen /api/stocks/popular/, /cryptos/
+    y /market_data/. La carga hacia Yahoo no depende del número de usuarios.
+    Requiere REDIS_URL para compartir el snapshot con los workers web.
+
+    Uso:
+        python manage.py ingest_market_data
+        python manage.py ingest_market_data --interval 15
+        python manage.py ingest_market_data --once
+    """
+
+    help = 'Refresca periódicamente los snapshots de acciones y criptomonedas populares'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=getattr(settings, 'MARKET_DATA_INGEST_INTERVAL', 30),
+            help='Segundos entre refrescos (por defecto MARKET_DATA_INGEST_INTERVAL)'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Publica un solo snapshot y termina'
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        self._running = True
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        self.stdout.write(f"Ingesta de mercado iniciada (cada {interval}s)")
+        while self._running:
+            started = time.monotonic()
+            try:
+                version = MarketSnapshotService.refresh()
+                elapsed = time.monotonic() - started
+                self.stdout.write(f"Snapshot v{version} publicado en {elapsed:.2f}s")
+            except Exception as e:
+                logger.error(f"Error en la ingesta de datos de mercado: {str(e)}")
+
+            if options['once']:
+                break
+
+            # Dormir en pasos cortos para responder rápido a SIGTERM
+            next_run = started + interval
+            while self._running and time.monotonic() < next_run:
+                time.sleep(min(0.5, max(0.0, next_run - time.monotonic())))
+
+        self.stdout.write('Ingesta de mercado detenida')
+
+    def _stop(self, signum, frame):
+        self._running = False
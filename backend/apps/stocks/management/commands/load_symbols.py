@@ -0,0 +1,139 @@
+import csv
+import logging
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from apps.stocks.models import Symbol
+from services.symbol_index import publish_directory_version
+from services.yahoo_finance_service import YahooFinanceService
+
+logger = logging.getLogger(__name__)
+
+NASDAQ_LISTED_URL = 'https://www.nasdaqtrader.com/dynamic/SymDir/nasdaqlisted.txt'
+OTHER_LISTED_URL = 'https://www.nasdaqtrader.com/dynamic/SymDir/otherlisted.txt'
+
+# Códigos de mercado de otherlisted.txt
+EXCHANGES = {
+    'A': 'NYSE American',
+    'N': 'NYSE',
+    'P': 'NYSE Arca',
+    'Z': 'Cboe BZX',
+    'V': 'IEX',
+}
+
+CRYPTO_NAMES = {
+    'BTC-USD': 'Bitcoin USD',
+    'ETH-USD': 'Ethereum USD',
+    'BNB-USD': 'BNB USD',
+    'XRP-USD': 'XRP USD',
+    'ADA-USD': 'Cardano USD',
+    'SOL-USD': 'Solana USD',
+    'DOGE-USD': 'Dogecoin USD',
+    'DOT-USD': 'Polkadot USD',
+}
+
+
+class Command(BaseCommand):
+    """
+    Carga el directorio local de símbolos que usa el buscador (/api/stocks/typeahead/).
+
+    Por defecto descarga los listados de NASDAQ Trader (NASDAQ, NYSE, NYSE American,
+    NYSE Arca, ...) y agrega las criptomonedas populares. Con --file se carga un CSV
+    con columnas symbol,name,exchange,asset_class.
+
+    Uso:
+        python manage.py load_symbols
+        python manage.py load_symbols --file simbolos.csv
+        python manage.py load_symbols --replace
+    """
+
+    help = 'Carga el directorio de símbolos para la búsqueda por prefijo y aproximada'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', help='CSV con columnas symbol,name,exchange,asset_class')
+        parser.add_argument(
+            '--replace',
+            action='store_true',
+            help='Elimina los símbolos que ya no aparecen en los listados'
+        )
+
+    def handle(self, *args, **options):
+        if options['file']:
+            rows = self._read_csv(options['file'])
+        else:
+            rows = self._download_listings()
+        for symbol in YahooFinanceService.POPULAR_CRYPTOS:
+            rows.setdefault(symbol, (CRYPTO_NAMES.get(symbol, symbol), 'CCC', 'crypto'))
+
+        symbols = [
+            Symbol(symbol=symbol, name=name[:255], exchange=exchange, asset_class=asset_class)
+            for symbol, (name, exchange, asset_class) in rows.items()
+        ]
+        with transaction.atomic():
+            Symbol.objects.bulk_create(
+                symbols,
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=['symbol'],
+                update_fields=['name', 'exchange', 'asset_class', 'updated_at'],
+            )
+            removed = 0
+            if options['replace']:
+                removed, _ = Symbol.objects.exclude(symbol__in=list(rows)).delete()
+
+        publish_directory_version()
+        self.stdout.write(self.style.SUCCESS(
+            f"Directorio actualizado: {len(symbols)} símbolos cargados, {removed} eliminados"
+        ))
+
+    def _read_csv(self, path):
+        rows = {}
+        try:
+            with open(path, newline='', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    symbol = row['symbol'].strip().upper()
+                    if symbol:
+                        rows[symbol] = (
+                            row.get('name', '').strip() or symbol,
+                            row.get('exchange', '').strip(),
+                            row.get('asset_class', '').strip() or YahooFinanceService.get_asset_class(symbol),
+                        )
+        except (OSError, KeyError) as e:
+            raise CommandError(f"No se pudo leer {path}: {str(e)}")
+        return rows
+
+    def _download_listings(self):
+        rows = {}
+        try:
+            nasdaq = self._fetch(NASDAQ_LISTED_URL)
+            other = self._fetch(OTHER_LISTED_URL)
+        except requests.RequestException as e:
+            raise CommandError(f"No se pudieron descargar los listados: {str(e)}")
+
+        for row in nasdaq:
+            if row.get('Test Issue') == 'Y':
+                continue
+            asset_class = 'etf' if row.get('ETF') == 'Y' else 'stock'
+            rows[self._yahoo_symbol(row['Symbol'])] = (row['Security Name'], 'NASDAQ', asset_class)
+        for row in other:
+            if row.get('Test Issue') == 'Y':
+                continue
+            asset_class = 'etf' if row.get('ETF') == 'Y' else 'stock'
+            exchange = EXCHANGES.get(row.get('Exchange'), row.get('Exchange', ''))
+            rows[self._yahoo_symbol(row['ACT Symbol'])] = (row['Security Name'], exchange, asset_class)
+        return rows
+
+    @staticmethod
+    def _fetch(url):
+        """Descarga un listado delimitado por '|' (la última línea es la fecha del archivo)"""
+        response = requests.get(url, timeout=30)
+        response.raise_for_status()
+        lines = [line for line in response.text.splitlines() if line and not line.startswith('File Creation Time')]
+        return list(csv.DictReader(lines, delimiter='|'))
+
+    @staticmethod
+    def _yahoo_symbol(symbol):
+        """BRK.B -> BRK-B (formato de Yahoo para clases de acciones)"""
+        return symbol.strip().upper().replace('.', '-').replace('$', '-P')
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-17 20:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Symbol',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('symbol', models.CharField(max_length=20, unique=True)),
+                ('name', models.CharField(max_length=255)),
+                ('exchange', models.CharField(blank=True, max_length=50)),
+                ('asset_class', models.CharField(choices=[('stock', 'Acción'), ('etf', 'ETF'), ('crypto', 'Criptomoneda'), ('index', 'Índice')], default='stock', max_length=10)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'symbols',
+                'ordering': ['symbol'],
+            },
+        ),
+    ]
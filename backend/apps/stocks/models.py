@@ -0,0 +1,47 @@
+from django.db import models
+
+
+class PriceBar(models.Model):
+    """Barra diaria OHLCV almacenada localmente para no volver a descargar el histórico"""
+    symbol = models.CharField(max_length=20)  # AAPL, BTC-USD, etc
+    date = models.DateField()
+    open = models.FloatField()
+    high = models.FloatField()
+    low = models.FloatField()
+    close = models.FloatField()
+    volume = models.BigIntegerField(default=0)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'price_bars'
+        constraints = [
+            models.UniqueConstraint(fields=['symbol', 'date'], name='unique_price_bar_symbol_date'),
+        ]
+    
+    def __str__(self):
+        return f"{self.symbol} {self.date} C:{self.close}"
+
+
+class Symbol(models.Model):
+    """Directorio local de símbolos para el buscador (se carga con `load_symbols`)"""
+    ASSET_CLASS_CHOICES = [
+        ('stock', 'Acción'),
+        ('etf', 'ETF'),
+        ('crypto', 'Criptomoneda'),
+        ('index', 'Índice'),
+    ]
+    
+    symbol = models.CharField(max_length=20, unique=True)  # Formato de Yahoo: BRK-B, BTC-USD
+    name = models.CharField(max_length=255)
+    exchange = models.CharField(max_length=50, blank=True)
+    asset_class = models.CharField(max_length=10, choices=ASSET_CLASS_CHOICES, default='stock')
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'symbols'
+        ordering = ['symbol']
+    
+    def __str__(self):
+        return f"{self.symbol} - {self.name}"
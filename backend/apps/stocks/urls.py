@@ -0,0 +1,13 @@
+from django.urls import path
+from . import async_views
+
+# Endpoints asíncronos (ASGI); los síncronos los registra el router en TikalInvest/urls.py
+urlpatterns = [
+    path('popular/', async_views.popular, name='stocks-async-popular'),
+    path('market_data/', async_views.market_data, name='stocks-async-market-data'),
+    path('cryptos/', async_views.cryptos, name='stocks-async-cryptos'),
+    path('search/', async_views.search, name='stocks-async-search'),
+    path('history/', async_views.history, name='stocks-async-history'),
+    path('detail/', async_views.detail, name='stocks-async-detail'),
+    path('stream/', async_views.stream, name='stocks-async-stream'),
+]
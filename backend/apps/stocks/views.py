@@ -1,15 +1,83 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.throttling import UserRateThrottle
+from django.conf import settings
+from django.http import HttpResponse
 import logging
 from datetime import datetime
 
 from services.yahoo_finance_service import YahooFinanceService
+from services.market_snapshot_service import MarketSnapshotService
+from services.symbol_index import get_symbol_index
+from apps.admin_panel.views import IsAdmin
 
 logger = logging.getLogger(__name__)
 
 
+def snapshot_response(endpoint):
+    """
+    Retorna la respuesta pre-serializada publicada por `ingest_market_data`
+    o None si no hay snapshot vigente (en ese caso la vista consulta en vivo)
+    """
+    body = MarketSnapshotService.get_payload(endpoint)
+    if body is None:
+        return None
+    return HttpResponse(body, content_type='application/json')
+
+
+def history_params(query_params):
+    """
+    Lee period, interval, max_points y method de la query de /history.
+    max_points se limita a [10, HISTORY_MAX_POINTS_LIMIT]; lanza ValueError si no es entero
+    o si Yahoo no entrega el intervalo para ese periodo (p. ej. 1m solo los últimos 7 días)
+    """
+    try:
+        max_points = int(query_params.get('max_points', settings.HISTORY_DEFAULT_MAX_POINTS))
+    except (TypeError, ValueError):
+        raise ValueError('max_points debe ser un número entero')
+    period = query_params.get('period', '1y')
+    interval = query_params.get('interval', '1d')
+    YahooFinanceService.check_history_range(period, interval)
+    return {
+        'period': period,
+        'interval': interval,
+        'max_points': min(max(max_points, 10), settings.HISTORY_MAX_POINTS_LIMIT),
+        'method': query_params.get('method', 'ohlc'),
+    }
+
+
+def partial_stock_detail(symbol):
+    """Detalle con N/A que se devuelve cuando falla la carga de /detail"""
+    return {
+        'symbol': symbol.upper(),
+        'name': symbol.upper(),
+        'price': 'N/A',
+        'change': 'N/A',
+        'changePercent': 'N/A',
+        'volume': 'N/A',
+        'marketCap': 'N/A',
+        'sector': 'N/A',
+        'industry': 'N/A',
+        'beta': 'N/A',
+        'pe': 'N/A',
+        'dividend': 'N/A',
+        'dividendYield': 'N/A',
+        '52WeekHigh': 'N/A',
+        '52WeekLow': 'N/A',
+        'description': f'No se pudo cargar información para {symbol}',
+        'currency': 'USD',
+        'historicalData': [],
+        'lastUpdate': datetime.now().isoformat()
+    }
+
+
+class TypeaheadRateThrottle(UserRateThrottle):
+    """El typeahead se llama en cada tecla: límite propio, por usuario o por IP"""
+    scope = 'typeahead'
+
+
 class StocksViewSet(viewsets.ViewSet):
     """ViewSet para obtener datos de acciones desde Yahoo Finance"""
     
@@ -21,6 +89,10 @@ class StocksViewSet(viewsets.ViewSet):
         Obtiene las acciones más populares
         GET /api/stocks/popular/
         """
+        cached = snapshot_response('popular')
+        if cached is not None:
+            return cached
+        
         try:
             stocks = YahooFinanceService.get_popular_stocks()
             return Response({
@@ -41,6 +113,10 @@ class StocksViewSet(viewsets.ViewSet):
         Obtiene datos del mercado (acciones + criptos)
         GET /api/stocks/market_data/
         """
+        cached = snapshot_response('market_data')
+        if cached is not None:
+            return cached
+        
         try:
             data = YahooFinanceService.get_all_market_data()
             return Response({
@@ -60,6 +136,10 @@ class StocksViewSet(viewsets.ViewSet):
         Obtiene criptomonedas populares
         GET /api/stocks/cryptos/
         """
+        cached = snapshot_response('cryptos')
+        if cached is not None:
+            return cached
+        
         try:
             cryptos = YahooFinanceService.get_popular_cryptos()
             return Response({
@@ -77,8 +157,8 @@ class StocksViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['get'])
     def search(self, request):
         """
-        Busca una acción por símbolo
-        GET /api/stocks/search/?symbol=AAPL
+        Busca una acción por símbolo o nombre (el mejor resultado del directorio local)
+        GET /api/stocks/search/?symbol=AAPL  o  ?symbol=apple
         """
         symbol = request.query_params.get('symbol')
         
@@ -108,6 +188,26 @@ class StocksViewSet(viewsets.ViewSet):
                 'message': 'Error buscando acción'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
+    @action(detail=False, methods=['get'], throttle_classes=[TypeaheadRateThrottle])
+    def typeahead(self, request):
+        """
+        Sugerencias por prefijo de símbolo o nombre, con tolerancia a errores de tipeo.
+        Responde desde el índice en memoria, sin llamar a Yahoo
+        GET /api/stocks/typeahead/?q=appl&limit=10
+        """
+        query = request.query_params.get('q', '')
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+        except ValueError:
+            limit = 10
+        
+        results = get_symbol_index().search(query, limit=limit) if query.strip() else []
+        return Response({
+            'success': True,
+            'results': results,
+            'count': len(results)
+        })
+    
     @action(detail=False, methods=['get'])
     def get_stock(self, request):
         """
@@ -142,12 +242,38 @@ class StocksViewSet(viewsets.ViewSet):
                 'message': 'Error obteniendo acción'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated, IsAdmin])
+    def cache_stats(self, request):
+        """
+        Retorna los contadores de la caché de cotizaciones (solo administradores)
+        GET /api/stocks/cache_stats/
+        """
+        return Response({
+            'success': True,
+            'cache': YahooFinanceService.get_cache_stats()
+        })
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated, IsAdmin])
+    def upstream_status(self, request):
+        """
+        Estado del circuit breaker y del rate limiter de Yahoo Finance (solo administradores)
+        GET /api/stocks/upstream_status/
+        """
+        return Response({
+            'success': True,
+            'upstream': YahooFinanceService.get_upstream_status()
+        })
+    
     @action(detail=False, methods=['get'])
     def history(self, request):
         """
-        Obtiene datos históricos de 1 año para una acción
-        GET /api/stocks/history/?symbol=AAPL
-        Devuelve array de datos diarios con fecha, close, high, low, volume
+        Obtiene datos históricos de una acción
+        GET /api/stocks/history/?symbol=AAPL&period=5y&interval=1d&max_points=300&method=ohlc
+        period: 1d, 5d, 1mo, 3mo, 6mo, ytd, 1y (por defecto), 2y, 5y, 10y, max
+        interval: 1m, 2m, 5m, 15m, 30m, 60m, 90m, 1h, 1d (por defecto), 1wk, 1mo
+        max_points: máximo de puntos a devolver (la serie se agrega en el servidor)
+        method: ohlc (cubetas OHLC, por defecto) o lttb
+        Devuelve array de datos con fecha, open, close, high, low, volume
         """
         symbol = request.query_params.get('symbol')
         
@@ -158,15 +284,23 @@ class StocksViewSet(viewsets.ViewSet):
             }, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            historical = YahooFinanceService.get_historical_data(symbol)
+            params = history_params(request.query_params)
+            historical = YahooFinanceService.get_history(symbol, **params)
             
             return Response({
                 'success': True,
                 'symbol': symbol.upper(),
+                'period': params['period'],
+                'interval': params['interval'],
                 'historical': historical,
                 'count': len(historical),
                 'timestamp': datetime.now().isoformat()
             })
+        except ValueError as e:
+            return Response({
+                'success': False,
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             logger.error(f"Error obteniendo histórico de {symbol}: {str(e)}")
             return Response({
@@ -176,8 +310,9 @@ class StocksViewSet(viewsets.ViewSet):
                 'timestamp': datetime.now().isoformat()
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
-    @action(detail=False, methods=['get'])
-    def detail(self, request):
+    # `detail` es un atributo que DRF asigna a cada ViewSet; la acción usa otro nombre
+    @action(detail=False, methods=['get'], url_path='detail')
+    def stock_detail(self, request):
         """
         Obtiene información detallada de una acción incluyendo histórico
         GET /api/stocks/detail/?symbol=AAPL
@@ -210,26 +345,6 @@ class StocksViewSet(viewsets.ViewSet):
             # Retornar respuesta con error pero con datos parciales disponibles
             return Response({
                 'success': True,  # Cambiado a True para que el frontend lo acepte
-                'stock': {
-                    'symbol': symbol.upper(),
-                    'name': symbol.upper(),
-                    'price': 'N/A',
-                    'change': 'N/A',
-                    'changePercent': 'N/A',
-                    'volume': 'N/A',
-                    'marketCap': 'N/A',
-                    'sector': 'N/A',
-                    'industry': 'N/A',
-                    'beta': 'N/A',
-                    'pe': 'N/A',
-                    'dividend': 'N/A',
-                    'dividendYield': 'N/A',
-                    '52WeekHigh': 'N/A',
-                    '52WeekLow': 'N/A',
-                    'description': f'No se pudo cargar información para {symbol}',
-                    'currency': 'USD',
-                    'historicalData': [],
-                    'lastUpdate': datetime.now().isoformat()
-                },
+                'stock': partial_stock_detail(symbol),
                 'message': 'Datos parciales - algunos campos no disponibles'
             })
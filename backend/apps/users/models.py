@@ -1,5 +1,5 @@
 import uuid
-from django.db import models
+from django.db import models, transaction, connection
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import EmailValidator
 from django.utils import timezone
@@ -154,20 +154,51 @@ class UserBalance(models.Model):
     def __str__(self):
         return f"{self.user.email} - Balance: ${self.available_balance}"
     
+    @classmethod
+    def lock(cls, user_id):
+        """
+        Balance del usuario bloqueado (select_for_update) hasta el final de la
+        transacción en curso. Todo lo que modifica el balance pasa por acá
+        """
+        if not connection.features.has_select_for_update:
+            # SQLite (desarrollo) no bloquea filas: escribir primero toma el lock de
+            # escritura de la base antes de leer el balance
+            cls.objects.filter(user_id=user_id).update(updated_at=timezone.now())
+        balance, _ = cls.objects.get_or_create(user_id=user_id)
+        return cls.objects.select_for_update().get(pk=balance.pk)
+    
+    def _apply_locked(self, change):
+        """Aplica `change` sobre el balance bloqueado y copia el resultado a esta instancia"""
+        with transaction.atomic():
+            balance = UserBalance.lock(self.user_id)
+            applied = change(balance)
+            if applied:
+                balance.save(update_fields=[
+                    'available_balance', 'total_deposits', 'total_withdrawals', 'updated_at'
+                ])
+        for field in ('available_balance', 'total_deposits', 'total_withdrawals', 'updated_at'):
+            setattr(self, field, getattr(balance, field))
+        return applied
+    
     def add_balance(self, amount):
         """Agrega dinero al balance disponible"""
-        self.available_balance += amount
-        self.total_deposits += amount
-        self.save()
+        def add(balance):
+            balance.available_balance += amount
+            balance.total_deposits += amount
+            return True
+        
+        self._apply_locked(add)
     
     def subtract_balance(self, amount):
         """Resta dinero del balance disponible"""
-        if self.available_balance >= amount:
-            self.available_balance -= amount
-            self.total_withdrawals += amount
-            self.save()
+        def subtract(balance):
+            if balance.available_balance < amount:
+                return False
+            balance.available_balance -= amount
+            balance.total_withdrawals += amount
             return True
-        return False
+        
+        return self._apply_locked(subtract)
 
 
 class DepositTransaction(models.Model):
@@ -202,13 +233,17 @@ class DepositTransaction(models.Model):
     
     def complete_deposit(self):
         """Completa el depósito y actualiza el balance"""
-        if self.status == 'pending':
+        with transaction.atomic():
+            # Mismo orden de bloqueo que las órdenes: primero el balance
+            user_balance = UserBalance.lock(self.user_id)
+            deposit = DepositTransaction.objects.select_for_update().get(pk=self.pk)
+            if deposit.status != 'pending':
+                return
             self.status = 'completed'
             self.completed_at = timezone.now()
             self.save()
             
             # Actualizar balance del usuario
-            user_balance, created = UserBalance.objects.get_or_create(user=self.user)
             user_balance.add_balance(self.amount)
 
 
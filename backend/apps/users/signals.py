@@ -1,6 +1,7 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from .models import User, UserBalance
+from .models import User, UserBalance, DepositTransaction
+from services.dashboard_cache_service import DashboardCacheService
 
 
 @receiver(post_save, sender=User)
@@ -10,8 +11,10 @@ def create_user_balance(sender, instance, created, **kwargs):
         UserBalance.objects.get_or_create(user=instance)
 
 
-@receiver(post_save, sender=User)
-def save_user_balance(sender, instance, **kwargs):
-    """Guarda el UserBalance del usuario"""
-    if hasattr(instance, 'balance'):
-        instance.balance.save()
+@receiver(post_save, sender=UserBalance)
+@receiver(post_delete, sender=UserBalance)
+@receiver(post_save, sender=DepositTransaction)
+@receiver(post_delete, sender=DepositTransaction)
+def invalidate_dashboard(sender, instance, **kwargs):
+    """El balance o los depósitos cambiaron: descarta el dashboard cacheado del usuario"""
+    DashboardCacheService.invalidate(instance.user_id)
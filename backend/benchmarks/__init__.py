@@ -0,0 +1,26 @@
+"""Benchmarks de las rutas críticas del backend (se ejecutan con `python -m benchmarks.<nombre>`)"""
+import os
+import sqlite3
+
+# Conexión que mantiene viva la base en memoria compartida entre hilos (ver settings.py)
+_keepalive = None
+
+
+def setup_django(migrate=False):
+    """
+    Configura Django con benchmarks.settings (SQLite en memoria, caché local).
+    Con migrate=True crea las tablas, para los benchmarks que usan la base de datos.
+    """
+    global _keepalive
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+    import django
+    django.setup()
+
+    from django.conf import settings
+    database = settings.DATABASES['default']
+    if database['ENGINE'] == 'django.db.backends.sqlite3':
+        _keepalive = sqlite3.connect(database['NAME'], uri=True)
+    if migrate:
+        from django.core.management import call_command
+        call_command('migrate', verbosity=0)
@@ -0,0 +1,134 @@
+"""
+Prueba de carga: vistas síncronas (/api/stocks/search/) contra las asíncronas
+(/api/stocks/async/search/) con un Yahoo simulado con latencia fija.
+
+Cada petición usa un símbolo distinto para que ninguna se sirva de la caché y
+todas lleguen al servicio externo. Ambos modos usan el mismo presupuesto de
+hilos: las vistas síncronas se ejecutan con --threads hilos (como un worker
+gthread de gunicorn); las asíncronas con todas las peticiones en vuelo sobre un
+único event loop y --threads hilos en el pool de Yahoo. Por defecto --threads es
+YAHOO_POOL_MAX_WORKERS y ASYNC_UPSTREAM_CONCURRENCY queda con su valor
+configurado, es decir, se mide la configuración por defecto. Todas las peticiones
+llegan a la vez y la latencia se mide desde esa llegada en ambos modos.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_async_views
+    python -m benchmarks.bench_async_views --requests 2000 --latency 0.2 --threads 16
+"""
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import setup_django
+
+setup_django(migrate=True)
+
+from django.conf import settings  # noqa: E402
+from django.test import AsyncClient, Client  # noqa: E402
+
+from benchmarks.fake_yfinance import FakeYahoo  # noqa: E402
+from services.upstream_pool import yahoo_pool  # noqa: E402
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+class PeakTracker:
+    """Cuenta cuántas llamadas a Yahoo simulado hay en curso a la vez"""
+
+    def __init__(self, fake):
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+        original = fake._call
+
+        def tracked(kind):
+            with self._lock:
+                self.in_flight += 1
+                self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            try:
+                original(kind)
+            finally:
+                with self._lock:
+                    self.in_flight -= 1
+
+        fake._call = tracked
+
+
+def report(name, latencies, elapsed, upstream):
+    print(
+        f"{name:<6} {len(latencies) / elapsed:>9.1f} req/s   "
+        f"p50 {statistics.median(latencies) * 1000:>7.1f} ms   "
+        f"p95 {percentile(latencies, 95) * 1000:>7.1f} ms   "
+        f"p99 {percentile(latencies, 99) * 1000:>7.1f} ms   "
+        f"yahoo en paralelo (pico) {upstream.peak_in_flight:>4}"
+    )
+
+
+def run_sync(total, threads, prefix):
+    client = Client()
+
+    def one(i):
+        response = client.get('/api/stocks/search/', {'symbol': f'{prefix}{i}'})
+        assert response.status_code == 200, response.content
+        # Todas las peticiones llegan juntas: la latencia incluye la espera por un hilo
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        latencies = list(executor.map(one, range(total)))
+    return latencies, time.perf_counter() - started
+
+
+async def run_async(total, prefix):
+    client = AsyncClient()
+
+    async def one(i):
+        response = await client.get('/api/stocks/async/search/', {'symbol': f'{prefix}{i}'})
+        assert response.status_code == 200, response.content
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    latencies = await asyncio.gather(*[one(i) for i in range(total)])
+    return latencies, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.1, help='latencia simulada de Yahoo (s)')
+    parser.add_argument('--threads', type=int, default=settings.YAHOO_POOL_MAX_WORKERS,
+                        help='hilos del servidor síncrono y del pool de Yahoo (YAHOO_POOL_MAX_WORKERS)')
+    parser.add_argument('--upstream-concurrency', type=int, default=settings.ASYNC_UPSTREAM_CONCURRENCY,
+                        help='ASYNC_UPSTREAM_CONCURRENCY')
+    args = parser.parse_args()
+
+    settings.ASYNC_UPSTREAM_CONCURRENCY = args.upstream_concurrency
+    settings.YAHOO_POOL_MAX_WORKERS = args.threads
+    settings.YAHOO_POOL_MAX_QUEUE = max(args.requests, settings.YAHOO_POOL_MAX_QUEUE)
+
+    print(f"{args.requests} peticiones, latencia de Yahoo {args.latency * 1000:.0f} ms, "
+          f"{args.threads} hilos en ambos modos, {args.upstream_concurrency} llamadas async simultáneas\n")
+
+    fake = FakeYahoo(latency=args.latency)
+    upstream = PeakTracker(fake)
+    with fake.installed():
+        latencies, elapsed = run_sync(args.requests, args.threads, 'SYNC')
+    report('sync', latencies, elapsed, upstream)
+
+    fake = FakeYahoo(latency=args.latency)
+    upstream = PeakTracker(fake)
+    with fake.installed():
+        latencies, elapsed = asyncio.run(run_async(args.requests, 'ASYNC'))
+    report('async', latencies, elapsed, upstream)
+
+    yahoo_pool.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Micro-benchmark de la serialización del histórico OHLCV.
+
+Compara la conversión anterior fila por fila (iterrows) con
+YahooFinanceService.history_to_records sobre históricos sintéticos de
+1 año, 5 años y "max" (~45 años de días hábiles).
+
+Uso (desde backend/):
+    python -m benchmarks.bench_history_serialization
+    python -m benchmarks.bench_history_serialization --repeat 20
+"""
+import argparse
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import setup_django
+
+setup_django()
+
+from services.yahoo_finance_service import YahooFinanceService  # noqa: E402
+
+PERIODS = {
+    '1y': 252,
+    '5y': 252 * 5,
+    'max': 252 * 45,
+}
+
+
+def make_history(rows, seed=42):
+    """Genera un DataFrame con la misma forma que ticker.history()"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, rows)))
+    open_ = close * (1 + rng.normal(0, 0.005, rows))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.01, rows)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.01, rows)))
+    volume = rng.integers(1_000_000, 50_000_000, rows).astype('float64')
+    index = pd.bdate_range(end='2025-11-03', periods=rows, tz='America/New_York', name='Date')
+    return pd.DataFrame(
+        {'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume},
+        index=index,
+    )
+
+
+def legacy_history_to_records(hist):
+    """Implementación anterior basada en iterrows (referencia)"""
+    historical_data = []
+    for date, row in hist.iterrows():
+        try:
+            historical_data.append({
+                'date': date.strftime('%Y-%m-%d'),
+                'close': round(float(row['Close']), 2),
+                'open': round(float(row['Open']), 2),
+                'high': round(float(row['High']), 2),
+                'low': round(float(row['Low']), 2),
+                'volume': int(row['Volume'])
+            })
+        except Exception:
+            continue
+    return historical_data
+
+
+def best_of(func, repeat):
+    """Mejor tiempo en ms de `repeat` ejecuciones"""
+    return min(timeit.repeat(func, number=1, repeat=repeat)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'periodo':<8}{'filas':>8}{'iterrows (ms)':>16}{'vectorizado (ms)':>19}{'speedup':>10}")
+    for period, rows in PERIODS.items():
+        hist = make_history(rows)
+
+        legacy = legacy_history_to_records(hist)
+        vectorized = YahooFinanceService.history_to_records(hist)
+        if legacy != vectorized:
+            raise SystemExit(f"Resultados distintos para {period}")
+
+        legacy_ms = best_of(lambda: legacy_history_to_records(hist), args.repeat)
+        vectorized_ms = best_of(lambda: YahooFinanceService.history_to_records(hist), args.repeat)
+        print(f"{period:<8}{rows:>8}{legacy_ms:>16.2f}{vectorized_ms:>19.2f}{legacy_ms / vectorized_ms:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+"""
+Benchmarks de las rutas calientes de datos de mercado contra un Yahoo simulado.
+
+Mide servicios (get_multiple_stocks, get_historical_data, get_stock_detail) y las
+vistas DRF de punta a punta, en frío (sin caché) y en caliente. Reporta
+throughput, p50/p95/p99 y llamadas a Yahoo por operación, para validar sin red
+cualquier cambio de rendimiento en services/yahoo_finance_service.py o en
+apps/stocks/views.py.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_market_data
+    python -m benchmarks.bench_market_data --latency 0.05 --error-rate 0.02 --iterations 200
+    python -m benchmarks.bench_market_data --only detail --history-rows 2520
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import setup_django
+
+setup_django(migrate=True)
+
+from django.test import Client  # noqa: E402
+
+from benchmarks.fake_yfinance import FakeYahoo  # noqa: E402
+from services.cache_service import CacheService  # noqa: E402
+from services.market_snapshot_service import snapshot_cache  # noqa: E402
+from services.price_history_service import PriceHistoryService, sync_cache  # noqa: E402
+from services.resilience import yahoo_guard  # noqa: E402
+from services.single_flight import upstream_flight  # noqa: E402
+from services.upstream_pool import yahoo_pool  # noqa: E402
+from services.yahoo_finance_service import YahooFinanceService, quote_cache  # noqa: E402
+
+
+def wait_for_backfills():
+    """Espera los backfills de histórico en segundo plano (escriben en la misma base)"""
+    while PriceHistoryService.pending_backfills():
+        time.sleep(0.01)
+
+
+def reset_state():
+    """Vacía las cachés locales, el almacén de barras y cierra el circuito"""
+    from apps.stocks.models import PriceBar
+
+    wait_for_backfills()
+    for cache in (quote_cache, sync_cache, snapshot_cache, upstream_flight.cache, CacheService('symbols')):
+        cache.local.clear()
+    PriceBar.objects.all().delete()
+    yahoo_guard.breaker.record_success()
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+class Scenario:
+    """
+    Una operación a medir. `prepare(i)` corre antes de cada operación y no se
+    cronometra (por ejemplo, vaciar la caché en los escenarios en frío)
+    """
+
+    def __init__(self, name, op, prepare=None, warmup=False):
+        self.name = name
+        self.op = op
+        self.prepare = prepare
+        self.warmup = warmup
+
+
+def client_get(path):
+    client = Client()
+
+    def get(i):
+        response = client.get(path.format(i=i))
+        if response.status_code >= 500:
+            raise RuntimeError(f"{path} respondió {response.status_code}")
+        return response
+    return get
+
+
+def build_scenarios():
+    popular = YahooFinanceService.POPULAR_STOCKS
+    clear = lambda i: reset_state()  # noqa: E731
+    return [
+        Scenario('get_multiple_stocks (30) frío', lambda i: YahooFinanceService.get_multiple_stocks(popular), clear),
+        Scenario('get_multiple_stocks (30) caliente', lambda i: YahooFinanceService.get_multiple_stocks(popular), warmup=True),
+        Scenario('get_historical_data frío', lambda i: YahooFinanceService.get_historical_data(f'H{i}')),
+        Scenario('get_historical_data caliente', lambda i: YahooFinanceService.get_historical_data('AAPL'), warmup=True),
+        Scenario('get_stock_detail frío', lambda i: YahooFinanceService.get_stock_detail(f'D{i}')),
+        Scenario('get_stock_detail caliente', lambda i: YahooFinanceService.get_stock_detail('MSFT'), warmup=True),
+        Scenario('GET /popular/ frío', client_get('/api/stocks/popular/'), clear),
+        Scenario('GET /popular/ caliente', client_get('/api/stocks/popular/'), warmup=True),
+        Scenario('GET /search/ frío', client_get('/api/stocks/search/?symbol=S{i}')),
+        Scenario('GET /history/?period=5y frío', client_get('/api/stocks/history/?symbol=P{i}&period=5y')),
+        Scenario('GET /history/?period=5y caliente', client_get('/api/stocks/history/?symbol=NVDA&period=5y'), warmup=True),
+        Scenario('GET /detail/ frío', client_get('/api/stocks/detail/?symbol=V{i}')),
+        Scenario('GET /detail/ caliente', client_get('/api/stocks/detail/?symbol=TSLA'), warmup=True),
+        Scenario('GET /typeahead/', client_get('/api/stocks/typeahead/?q=a')),
+    ]
+
+
+def run(scenario, fake, iterations, concurrency):
+    reset_state()
+    if scenario.warmup:
+        scenario.op(-1)
+        wait_for_backfills()
+    fake.reset_counts()
+
+    failures = 0
+
+    def one(i):
+        nonlocal failures
+        if scenario.prepare:
+            scenario.prepare(i)
+        started = time.perf_counter()
+        try:
+            scenario.op(i)
+        except Exception:
+            failures += 1
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            latencies = list(executor.map(one, range(iterations)))
+    else:
+        latencies = [one(i) for i in range(iterations)]
+    elapsed = time.perf_counter() - started
+
+    # En los escenarios con prepare el tiempo total incluye la preparación:
+    # el throughput se calcula con el tiempo medido de las operaciones
+    busy = sum(latencies) / concurrency if scenario.prepare else elapsed
+    calls = '/'.join(f"{fake.calls[kind] / iterations:.2f}" for kind in ('quote', 'info', 'history'))
+    print(
+        f"{scenario.name:<36} {iterations / busy:>9.1f} op/s  "
+        f"p50 {statistics.median(latencies) * 1000:>8.2f}  "
+        f"p95 {percentile(latencies, 95) * 1000:>8.2f}  "
+        f"p99 {percentile(latencies, 99) * 1000:>8.2f} ms  "
+        f"yahoo/op {calls:>14}  errores {failures + fake.errors}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--latency', type=float, default=0.0, help='latencia simulada de Yahoo (s)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fracción de llamadas a Yahoo que fallan')
+    parser.add_argument('--history-rows', type=int, default=None, help='filas por histórico (por defecto según el periodo)')
+    parser.add_argument('--info-bytes', type=int, default=2000, help='tamaño de la descripción en ticker.info')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--only', default='', help='solo los escenarios cuyo nombre contenga este texto')
+    args = parser.parse_args()
+
+    fake = FakeYahoo(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        history_rows=args.history_rows,
+        info_bytes=args.info_bytes,
+        seed=args.seed,
+    )
+    print(
+        f"{args.iterations} iteraciones, concurrencia {args.concurrency}, latencia {args.latency * 1000:.0f} ms, "
+        f"errores {args.error_rate:.1%}  (yahoo/op = quote/info/history)\n"
+    )
+    with fake.installed():
+        for scenario in build_scenarios():
+            if args.only.lower() in scenario.name.lower():
+                run(scenario, fake, args.iterations, args.concurrency)
+
+    yahoo_pool.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Evaluación de órdenes límite y stop por cotización: OrderBook contra escaneo.
+
+Crea N órdenes abiertas repartidas en varios símbolos y recorre una serie de
+cotizaciones (paseo aleatorio por símbolo). Por cada cotización compara:
+- escaneo: leer de la base las órdenes abiertas del símbolo y evaluar cada una;
+- OrderBook: mirar solo las cimas de los heaps del símbolo.
+Verifica que los dos disparen exactamente las mismas órdenes en el mismo tick y
+termina con código 1 si no coinciden. No ejecuta las órdenes (se mide la
+detección, no la escritura).
+
+Uso (desde backend/):
+    python -m benchmarks.bench_order_book
+    python -m benchmarks.bench_order_book --orders 50000 --symbols 50 --ticks 2000
+"""
+import argparse
+import random
+import sys
+import time
+from decimal import Decimal
+
+from benchmarks import setup_django
+
+setup_django(migrate=True)
+
+from django.contrib.auth import get_user_model  # noqa: E402
+
+from apps.portfolio.models import Order  # noqa: E402
+from services.order_book import OrderMatcher  # noqa: E402
+
+
+def create_orders(count, symbols, rng):
+    User = get_user_model()
+    user = User.objects.create_user(email='orders@example.com', username='orders', password='bench')
+    rows = []
+    for _ in range(count):
+        rows.append(Order(
+            user=user, symbol=rng.choice(symbols), name='Bench Corp',
+            order_type=rng.choice(['limit', 'stop']), transaction_type=rng.choice(['buy', 'sell']),
+            shares=Decimal('1'), price=Decimal(rng.randint(5000, 15000)) / 100,
+        ))
+    Order.objects.bulk_create(rows, batch_size=5000)
+
+
+def scan(symbol, price, triggered):
+    """Dispara evaluando todas las órdenes abiertas del símbolo (lo que se evita)"""
+    fired = set()
+    for order in Order.objects.filter(status='open', symbol=symbol).only(
+        'id', 'price', 'order_type', 'transaction_type'
+    ):
+        if order.id in triggered:
+            continue
+        if (order.price >= price) if order.triggers_below else (order.price <= price):
+            fired.add(order.id)
+    return fired
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=20000)
+    parser.add_argument('--symbols', type=int, default=20)
+    parser.add_argument('--ticks', type=int, default=500)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    symbols = [f'S{i:03d}' for i in range(args.symbols)]
+    create_orders(args.orders, symbols, rng)
+    prices = {symbol: Decimal('100.00') for symbol in symbols}
+    ticks = []
+    for _ in range(args.ticks):
+        symbol = rng.choice(symbols)
+        prices[symbol] = max(Decimal('1.00'), prices[symbol] + Decimal(rng.randint(-150, 150)) / 100)
+        ticks.append((symbol, prices[symbol]))
+
+    started = time.perf_counter()
+    matcher = OrderMatcher()
+    matcher.load()
+    load_elapsed = time.perf_counter() - started
+
+    book_fired, scan_fired = [], []
+    book_elapsed = 0.0
+    for symbol, price in ticks:
+        started = time.perf_counter()
+        book_fired.append({order_id for order_id, _, _ in matcher.book.trigger(symbol, price)})
+        book_elapsed += time.perf_counter() - started
+
+    triggered = set()
+    started = time.perf_counter()
+    for symbol, price in ticks:
+        fired = scan(symbol, price, triggered)
+        triggered |= fired
+        scan_fired.append(fired)
+    scan_elapsed = time.perf_counter() - started
+
+    fired = sum(len(ids) for ids in book_fired)
+    print(f"{args.orders} órdenes abiertas en {args.symbols} símbolos, {args.ticks} cotizaciones, {fired} disparos")
+    print(f"{'escaneo':<10} {scan_elapsed * 1000 / args.ticks:10.3f} ms/cotización")
+    print(f"{'OrderBook':<10} {book_elapsed * 1000 / args.ticks:10.3f} ms/cotización  (carga inicial {load_elapsed * 1000:.0f} ms)")
+    print(f"mejora: {scan_elapsed / max(book_elapsed, 1e-9):.0f}x")
+
+    if book_fired != scan_fired:
+        print("FALLA OrderBook y el escaneo dispararon órdenes distintas")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
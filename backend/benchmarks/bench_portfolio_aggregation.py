@@ -0,0 +1,177 @@
+"""
+Benchmark de los cálculos del portafolio con un historial grande.
+
+Crea un usuario con --transactions transacciones completadas (100k por defecto)
+repartidas en --symbols símbolos y compara el recorrido anterior en Python
+(referencia) con las agregaciones en SQL y el libro de posiciones. También mide
+dashboard_stats, el listado del portafolio y el historial paginado de punta a
+punta (primera página y una página a mitad del historial). Reporta tiempo por
+operación y consultas SQL por operación.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_portfolio_aggregation
+    python -m benchmarks.bench_portfolio_aggregation --transactions 20000 --iterations 20
+"""
+import argparse
+import base64
+import random
+import statistics
+import time
+from decimal import Decimal
+from urllib.parse import urlencode
+
+from benchmarks import setup_django
+
+setup_django(migrate=True)
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from apps.portfolio.models import Portfolio, StockTransaction  # noqa: E402
+from benchmarks.fake_yfinance import FakeYahoo  # noqa: E402
+from services.dashboard_cache_service import dashboard_cache  # noqa: E402
+from services.position_service import PositionService  # noqa: E402
+from services.upstream_pool import yahoo_pool  # noqa: E402
+
+
+def legacy_total_invested(portfolio):
+    """Implementación anterior: suma en Python de todas las transacciones (referencia)"""
+    total = Decimal('0')
+    for transaction in portfolio.user.stock_transactions.filter(status='completed'):
+        if transaction.transaction_type == 'buy':
+            total += transaction.total
+        else:
+            total -= transaction.total
+    return total
+
+
+def legacy_holdings(portfolio):
+    """Implementación anterior: recorre todo el historial por símbolo (referencia)"""
+    holdings = {}
+    for transaction in portfolio.user.stock_transactions.filter(status='completed').order_by('symbol'):
+        holding = holdings.setdefault(transaction.symbol, {
+            'symbol': transaction.symbol, 'name': transaction.name,
+            'shares': Decimal('0'), 'average_price': Decimal('0'), 'total_invested': Decimal('0'),
+        })
+        if transaction.transaction_type == 'buy':
+            new_total = holding['total_invested'] + transaction.total
+            new_shares = holding['shares'] + transaction.shares
+            if new_shares > 0:
+                holding['average_price'] = new_total / new_shares
+            holding['total_invested'] = new_total
+            holding['shares'] = new_shares
+        else:
+            holding['shares'] = max(Decimal('0'), holding['shares'] - transaction.shares)
+            if holding['shares'] == 0:
+                holding['total_invested'] = Decimal('0')
+            else:
+                holding['total_invested'] -= transaction.total
+    return {k: v for k, v in holdings.items() if v['shares'] > 0}
+
+
+def create_history(user, transactions, symbols, seed):
+    """Inserta el historial con bulk_create (sin señales) y reconstruye las posiciones"""
+    rng = random.Random(seed)
+    names = [f'S{i:03d}' for i in range(symbols)]
+    rows = []
+    for _ in range(transactions):
+        symbol = rng.choice(names)
+        shares = Decimal(rng.randint(1, 100))
+        price = Decimal(rng.randint(1000, 50000)) / 100
+        rows.append(StockTransaction(
+            user=user, symbol=symbol, name=f'{symbol} Corp',
+            transaction_type='buy' if rng.random() < 0.6 else 'sell',
+            shares=shares, price_per_share=price, total=shares * price,
+        ))
+    StockTransaction.objects.bulk_create(rows, batch_size=5000)
+
+    started = time.perf_counter()
+    PositionService.rebuild(user_ids=[user.id])
+    return time.perf_counter() - started
+
+
+def deep_page_ops(user, depth, page_size=20):
+    """Página a `depth` filas de profundidad: OFFSET + COUNT(*) (anterior) y por cursor"""
+    transactions = StockTransaction.objects.filter(user=user).order_by('-created_at')
+
+    def offset_page():
+        transactions.count()
+        return list(transactions[depth:depth + page_size])
+
+    # Cursor equivalente al que arma CursorPagination para la fila en `depth`
+    position = str(transactions.values_list('created_at', flat=True)[depth - 1])
+    cursor = base64.b64encode(urlencode({'p': position}).encode()).decode()
+    return offset_page, f'/api/portfolio/transactions/?{urlencode({"cursor": cursor})}'
+
+
+def measure(name, op, iterations):
+    latencies = []
+    with CaptureQueriesContext(connection) as queries:
+        for _ in range(iterations):
+            started = time.perf_counter()
+            op()
+            latencies.append(time.perf_counter() - started)
+    print(
+        f"{name:<44} p50 {statistics.median(latencies) * 1000:>9.2f} ms  "
+        f"máx {max(latencies) * 1000:>9.2f} ms  "
+        f"consultas/op {len(queries) / iterations:>6.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--transactions', type=int, default=100_000)
+    parser.add_argument('--symbols', type=int, default=50)
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--legacy-iterations', type=int, default=3, help='iteraciones de las referencias lentas')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    User = get_user_model()
+    user = User.objects.create_user(email='bench@example.com', username='bench', password='bench')
+    portfolio, _ = Portfolio.objects.get_or_create(user=user)
+
+    started = time.perf_counter()
+    rebuild = create_history(user, args.transactions, args.symbols, args.seed)
+    print(
+        f"{args.transactions} transacciones en {args.symbols} símbolos "
+        f"(carga {time.perf_counter() - started:.1f}s, rebuild_positions {rebuild:.2f}s)\n"
+    )
+
+    assert legacy_total_invested(portfolio) == portfolio.get_total_invested()
+
+    client = APIClient()
+    client.force_authenticate(User.objects.get(pk=user.pk))
+
+    offset_page, cursor_path = deep_page_ops(user, args.transactions // 2)
+
+    def get(path, cached=False):
+        def op():
+            if not cached:
+                dashboard_cache.local.clear()
+            response = client.get(path)
+            if response.status_code != 200:
+                raise RuntimeError(f"{path} respondió {response.status_code}")
+        return op
+
+    with FakeYahoo().installed():
+        measure('get_total_invested (Python, anterior)', lambda: legacy_total_invested(portfolio), args.legacy_iterations)
+        measure('get_total_invested (SQL)', portfolio.get_total_invested, args.iterations)
+        measure('get_symbol_totals (SQL)', portfolio.get_symbol_totals, args.iterations)
+        measure('get_portfolio_holdings (replay, anterior)', lambda: legacy_holdings(portfolio), args.legacy_iterations)
+        measure('get_portfolio_holdings (Position)', portfolio.get_portfolio_holdings, args.iterations)
+        measure('GET /portfolio/dashboard_stats/', get('/api/portfolio/portfolio/dashboard_stats/'), args.iterations)
+        measure('GET /portfolio/dashboard_stats/ (caché)', get('/api/portfolio/portfolio/dashboard_stats/', cached=True), args.iterations)
+        measure('GET /portfolio/', get('/api/portfolio/portfolio/'), args.iterations)
+        measure('GET /transactions/summary/', get('/api/portfolio/transactions/summary/'), args.iterations)
+        measure('GET /transactions/ primera página', get('/api/portfolio/transactions/'), args.iterations)
+        measure('página profunda con OFFSET (anterior)', offset_page, args.iterations)
+        measure('GET /transactions/ página profunda (cursor)', get(cursor_path), args.iterations)
+
+    yahoo_pool.shutdown()
+
+
+if __name__ == '__main__':
+    main()
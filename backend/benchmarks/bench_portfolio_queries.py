@@ -0,0 +1,120 @@
+"""
+Consultas SQL por respuesta de los endpoints del portafolio.
+
+Arma dos portafolios (uno chico y uno con mucho historial y muchos símbolos) y
+cuenta las consultas de cada endpoint: el total, las que leen stock_transactions
+y las que leen positions. El número de consultas no debe depender del tamaño del
+historial ni de la cantidad de holdings, y cada respuesta debe leer las
+transacciones y el libro de posiciones como mucho una vez (PortfolioSnapshot).
+Termina con código 1 si algún endpoint se pasa del presupuesto, así sirve
+como verificación antes de un merge.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_portfolio_queries
+    python -m benchmarks.bench_portfolio_queries --transactions 5000 --symbols 100
+"""
+import argparse
+import random
+import sys
+from decimal import Decimal
+
+from benchmarks import setup_django
+
+setup_django(migrate=True)
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from apps.portfolio.models import Portfolio, StockTransaction  # noqa: E402
+from benchmarks.fake_yfinance import FakeYahoo  # noqa: E402
+from services.dashboard_cache_service import dashboard_cache  # noqa: E402
+from services.position_service import PositionService  # noqa: E402
+from services.upstream_pool import yahoo_pool  # noqa: E402
+
+# Máximo de lecturas por respuesta: (stock_transactions, positions)
+TABLE_BUDGET = {
+    'dashboard_stats': (2, 1),  # totales + últimas transacciones
+    'holdings': (0, 1),
+    'list': (1, 1),
+    'retrieve': (1, 1),
+    'summary': (2, 0),  # totales + totales por símbolo
+}
+
+
+def create_portfolio(email, transactions, symbols, seed=42):
+    User = get_user_model()
+    user = User.objects.create_user(email=email, username=email.split('@')[0], password='bench')
+    portfolio, _ = Portfolio.objects.get_or_create(user=user)
+    rng = random.Random(seed)
+    rows = []
+    for i in range(transactions):
+        symbol = f'S{i % symbols:03d}'
+        shares = Decimal(rng.randint(1, 100))
+        price = Decimal(rng.randint(1000, 50000)) / 100
+        rows.append(StockTransaction(
+            user=user, symbol=symbol, name=f'{symbol} Corp',
+            transaction_type='buy' if i < symbols or rng.random() < 0.7 else 'sell',
+            shares=shares, price_per_share=price, total=shares * price,
+        ))
+    StockTransaction.objects.bulk_create(rows, batch_size=5000)
+    PositionService.rebuild(user_ids=[user.id])
+    return User.objects.get(pk=user.pk), portfolio
+
+
+def count_queries(user, portfolio):
+    """{endpoint: (total, stock_transactions, positions)}"""
+    client = APIClient()
+    client.force_authenticate(user)
+    paths = {
+        'dashboard_stats': '/api/portfolio/portfolio/dashboard_stats/',
+        'holdings': '/api/portfolio/portfolio/holdings/',
+        'list': '/api/portfolio/portfolio/',
+        'retrieve': f'/api/portfolio/portfolio/{portfolio.pk}/',
+        'summary': '/api/portfolio/transactions/summary/',
+    }
+    counts = {}
+    for name, path in paths.items():
+        client.get(path)  # calienta la caché de cotizaciones
+        dashboard_cache.local.clear()  # se cuentan las consultas del cálculo, no del acierto en caché
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(path)
+        if response.status_code != 200:
+            raise RuntimeError(f"{path} respondió {response.status_code}")
+        sql = [query['sql'] for query in queries]
+        counts[name] = (
+            len(sql),
+            sum('"stock_transactions"' in query for query in sql),
+            sum('"positions"' in query for query in sql),
+        )
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--transactions', type=int, default=2000)
+    parser.add_argument('--symbols', type=int, default=50)
+    args = parser.parse_args()
+
+    with FakeYahoo().installed():
+        small = count_queries(*create_portfolio('small@example.com', 3, 2))
+        large = count_queries(*create_portfolio('large@example.com', args.transactions, args.symbols))
+    yahoo_pool.shutdown()
+
+    print(f"{'endpoint':<18} {'chico':>22} {'grande':>22}   (total / stock_transactions / positions)")
+    failures = []
+    for name, budget in TABLE_BUDGET.items():
+        print(f"{name:<18} {'%d / %d / %d' % small[name]:>22} {'%d / %d / %d' % large[name]:>22}")
+        if small[name] != large[name]:
+            failures.append(f"{name}: las consultas crecen con el historial ({small[name]} -> {large[name]})")
+        if large[name][1] > budget[0] or large[name][2] > budget[1]:
+            failures.append(f"{name}: {large[name][1:]} lecturas, presupuesto {budget}")
+
+    for failure in failures:
+        print(f"FALLA {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
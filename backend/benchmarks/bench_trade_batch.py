@@ -0,0 +1,104 @@
+"""
+Órdenes de a una contra el endpoint de lotes.
+
+Envía el mismo rebalanceo (N órdenes sobre varios símbolos) primero como N POST
+a /api/portfolio/transactions/ y después como un solo POST a
+/api/portfolio/transactions/batch/, y compara el tiempo y las consultas SQL por
+orden. Verifica además que el balance y las posiciones terminen iguales en los
+dos casos.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_trade_batch
+    python -m benchmarks.bench_trade_batch --orders 100 --symbols 20
+"""
+import argparse
+import random
+import sys
+import time
+from decimal import Decimal
+
+from benchmarks import setup_django
+
+setup_django(migrate=True)
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from apps.portfolio.models import Position  # noqa: E402
+from apps.users.models import UserBalance  # noqa: E402
+from benchmarks.fake_yfinance import FakeYahoo  # noqa: E402
+from services.trade_execution_service import TradeExecutionService  # noqa: E402
+from services.upstream_pool import yahoo_pool  # noqa: E402
+
+
+def create_client(email, balance):
+    User = get_user_model()
+    user = User.objects.create_user(email=email, username=email.split('@')[0], password='bench')
+    UserBalance.objects.filter(user=user).update(available_balance=balance)
+    client = APIClient()
+    client.force_authenticate(User.objects.get(pk=user.pk))
+    return user, client
+
+
+def ledger(user):
+    return (
+        UserBalance.objects.get(user=user).available_balance,
+        sorted(Position.objects.filter(user=user).values_list('symbol', 'shares', 'cost_basis')),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=50)
+    parser.add_argument('--symbols', type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    symbols = [f'S{i:03d}' for i in range(args.symbols)]
+    orders = [
+        {'symbol': symbol, 'transaction_type': 'buy', 'shares': str(rng.randint(1, 20))}
+        for symbol in symbols
+    ]
+    orders += [
+        {'symbol': rng.choice(symbols), 'transaction_type': rng.choice(['buy', 'sell']), 'shares': '1'}
+        for _ in range(args.orders - len(orders))
+    ]
+
+    with FakeYahoo().installed():
+        single_user, single = create_client('single@example.com', Decimal('10000000'))
+        batch_user, batch = create_client('batch@example.com', Decimal('10000000'))
+        # Calienta la caché de cotizaciones: se mide la ejecución, no Yahoo
+        TradeExecutionService.get_trade_quotes(symbols)
+
+        with CaptureQueriesContext(connection) as single_queries:
+            started = time.perf_counter()
+            for order in orders:
+                response = single.post('/api/portfolio/transactions/', order, format='json')
+                if response.status_code not in (201, 400):
+                    raise RuntimeError(f"orden individual respondió {response.status_code}")
+            single_elapsed = time.perf_counter() - started
+
+        with CaptureQueriesContext(connection) as batch_queries:
+            started = time.perf_counter()
+            response = batch.post('/api/portfolio/transactions/batch/', {'orders': orders}, format='json')
+            batch_elapsed = time.perf_counter() - started
+        if response.status_code != 201:
+            raise RuntimeError(f"lote respondió {response.status_code}")
+    yahoo_pool.shutdown()
+
+    n = len(orders)
+    print(f"{n} órdenes sobre {args.symbols} símbolos")
+    print(f"{'de a una':<10} {single_elapsed * 1000 / n:8.2f} ms/orden  {len(single_queries) / n:6.1f} consultas/orden")
+    print(f"{'lote':<10} {batch_elapsed * 1000 / n:8.2f} ms/orden  {len(batch_queries) / n:6.1f} consultas/orden")
+    print(f"mejora: {single_elapsed / batch_elapsed:.1f}x")
+
+    single_ledger, batch_ledger = ledger(single_user), ledger(batch_user)
+    if single_ledger != batch_ledger:
+        print("FALLA el lote dejó un balance o posiciones distintas a las órdenes de a una")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
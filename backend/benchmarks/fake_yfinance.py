@@ -0,0 +1,170 @@
+"""
+Sustituto local y determinista de Yahoo Finance para los benchmarks.
+
+Reemplaza las dos puertas de salida del backend hacia Yahoo:
+- yfinance.data.YfData.get_raw_json (cotizaciones por lotes, endpoint v7/quote)
+- yf.Ticker en services.upstream_pool (ticker.info y ticker.history)
+
+Cada llamada espera `latency` segundos, falla con probabilidad `error_rate`
+(ConnectionError, como una caída de red) y se cuenta por tipo. Los datos
+dependen solo del símbolo y de la semilla, así que dos corridas son comparables.
+
+Uso:
+    fake = FakeYahoo(latency=0.05, error_rate=0.01, history_rows=252)
+    with fake.installed():
+        ...
+    print(fake.calls)
+"""
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+import yfinance.data as yfdata
+
+import services.upstream_pool as upstream_pool
+
+# Días hábiles aproximados de cada periodo de yfinance
+PERIOD_ROWS = {
+    '1d': 1, '5d': 5, '1mo': 21, '3mo': 63, '6mo': 126, 'ytd': 200,
+    '1y': 252, '2y': 504, '5y': 1260, '10y': 2520, 'max': 252 * 45,
+}
+
+
+class FakeYahoo:
+    """Yahoo simulado con latencia, tasa de error y tamaño de respuesta configurables"""
+
+    def __init__(self, latency=0.0, error_rate=0.0, history_rows=None, info_bytes=2000, seed=42):
+        self.latency = latency
+        self.error_rate = error_rate
+        # None: filas según el periodo pedido (PERIOD_ROWS)
+        self.history_rows = history_rows
+        self.info_bytes = info_bytes
+        self.seed = seed
+        self.calls = {'quote': 0, 'info': 0, 'history': 0}
+        self.errors = 0
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def _symbol_seed(self, symbol):
+        return zlib.crc32(symbol.encode()) ^ self.seed
+
+    def _call(self, kind):
+        """Cuenta la llamada, simula la latencia y decide de forma determinista si falla"""
+        with self._lock:
+            self.calls[kind] += 1
+            self._sequence += 1
+            sequence = self._sequence
+        if self.latency:
+            time.sleep(self.latency)
+        if self.error_rate and np.random.default_rng([self.seed, sequence]).random() < self.error_rate:
+            with self._lock:
+                self.errors += 1
+            raise ConnectionError(f"Fallo simulado de Yahoo ({kind})")
+
+    def price(self, symbol):
+        return round(20 + self._symbol_seed(symbol) % 50000 / 100, 2)
+
+    def quote_item(self, symbol):
+        price = self.price(symbol)
+        return {
+            'symbol': symbol,
+            'regularMarketPrice': price,
+            'regularMarketPreviousClose': round(price * 0.99, 2),
+            'longName': f'{symbol} Corporation',
+            'regularMarketVolume': self._symbol_seed(symbol) % 10_000_000,
+            'marketCap': self._symbol_seed(symbol) % 10_000_000 * 1000,
+            'currency': 'USD',
+        }
+
+    def get_raw_json(self, url, params=None, timeout=30):
+        self._call('quote')
+        symbols = [symbol for symbol in (params or {}).get('symbols', '').split(',') if symbol]
+        return {'quoteResponse': {'result': [self.quote_item(symbol) for symbol in symbols], 'error': None}}
+
+    def info(self, symbol):
+        self._call('info')
+        item = self.quote_item(symbol)
+        return {
+            'longName': item['longName'],
+            'sector': 'Technology',
+            'industry': 'Software',
+            'currentPrice': item['regularMarketPrice'],
+            'previousClose': item['regularMarketPreviousClose'],
+            'volume': item['regularMarketVolume'],
+            'averageVolume': item['regularMarketVolume'],
+            'marketCap': item['marketCap'],
+            'beta': 1.1,
+            'trailingPE': 25.3,
+            'dividendRate': 0.9,
+            'dividendYield': 0.006,
+            'fiftyTwoWeekHigh': item['regularMarketPrice'] * 1.2,
+            'fiftyTwoWeekLow': item['regularMarketPrice'] * 0.8,
+            'longBusinessSummary': 'x' * self.info_bytes,
+            'currency': 'USD',
+        }
+
+    def history(self, symbol, period='1mo', interval='1d', start=None, **kwargs):
+        self._call('history')
+        if self.history_rows is not None:
+            rows = self.history_rows
+        elif start is not None:
+            rows = max(1, len(pd.bdate_range(start=start, end=pd.Timestamp.today())))
+        else:
+            rows = PERIOD_ROWS.get(period, 252)
+
+        rng = np.random.default_rng(self._symbol_seed(symbol))
+        close = self.price(symbol) * np.exp(np.cumsum(rng.normal(0, 0.02, rows)))
+        open_ = close * (1 + rng.normal(0, 0.005, rows))
+        high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.01, rows)))
+        low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.01, rows)))
+        volume = rng.integers(1_000_000, 50_000_000, rows).astype('float64')
+        if interval in ('1d', '5d', '1wk', '1mo', '3mo'):
+            index = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=rows, tz='America/New_York')
+        else:
+            index = pd.date_range(end=pd.Timestamp.now(tz='America/New_York').floor('min'), periods=rows, freq='min')
+        index.name = 'Date'
+        return pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume}, index=index)
+
+    def ticker(self, symbol, session=None):
+        return FakeTicker(self, symbol.upper())
+
+    def reset_counts(self):
+        with self._lock:
+            self.calls = {kind: 0 for kind in self.calls}
+            self.errors = 0
+
+    @property
+    def total_calls(self):
+        return sum(self.calls.values())
+
+    @contextmanager
+    def installed(self):
+        """Instala el sustituto mientras dure el bloque"""
+        original_raw_json = yfdata.YfData.get_raw_json
+        original_ticker = upstream_pool.yf.Ticker
+        yfdata.YfData.get_raw_json = lambda _self, url, params=None, timeout=30: self.get_raw_json(url, params, timeout)
+        upstream_pool.yf.Ticker = self.ticker
+        try:
+            yield self
+        finally:
+            yfdata.YfData.get_raw_json = original_raw_json
+            upstream_pool.yf.Ticker = original_ticker
+
+
+class FakeTicker:
+    """Imitación de yf.Ticker con info e history"""
+
+    def __init__(self, yahoo, symbol):
+        self._yahoo = yahoo
+        self.ticker = symbol
+
+    @property
+    def info(self):
+        return self._yahoo.info(self.ticker)
+
+    def history(self, period='1mo', interval='1d', start=None, **kwargs):
+        return self._yahoo.history(self.ticker, period=period, interval=interval, start=start, **kwargs)
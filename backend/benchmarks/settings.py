@@ -0,0 +1,55 @@
+"""
+Settings para ejecutar los benchmarks sin Postgres ni Redis.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_history_serialization
+"""
+import os
+
+from TikalInvest.settings import *  # noqa: F401,F403
+
+# En memoria pero compartida entre hilos: las consultas que corren en el pool
+# de Yahoo ven las mismas tablas que el hilo principal.
+# BENCHMARK_DATABASE=sqlite-file usa un archivo (BENCHMARK_SQLITE_PATH) donde las
+# escrituras concurrentes esperan el lock en vez de fallar; BENCHMARK_DATABASE=postgres
+# usa la base POSTGRES_* del proyecto (bloqueos por fila reales; debe estar vacía)
+if os.getenv('BENCHMARK_DATABASE') == 'sqlite-file':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('BENCHMARK_SQLITE_PATH', '/tmp/tikal-benchmarks.sqlite3'),
+            'OPTIONS': {'timeout': 60},
+        }
+    }
+elif os.getenv('BENCHMARK_DATABASE') != 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': 'file:benchmarks?mode=memory&cache=shared',
+        }
+    }
+
+# El módulo del proyecto es TikalInvest (con mayúsculas)
+ROOT_URLCONF = 'TikalInvest.urls'
+ALLOWED_HOSTS = ['*']
+STATICFILES_DIRS = []
+
+# Sin throttling de DRF: las pruebas de carga superan los límites anónimos
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,  # noqa: F405
+    'DEFAULT_THROTTLE_CLASSES': [],
+    'DEFAULT_THROTTLE_RATES': {'anon': None, 'user': None, 'typeahead': None},
+}
+
+# Sin rate limiter hacia Yahoo: se mide el código, no la espera por tokens
+YAHOO_RATE_LIMIT = 1e9
+YAHOO_RATE_BURST = 1e9
+
+# Sin Redis: la caché compartida usa el LRU en memoria
+REDIS_URL = ''
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'root': {'handlers': [], 'level': 'CRITICAL'},
+}
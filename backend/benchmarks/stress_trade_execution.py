@@ -0,0 +1,169 @@
+"""
+Prueba de estrés de la ejecución de órdenes (TradeExecutionService).
+
+Lanza ráfagas concurrentes de compras y ventas de mercado, mezcladas con
+depósitos que se completan al mismo tiempo, sobre pocos usuarios (máxima
+contención sobre el mismo balance y las mismas posiciones) y al final verifica
+las invariantes:
+- ningún balance queda negativo y ninguna posición queda con acciones negativas;
+- balance final = balance inicial + depósitos - compras + ventas (sin actualizaciones perdidas);
+- cada posición coincide con la reconstrucción desde sus transacciones;
+- solo se rechazan órdenes por fondos o acciones insuficientes.
+Termina con código 1 si alguna invariante falla.
+
+Por defecto corre sobre un archivo SQLite nuevo (SQLite no tiene bloqueo por fila:
+cada orden toma el lock de escritura de la base). Para medir bloqueos por fila reales:
+    BENCHMARK_DATABASE=postgres POSTGRES_DB=... python -m benchmarks.stress_trade_execution
+
+Uso (desde backend/):
+    python -m benchmarks.stress_trade_execution
+    python -m benchmarks.stress_trade_execution --orders 5000 --threads 32 --users 2
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from benchmarks import setup_django
+
+# La base en memoria compartida falla ante escrituras concurrentes en vez de esperar
+if os.environ.setdefault('BENCHMARK_DATABASE', 'sqlite-file') == 'sqlite-file':
+    path = os.environ.setdefault('BENCHMARK_SQLITE_PATH', '/tmp/tikal-stress-trades.sqlite3')
+    if os.path.exists(path):
+        os.remove(path)
+
+setup_django(migrate=True)
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.db.models import Q, Sum  # noqa: E402
+
+from apps.portfolio.models import Position, StockTransaction  # noqa: E402
+from apps.users.models import DepositTransaction, UserBalance  # noqa: E402
+from benchmarks.fake_yfinance import FakeYahoo  # noqa: E402
+from services.position_service import PositionService  # noqa: E402
+from services.trade_execution_service import TradeExecutionService, TradeError  # noqa: E402
+from services.upstream_pool import yahoo_pool  # noqa: E402
+
+SYMBOLS = ['AAPL', 'MSFT', 'NVDA']
+
+
+def check_invariants(users, initial_balance):
+    failures = []
+    for user in users:
+        balance = UserBalance.objects.get(user=user).available_balance
+        totals = StockTransaction.objects.filter(user=user, status='completed').aggregate(
+            bought=Sum('total', filter=Q(transaction_type='buy'), default=Decimal('0')),
+            sold=Sum('total', filter=Q(transaction_type='sell'), default=Decimal('0')),
+        )
+        deposited = DepositTransaction.objects.filter(user=user, status='completed').aggregate(
+            total=Sum('amount', default=Decimal('0'))
+        )['total']
+        expected = initial_balance + Decimal(deposited).quantize(Decimal('0.01')) \
+            - Decimal(totals['bought']).quantize(Decimal('0.01')) + Decimal(totals['sold']).quantize(Decimal('0.01'))
+        if balance < 0:
+            failures.append(f"{user.email}: balance negativo {balance}")
+        if balance != expected:
+            failures.append(f"{user.email}: balance {balance} != esperado {expected} (actualización perdida)")
+
+        replayed = PositionService.replay(
+            StockTransaction.objects.filter(user=user, status='completed').order_by('created_at', 'id')
+            .values_list('user_id', 'symbol', 'name', 'transaction_type', 'shares', 'total')
+        )
+        for position in Position.objects.filter(user=user):
+            if position.shares < 0:
+                failures.append(f"{user.email} {position.symbol}: acciones negativas {position.shares}")
+            rebuilt = replayed.get((user.id, position.symbol))
+            if rebuilt is None or rebuilt.shares != position.shares or rebuilt.cost_basis != position.cost_basis:
+                failures.append(f"{user.email} {position.symbol}: la posición no coincide con sus transacciones")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--users', type=int, default=1)
+    parser.add_argument('--balance', type=Decimal, default=Decimal('25000'))
+    parser.add_argument('--deposits', type=float, default=0.1, help='Fracción de operaciones que son depósitos')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    User = get_user_model()
+    users = []
+    for i in range(args.users):
+        user = User.objects.create_user(email=f'stress{i}@example.com', username=f'stress{i}', password='stress')
+        UserBalance.objects.filter(user=user).update(available_balance=args.balance)
+        users.append(user)
+
+    rng = random.Random(args.seed)
+    orders = []
+    for _ in range(args.orders):
+        if rng.random() < args.deposits:
+            orders.append((rng.choice(users), None, 'deposit', Decimal(rng.randint(100, 1000))))
+        else:
+            orders.append((
+                rng.choice(users), rng.choice(SYMBOLS), 'buy' if rng.random() < 0.55 else 'sell',
+                Decimal(rng.randint(1, 10))
+            ))
+    outcomes = {'ejecutadas': 0, 'rechazadas': 0, 'errores': 0}
+    lock = threading.Lock()
+    errors = []
+
+    def submit(order):
+        user, symbol, transaction_type, shares = order
+        started = time.perf_counter()
+        try:
+            if transaction_type == 'deposit':
+                DepositTransaction.objects.create(
+                    user=user, amount=shares, reference_number=uuid.uuid4().hex[:20]
+                ).complete_deposit()
+            else:
+                TradeExecutionService.execute(user, symbol, transaction_type, shares)
+            outcome = 'ejecutadas'
+        except TradeError:
+            outcome = 'rechazadas'
+        except Exception as e:
+            outcome = 'errores'
+            errors.append(repr(e))
+        finally:
+            connection.close()
+        with lock:
+            outcomes[outcome] += 1
+        return time.perf_counter() - started
+
+    with FakeYahoo().installed():
+        # Calienta la caché de cotizaciones: se mide la ejecución, no Yahoo
+        for symbol in SYMBOLS:
+            TradeExecutionService.get_trade_quote(symbol)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as executor:
+            latencies = list(executor.map(submit, orders))
+        elapsed = time.perf_counter() - started
+    yahoo_pool.shutdown()
+
+    latencies.sort()
+    print(
+        f"{args.orders} órdenes, {args.threads} hilos, {args.users} usuarios: {args.orders / elapsed:.0f} órdenes/s  "
+        f"p50 {statistics.median(latencies) * 1000:.2f} ms  p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.2f} ms"
+    )
+    print(', '.join(f"{name} {count}" for name, count in outcomes.items()))
+
+    failures = check_invariants(users, args.balance)
+    failures += [f"error inesperado: {error}" for error in errors[:5]]
+    for failure in failures:
+        print(f"FALLA {failure}")
+    if not failures:
+        print("Invariantes OK: sin sobregiros, sin ventas en descubierto y sin actualizaciones perdidas")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import weakref
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from services.yahoo_finance_service import YahooFinanceService
+from services.market_snapshot_service import MarketSnapshotService
+from services.upstream_pool import yahoo_pool
+
+logger = logging.getLogger(__name__)
+
+# Un semáforo por event loop (asyncio.Semaphore queda ligado al loop en que se usa)
+_semaphores = weakref.WeakKeyDictionary()
+
+
+def _upstream_semaphore():
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(getattr(settings, 'ASYNC_UPSTREAM_CONCURRENCY', 16))
+        _semaphores[loop] = semaphore
+    return semaphore
+
+
+def _with_db(fn, *args, **kwargs):
+    """Ejecuta fn en un hilo del pool cerrando las conexiones viejas antes y después, como una petición"""
+    close_old_connections()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_upstream(fn, *args, **kwargs):
+    """
+    Ejecuta una llamada síncrona del servicio de Yahoo en el pool compartido.
+
+    El semáforo limita cuántas llamadas ocupan hilos a la vez; el resto de las
+    peticiones esperan en el event loop sin retener un hilo.
+    """
+    async with _upstream_semaphore():
+        return await yahoo_pool.run_async(_with_db, fn, *args, **kwargs)
+
+
+class AsyncMarketService:
+    """Variantes asyncio de YahooFinanceService para las vistas ASGI"""
+
+    @staticmethod
+    async def get_snapshot(endpoint):
+        """Snapshot pre-serializado publicado por `ingest_market_data` (o None)"""
+        return await run_upstream(MarketSnapshotService.get_payload, endpoint)
+
+    @staticmethod
+    async def get_quotes(symbols):
+        """Cotizaciones por lotes: cada lote de QUOTE_BATCH_SIZE se pide en paralelo"""
+        batch_size = getattr(settings, 'QUOTE_BATCH_SIZE', 50)
+        chunks = [symbols[i:i + batch_size] for i in range(0, len(symbols), batch_size)]
+        results = await asyncio.gather(*[
+            run_upstream(YahooFinanceService.get_quotes, chunk) for chunk in chunks
+        ])
+        quotes = {}
+        for chunk_quotes in results:
+            quotes.update(chunk_quotes)
+        return quotes
+
+    @staticmethod
+    async def get_multiple_stocks(symbols):
+        """Igual que YahooFinanceService.get_multiple_stocks, en el orden recibido"""
+        try:
+            quotes = await AsyncMarketService.get_quotes(symbols)
+        except Exception as e:
+            logger.error(f"Error obteniendo cotizaciones: {str(e)}")
+            return []
+        return [quotes[symbol.upper()] for symbol in symbols if symbol.upper() in quotes]
+
+    @staticmethod
+    async def get_popular_stocks():
+        return await AsyncMarketService.get_multiple_stocks(YahooFinanceService.POPULAR_STOCKS)
+
+    @staticmethod
+    async def get_popular_cryptos():
+        return await AsyncMarketService.get_multiple_stocks(YahooFinanceService.POPULAR_CRYPTOS)
+
+    @staticmethod
+    async def get_all_market_data():
+        """Acciones y criptomonedas pedidas en paralelo"""
+        stocks, cryptos = await asyncio.gather(
+            AsyncMarketService.get_popular_stocks(),
+            AsyncMarketService.get_popular_cryptos(),
+        )
+        return {
+            'stocks': stocks,
+            'cryptos': cryptos,
+            'total': len(stocks) + len(cryptos)
+        }
+
+    @staticmethod
+    async def search_stock(query):
+        return await run_upstream(YahooFinanceService.search_stock, query)
+
+    @staticmethod
+    async def get_history(symbol, **params):
+        return await run_upstream(YahooFinanceService.get_history, symbol, **params)
+
+    @staticmethod
+    async def get_stock_detail(symbol):
+        """
+        Igual que YahooFinanceService.get_stock_detail, con los tres componentes pedidos
+        en paralelo desde el event loop (dentro de un worker del pool run_all los
+        ejecutaría uno tras otro)
+        """
+        symbol = symbol.upper()
+        component = YahooFinanceService._detail_component
+        quote, fundamentals, historical_data = await asyncio.gather(
+            run_upstream(component, 'cotización', symbol, YahooFinanceService.get_quotes, [symbol]),
+            run_upstream(component, 'fundamentales', symbol, YahooFinanceService.get_fundamentals, symbol),
+            run_upstream(component, 'histórico', symbol, YahooFinanceService.get_detail_history, symbol),
+        )
+        return YahooFinanceService._build_detail(
+            symbol, (quote or {}).get(symbol), fundamentals, historical_data or []
+        )
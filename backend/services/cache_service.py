@@ -0,0 +1,488 @@
+import json
+import time
+import threading
+import logging
+from collections import OrderedDict
+
+from django.conf import settings
+
+try:
+    import redis
+except ImportError:  # redis es opcional: sin él se usa solo la caché en memoria
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """Caché LRU en memoria con expiración por clave (respaldo cuando Redis no está disponible)"""
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at is not None and expires_at <= time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        expires_at = time.time() + timeout if timeout else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def add(self, key, value, timeout=None):
+        """Guarda la clave solo si no existe (equivalente a SET NX)"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and (item[0] is None or item[0] > time.time()):
+                return False
+            expires_at = time.time() + timeout if timeout else None
+            self._data[key] = (expires_at, value)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_if(self, key, value):
+        """Borra la clave solo si todavía guarda `value`"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[1] != value:
+                return False
+            del self._data[key]
+            return True
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+_redis_client = None
+_redis_retry_at = 0.0
+_redis_lock = threading.Lock()
+
+# Compare-and-delete atómico para liberar locks: solo borra si el valor sigue siendo el nuestro
+_DELETE_IF_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+_delete_if_script = None
+
+
+def get_redis_client():
+    """
+    Retorna el cliente Redis compartido del proceso o None si Redis no está disponible.
+
+    Si la conexión falla se reintenta después de REDIS_RETRY_INTERVAL segundos,
+    mientras tanto los llamadores usan la caché en memoria.
+    """
+    global _redis_client, _redis_retry_at
+
+    redis_url = getattr(settings, 'REDIS_URL', '')
+    if redis is None or not redis_url:
+        return None
+    if _redis_client is not None:
+        return _redis_client
+    if time.time() < _redis_retry_at:
+        return None
+
+    with _redis_lock:
+        if _redis_client is not None:
+            return _redis_client
+        try:
+            client = redis.Redis.from_url(
+                redis_url,
+                socket_timeout=getattr(settings, 'REDIS_SOCKET_TIMEOUT', 0.5),
+                socket_connect_timeout=getattr(settings, 'REDIS_SOCKET_TIMEOUT', 0.5),
+            )
+            client.ping()
+            _redis_client = client
+            logger.info(f"Conectado a Redis en {redis_url}")
+        except Exception as e:
+            _redis_retry_at = time.time() + getattr(settings, 'REDIS_RETRY_INTERVAL', 30)
+            logger.warning(f"Redis no disponible, usando caché en memoria: {str(e)}")
+            return None
+    return _redis_client
+
+
+def _mark_redis_unavailable(error):
+    """Descarta el cliente Redis tras un error para reintentar más tarde"""
+    global _redis_client, _redis_retry_at
+    with _redis_lock:
+        _redis_client = None
+        _redis_retry_at = time.time() + getattr(settings, 'REDIS_RETRY_INTERVAL', 30)
+    logger.warning(f"Error de Redis, usando caché en memoria: {str(error)}")
+
+
+class CacheService:
+    """
+    Caché compartida respaldada por Redis con respaldo LRU en memoria.
+
+    Los valores se guardan como JSON dentro de un sobre con su instante de frescura,
+    lo que permite servir entradas vencidas (stale) mientras un único refresco
+    se ejecuta en segundo plano.
+    """
+
+    def __init__(self, namespace, max_local_entries=None, executor=None):
+        self.namespace = namespace
+        # Objeto con submit(fn) para los refrescos de fondo (si no, un hilo por refresco)
+        self.executor = executor
+        self.local = LRUCache(
+            max_local_entries or getattr(settings, 'LOCAL_CACHE_MAX_ENTRIES', 2048)
+        )
+        self._stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'refreshes': 0, 'errors': 0}
+        self._stats_lock = threading.Lock()
+
+    def _key(self, key):
+        return f"tikal:{self.namespace}:{key}"
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    @property
+    def backend(self):
+        return 'redis' if get_redis_client() is not None else 'local'
+
+    # Operaciones básicas
+
+    def get_raw(self, key):
+        """Obtiene el valor serializado (str) tal como está guardado"""
+        client = get_redis_client()
+        if client is not None:
+            try:
+                raw = client.get(self._key(key))
+                return raw.decode('utf-8') if raw is not None else None
+            except Exception as e:
+                self._count('errors')
+                _mark_redis_unavailable(e)
+        return self.local.get(key)
+
+    def set_raw(self, key, raw, timeout=None):
+        """Guarda un valor ya serializado (str)"""
+        client = get_redis_client()
+        if client is not None:
+            try:
+                client.set(self._key(key), raw, ex=int(timeout) if timeout else None)
+                return
+            except Exception as e:
+                self._count('errors')
+                _mark_redis_unavailable(e)
+        self.local.set(key, raw, timeout)
+
+    def get(self, key, default=None):
+        raw = self.get_raw(key)
+        if raw is None:
+            return default
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return default
+
+    def set(self, key, value, timeout=None):
+        self.set_raw(key, json.dumps(value, default=str), timeout)
+
+    def add(self, key, value, timeout):
+        """Guarda la clave solo si no existe. Sirve como lock distribuido sencillo"""
+        client = get_redis_client()
+        if client is not None:
+            try:
+                return bool(client.set(self._key(key), json.dumps(value), nx=True, ex=int(timeout)))
+            except Exception as e:
+                self._count('errors')
+                _mark_redis_unavailable(e)
+        return self.local.add(key, json.dumps(value), timeout)
+
+    def delete(self, key):
+        client = get_redis_client()
+        if client is not None:
+            try:
+                client.delete(self._key(key))
+            except Exception as e:
+                self._count('errors')
+                _mark_redis_unavailable(e)
+        self.local.delete(key)
+
+    def delete_if(self, key, value):
+        """
+        Borra la clave solo si su valor es `value`, en una sola operación atómica
+        (libera un lock tomado con add sin borrar el de otro dueño si el nuestro expiró)
+        """
+        global _delete_if_script
+
+        raw = json.dumps(value)
+        client = get_redis_client()
+        if client is not None:
+            try:
+                if _delete_if_script is None:
+                    _delete_if_script = client.register_script(_DELETE_IF_SCRIPT)
+                return bool(_delete_if_script(keys=[self._key(key)], args=[raw], client=client))
+            except Exception as e:
+                self._count('errors')
+                _mark_redis_unavailable(e)
+        return self.local.delete_if(key, raw)
+
+    def get_many(self, keys):
+        """Versión por lotes de get. Retorna {clave: valor} solo para claves existentes"""
+        if not keys:
+            return {}
+        raws = None
+        client = get_redis_client()
+        if client is not None:
+            try:
+                raws = [raw.decode('utf-8') if raw is not None else None
+                        for raw in client.mget([self._key(key) for key in keys])]
+            except Exception as e:
+                self._count('errors')
+                _mark_redis_unavailable(e)
+        if raws is None:
+            raws = [self.local.get(key) for key in keys]
+        values = {}
+        for key, raw in zip(keys, raws):
+            if raw is not None:
+                try:
+                    values[key] = json.loads(raw)
+                except ValueError:
+                    continue
+        return values
+
+    def set_many(self, values, timeout=None):
+        """Versión por lotes de set (un solo round trip con Redis)"""
+        if not values:
+            return
+        items = [(key, json.dumps(value, default=str)) for key, value in values.items()]
+        client = get_redis_client()
+        if client is not None:
+            try:
+                pipe = client.pipeline(transaction=False)
+                for key, raw in items:
+                    pipe.set(self._key(key), raw, ex=int(timeout) if timeout else None)
+                pipe.execute()
+                return
+            except Exception as e:
+                self._count('errors')
+                _mark_redis_unavailable(e)
+        for key, raw in items:
+            self.local.set(key, raw, timeout)
+
+    # Stale-while-revalidate
+
+    def get_entry(self, key):
+        """
+        Retorna (valor, fresco) o (None, False) si la clave no existe.
+
+        Una entrada no fresca sigue siendo servible durante su ventana stale.
+        """
+        envelope = self.get(key)
+        if not isinstance(envelope, dict) or 'value' not in envelope:
+            return None, False
+        return envelope['value'], time.time() < envelope.get('fresh_until', 0)
+
+    def set_entry(self, key, value, ttl, stale_ttl=0):
+        """Guarda un valor fresco durante ttl segundos y servible stale_ttl segundos más"""
+        envelope = {'value': value, 'fresh_until': time.time() + ttl}
+        self.set(key, envelope, timeout=ttl + stale_ttl)
+
+    def get_or_set(self, key, loader, ttl, stale_ttl=0):
+        """
+        Obtiene un valor de la caché o lo carga con loader().
+
+        - Entrada fresca: se sirve directamente.
+        - Entrada vencida dentro de la ventana stale: se sirve y se lanza
+          un único refresco en segundo plano.
+        - Sin entrada: se carga de forma síncrona. Los resultados None no se guardan.
+        """
+        value, fresh = self.get_entry(key)
+        if value is not None:
+            if fresh:
+                self._count('hits')
+            else:
+                self._count('stale_hits')
+                self.refresh_in_background(key, loader, ttl, stale_ttl)
+            return value
+
+        self._count('misses')
+        value = loader()
+        if value is not None:
+            self.set_entry(key, value, ttl, stale_ttl)
+        return value
+
+    def refresh_in_background(self, key, loader, ttl, stale_ttl=0):
+        """Lanza un refresco de la clave si no hay otro en curso (en este u otro worker)"""
+        lock_key = f"refreshing:{key}"
+        lock_timeout = getattr(settings, 'CACHE_REFRESH_LOCK_TIMEOUT', 30)
+        if not self.add(lock_key, 1, lock_timeout):
+            return False
+
+        def refresh():
+            try:
+                value = loader()
+                if value is not None:
+                    self.set_entry(key, value, ttl, stale_ttl)
+                self._count('refreshes')
+            except Exception as e:
+                self._count('errors')
+                logger.error(f"Error refrescando {key} en segundo plano: {str(e)}")
+            finally:
+                self.delete(lock_key)
+
+        return self._run_in_background(refresh, lock_key)
+
+    def get_many_entries(self, keys):
+        """Versión por lotes de get_entry. Retorna {clave: (valor, fresco)} solo para claves existentes"""
+        if not keys:
+            return {}
+        raws = None
+        client = get_redis_client()
+        if client is not None:
+            try:
+                raws = client.mget([self._key(key) for key in keys])
+                raws = [raw.decode('utf-8') if raw is not None else None for raw in raws]
+            except Exception as e:
+                self._count('errors')
+                _mark_redis_unavailable(e)
+                raws = None
+        if raws is None:
+            raws = [self.local.get(key) for key in keys]
+
+        now = time.time()
+        entries = {}
+        for key, raw in zip(keys, raws):
+            if raw is None:
+                continue
+            try:
+                envelope = json.loads(raw)
+            except ValueError:
+                continue
+            if isinstance(envelope, dict) and 'value' in envelope:
+                entries[key] = (envelope['value'], now < envelope.get('fresh_until', 0))
+        return entries
+
+    def set_many_entries(self, values, ttl, stale_ttl=0):
+        """
+        Versión por lotes de set_entry.
+
+        ttl puede ser un entero o una función clave -> segundos.
+        """
+        if not values:
+            return
+        now = time.time()
+        items = []
+        for key, value in values.items():
+            key_ttl = ttl(key) if callable(ttl) else ttl
+            envelope = {'value': value, 'fresh_until': now + key_ttl}
+            items.append((key, json.dumps(envelope, default=str), key_ttl + stale_ttl))
+
+        client = get_redis_client()
+        if client is not None:
+            try:
+                pipe = client.pipeline(transaction=False)
+                for key, raw, timeout in items:
+                    pipe.set(self._key(key), raw, ex=int(timeout))
+                pipe.execute()
+                return
+            except Exception as e:
+                self._count('errors')
+                _mark_redis_unavailable(e)
+        for key, raw, timeout in items:
+            self.local.set(key, raw, timeout)
+
+    def get_many_or_set(self, keys, loader, ttl, stale_ttl=0):
+        """
+        Versión por lotes de get_or_set.
+
+        loader recibe la lista de claves faltantes y retorna {clave: valor}, de modo
+        que todas las claves faltantes se cargan con una sola llamada. Las claves
+        vencidas se sirven y se refrescan juntas en un único hilo de fondo.
+        """
+        entries = self.get_many_entries(keys)
+        results = {}
+        stale, missing = [], []
+        for key in keys:
+            if key in entries:
+                value, fresh = entries[key]
+                results[key] = value
+                if not fresh:
+                    stale.append(key)
+            else:
+                missing.append(key)
+
+        self._count('hits', len(results) - len(stale))
+        self._count('stale_hits', len(stale))
+        self._count('misses', len(missing))
+
+        if stale:
+            self.refresh_many_in_background(stale, loader, ttl, stale_ttl)
+
+        if missing:
+            loaded = loader(missing) or {}
+            loaded = {key: value for key, value in loaded.items() if value is not None}
+            self.set_many_entries(loaded, ttl, stale_ttl)
+            results.update(loaded)
+        return results
+
+    def refresh_many_in_background(self, keys, loader, ttl, stale_ttl=0):
+        """Refresca en un solo hilo las claves que no tengan ya un refresco en curso"""
+        lock_timeout = getattr(settings, 'CACHE_REFRESH_LOCK_TIMEOUT', 30)
+        locked = [key for key in keys if self.add(f"refreshing:{key}", 1, lock_timeout)]
+        if not locked:
+            return False
+
+        def refresh():
+            try:
+                loaded = loader(locked) or {}
+                loaded = {key: value for key, value in loaded.items() if value is not None}
+                self.set_many_entries(loaded, ttl, stale_ttl)
+                self._count('refreshes', len(loaded))
+            except Exception as e:
+                self._count('errors')
+                logger.error(f"Error refrescando {len(locked)} claves en segundo plano: {str(e)}")
+            finally:
+                for key in locked:
+                    self.delete(f"refreshing:{key}")
+
+        return self._run_in_background(refresh, *[f"refreshing:{key}" for key in locked])
+
+    def _run_in_background(self, fn, *lock_keys):
+        """Ejecuta fn en el executor configurado o en un hilo propio"""
+        if self.executor is None:
+            threading.Thread(target=fn, name=f"cache-refresh-{self.namespace}", daemon=True).start()
+            return True
+        try:
+            self.executor.submit(fn)
+            return True
+        except Exception as e:
+            # Executor saturado: se libera el lock y se sigue sirviendo la entrada vencida
+            logger.warning(f"No se pudo programar el refresco de {self.namespace}: {str(e)}")
+            for lock_key in lock_keys:
+                self.delete(lock_key)
+            return False
+
+    def stats(self):
+        """Retorna los contadores de la caché"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        served = stats['hits'] + stats['stale_hits']
+        lookups = served + stats['misses']
+        stats['hit_ratio'] = round(served / lookups, 4) if lookups else 0.0
+        stats['backend'] = self.backend
+        stats['local_entries'] = len(self.local)
+        return stats
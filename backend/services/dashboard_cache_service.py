@@ -0,0 +1,48 @@
+import uuid
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from services.cache_service import CacheService
+
+logger = logging.getLogger(__name__)
+
+# Respuestas de /api/portfolio/portfolio/dashboard_stats/ ya serializadas, por usuario
+dashboard_cache = CacheService('dashboard')
+
+
+class DashboardCacheService:
+    """
+    Caché por usuario del cuerpo JSON completo del dashboard.
+
+    Cada usuario tiene una versión; el cuerpo se guarda bajo la versión vigente al
+    empezar a calcularlo. Invalidar cambia la versión, así un cálculo que empezó
+    antes del cambio nunca queda servido como actual. DASHBOARD_CACHE_TTL acota
+    la antigüedad de los precios de mercado dentro del cuerpo.
+    """
+
+    @staticmethod
+    def get(user_id):
+        """Retorna (cuerpo JSON o None, versión vigente del usuario)"""
+        version = dashboard_cache.get(f"version:{user_id}", 0)
+        return dashboard_cache.get_raw(f"body:{user_id}:{version}"), version
+
+    @staticmethod
+    def set(user_id, version, payload):
+        """Serializa el payload como lo haría la respuesta de DRF, lo guarda y retorna el cuerpo"""
+        body = JSONRenderer().render(payload).decode('utf-8')
+        dashboard_cache.set_raw(
+            f"body:{user_id}:{version}", body,
+            timeout=getattr(settings, 'DASHBOARD_CACHE_TTL', 30)
+        )
+        return body
+
+    @staticmethod
+    def invalidate(user_id):
+        """Descarta el dashboard del usuario cuando se confirma la transacción en curso"""
+        def bump():
+            dashboard_cache.set(f"version:{user_id}", uuid.uuid4().hex)
+
+        transaction.on_commit(bump)
@@ -0,0 +1,96 @@
+import json
+import logging
+from datetime import datetime
+
+from django.conf import settings
+
+from services.cache_service import CacheService
+from services.yahoo_finance_service import YahooFinanceService
+
+logger = logging.getLogger(__name__)
+
+# Caché donde el proceso de ingesta publica los snapshots del mercado
+snapshot_cache = CacheService('market')
+
+
+class MarketSnapshotService:
+    """
+    Snapshots pre-serializados de las listas del mercado (acciones y criptos populares).
+
+    El comando `ingest_market_data` los publica periódicamente y las vistas solo
+    leen el cuerpo JSON ya armado, sin consultar a Yahoo en la petición.
+    """
+
+    # Cuerpo de respuesta publicado para cada endpoint
+    ENDPOINTS = ('popular', 'cryptos', 'market_data')
+
+    @staticmethod
+    def build_payloads(stocks, cryptos, version):
+        """Arma las respuestas de cada endpoint con la misma forma que las vistas en vivo"""
+        timestamp = datetime.now().isoformat()
+        return {
+            'popular': {
+                'success': True,
+                'stocks': stocks,
+                'count': len(stocks),
+                'version': version,
+                'timestamp': timestamp,
+            },
+            'cryptos': {
+                'success': True,
+                'cryptos': cryptos,
+                'count': len(cryptos),
+                'version': version,
+                'timestamp': timestamp,
+            },
+            'market_data': {
+                'success': True,
+                'data': {
+                    'stocks': stocks,
+                    'cryptos': cryptos,
+                    'total': len(stocks) + len(cryptos),
+                },
+                'version': version,
+                'timestamp': timestamp,
+            },
+        }
+
+    @staticmethod
+    def get_version():
+        """Versión del último snapshot publicado (0 si no hay ninguno)"""
+        return snapshot_cache.get('snapshot:version', 0)
+
+    @staticmethod
+    def refresh():
+        """
+        Pide a Yahoo las acciones y criptos populares en una sola pasada por lotes
+        y publica un nuevo snapshot. Retorna la versión publicada.
+        """
+        stock_symbols = YahooFinanceService.POPULAR_STOCKS
+        crypto_symbols = YahooFinanceService.POPULAR_CRYPTOS
+        quotes = YahooFinanceService.refresh_quotes(stock_symbols + crypto_symbols)
+
+        stocks = [quotes[symbol] for symbol in stock_symbols if symbol in quotes]
+        cryptos = [quotes[symbol] for symbol in crypto_symbols if symbol in quotes]
+        if not stocks and not cryptos:
+            raise ValueError('Yahoo Finance no devolvió cotizaciones')
+
+        version = MarketSnapshotService.get_version() + 1
+        MarketSnapshotService.publish(MarketSnapshotService.build_payloads(stocks, cryptos, version), version)
+        return version
+
+    @staticmethod
+    def publish(payloads, version):
+        """Serializa una sola vez cada respuesta y la guarda en la caché"""
+        max_age = getattr(settings, 'MARKET_SNAPSHOT_MAX_AGE', 600)
+        for endpoint in MarketSnapshotService.ENDPOINTS:
+            body = json.dumps(payloads[endpoint], separators=(',', ':'))
+            snapshot_cache.set_raw(f"snapshot:{endpoint}", body, timeout=max_age)
+        # La versión no expira para que siga creciendo entre reinicios del proceso de ingesta
+        snapshot_cache.set('snapshot:version', version)
+        logger.info(f"Snapshot de mercado v{version} publicado")
+
+    @staticmethod
+    def get_payload(endpoint):
+        """Retorna el cuerpo JSON pre-serializado de un endpoint o None si no hay snapshot vigente"""
+        return snapshot_cache.get_raw(f"snapshot:{endpoint}")
@@ -0,0 +1,173 @@
+import heapq
+import logging
+import itertools
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.utils import timezone
+
+from services.yahoo_finance_service import YahooFinanceService
+
+logger = logging.getLogger(__name__)
+
+
+class OrderBook:
+    """
+    Órdenes abiertas indexadas por símbolo en dos heaps.
+
+    - below: órdenes que se disparan cuando el precio baja a su precio o menos
+      (límite de compra, stop de venta); max-heap, arriba la de precio más alto.
+    - above: órdenes que se disparan cuando el precio sube a su precio o más
+      (límite de venta, stop de compra); min-heap, arriba la de precio más bajo.
+    Con cada cotización solo se miran las cimas: O(1) si no se dispara nada y
+    O(log n) por orden disparada. A igual precio sale primero la más antigua.
+    Quitar una orden es perezoso: su entrada se descarta cuando llega a la cima.
+    """
+
+    def __init__(self):
+        self._below = {}
+        self._above = {}
+        self._orders = {}  # id -> (símbolo, precio, below)
+        self._live = {}  # símbolo -> órdenes abiertas en el libro
+        self._sequence = itertools.count()
+
+    def __len__(self):
+        return len(self._orders)
+
+    def __contains__(self, order_id):
+        return order_id in self._orders
+
+    def add(self, order_id, symbol, price, below):
+        """Agrega una orden abierta (si ya está no hace nada)"""
+        if order_id in self._orders:
+            return False
+        self._orders[order_id] = (symbol, price, below)
+        self._live[symbol] = self._live.get(symbol, 0) + 1
+        if below:
+            heapq.heappush(self._below.setdefault(symbol, []), (-price, next(self._sequence), order_id))
+        else:
+            heapq.heappush(self._above.setdefault(symbol, []), (price, next(self._sequence), order_id))
+        return True
+
+    def discard(self, order_id):
+        """Quita una orden (cancelada o ya ejecutada fuera del libro)"""
+        order = self._orders.pop(order_id, None)
+        if order is not None:
+            self._forget(order[0])
+
+    def symbols(self):
+        """Símbolos con alguna orden abierta (sin recorrer las órdenes)"""
+        return sorted(self._live)
+
+    def _forget(self, symbol):
+        """Descuenta una orden del símbolo; sin órdenes el símbolo deja de consultarse"""
+        remaining = self._live[symbol] - 1
+        if remaining:
+            self._live[symbol] = remaining
+        else:
+            del self._live[symbol]
+
+    def trigger(self, symbol, price):
+        """
+        Saca del libro las órdenes del símbolo que dispara el precio dado.
+        Retorna [(id, precio de la orden, below)] en orden de prioridad
+        """
+        triggered = []
+        below = self._below.get(symbol)
+        while below and -below[0][0] >= price:
+            self._pop(below, triggered)
+        above = self._above.get(symbol)
+        while above and above[0][0] <= price:
+            self._pop(above, triggered)
+        return triggered
+
+    def _pop(self, heap, triggered):
+        _, _, order_id = heapq.heappop(heap)
+        order = self._orders.pop(order_id, None)
+        if order is not None:
+            symbol, price, below = order
+            self._forget(symbol)
+            triggered.append((order_id, price, below))
+
+
+class OrderMatcher:
+    """
+    Ejecuta las órdenes límite y stop a medida que llegan cotizaciones.
+
+    Mantiene un OrderBook en memoria: `load` lo arma desde la base, `sync` agrega
+    las órdenes creadas desde la última sincronización y `on_quotes` ejecuta las que
+    dispara cada cotización (las de más de TRADE_QUOTE_MAX_AGE segundos se ignoran).
+    Las cancelaciones no se quitan del libro: al dispararse,
+    la ejecución vuelve a leer la orden bloqueada y la ignora si ya no está abierta
+    (`load` periódico limpia esas entradas).
+    """
+
+    # Margen hacia atrás de `sync` para órdenes cuya transacción confirmó tarde
+    SYNC_OVERLAP = timedelta(seconds=60)
+
+    def __init__(self):
+        self.book = OrderBook()
+        self._synced_at = None
+        self.stats = {'ticks': 0, 'stale': 0, 'triggered': 0, 'filled': 0, 'rejected': 0, 'errors': 0}
+
+    def load(self):
+        """Arma el libro con todas las órdenes abiertas. Retorna cuántas hay"""
+        self.book = OrderBook()
+        self._synced_at = None
+        self.sync()
+        return len(self.book)
+
+    def sync(self):
+        """Agrega al libro las órdenes abiertas creadas desde la última sincronización"""
+        from apps.portfolio.models import Order
+
+        started = timezone.now()
+        orders = Order.objects.filter(status='open')
+        if self._synced_at is not None:
+            orders = orders.filter(created_at__gte=self._synced_at - self.SYNC_OVERLAP)
+        added = 0
+        for order in orders.only('id', 'symbol', 'price', 'order_type', 'transaction_type').iterator(chunk_size=2000):
+            added += self.book.add(order.id, order.symbol, order.price, order.triggers_below)
+        self._synced_at = started
+        return added
+
+    def poll(self):
+        """Consulta las cotizaciones de los símbolos del libro (un solo lote) y las evalúa"""
+        symbols = self.book.symbols()
+        if not symbols:
+            return []
+        return self.on_quotes(YahooFinanceService.refresh_quotes(symbols))
+
+    def on_quotes(self, quotes):
+        """Evalúa una actualización {símbolo: cotización}. Retorna las órdenes procesadas"""
+        from services.trade_execution_service import TradeExecutionService
+
+        max_age = getattr(settings, 'TRADE_QUOTE_MAX_AGE', 60)
+        processed = []
+        for symbol, quote in quotes.items():
+            if not quote or not quote.get('price'):
+                continue
+            if TradeExecutionService.quote_age(quote) > max_age:
+                # Con Yahoo caído refresh_quotes devuelve la última cotización conocida:
+                # un precio viejo no dispara órdenes
+                self.stats['stale'] += 1
+                continue
+            self.stats['ticks'] += 1
+            price = Decimal(str(quote['price'])).quantize(Decimal('0.01'))
+            for order_id, order_price, below in self.book.trigger(symbol, price):
+                self.stats['triggered'] += 1
+                try:
+                    order = TradeExecutionService.fill_order(order_id, price)
+                except Exception as e:
+                    # Queda en el libro para la próxima cotización
+                    self.stats['errors'] += 1
+                    self.book.add(order_id, symbol, order_price, below)
+                    logger.error(f"Error ejecutando la orden {order_id}: {str(e)}")
+                    continue
+                if order.status == 'filled':
+                    self.stats['filled'] += 1
+                elif order.status == 'rejected':
+                    self.stats['rejected'] += 1
+                processed.append(order)
+        return processed
@@ -0,0 +1,197 @@
+import bisect
+import logging
+from datetime import timedelta
+from decimal import Decimal
+from itertools import groupby
+
+from django.utils import timezone
+
+from services.position_service import PositionService
+from services.price_history_service import PriceHistoryService
+from services.timeseries import lttb_downsample
+from services.upstream_pool import yahoo_pool
+
+logger = logging.getLogger(__name__)
+
+CENT = Decimal('0.01')
+
+# Rangos de /api/portfolio/portfolio/performance/ en días (None: todo el historial)
+RANGES = {
+    '1w': 7,
+    '1m': 30,
+    '3m': 90,
+    '6m': 182,
+    '1y': 365,
+    'all': None,
+}
+
+
+class PortfolioHistoryService:
+    """
+    Serie diaria del valor de los portafolios (modelo PortfolioValueSnapshot).
+
+    `snapshot` valora el libro de posiciones actual a precio de cierre (el comando
+    nocturno) y `backfill` reconstruye días pasados recorriendo las transacciones.
+    Los precios de cierre salen del almacén local de barras (PriceHistoryService).
+    """
+
+    @staticmethod
+    def get_series(user_id, range_key='1m', max_points=None):
+        """
+        Valor diario del portafolio en el rango pedido, reducido a max_points con LTTB.
+        Lanza ValueError si el rango no existe
+        """
+        from apps.portfolio.models import PortfolioValueSnapshot
+
+        if range_key not in RANGES:
+            raise ValueError(f"Rango inválido: {range_key}. Opciones: {', '.join(RANGES)}")
+        snapshots = PortfolioValueSnapshot.objects.filter(user_id=user_id)
+        if RANGES[range_key] is not None:
+            snapshots = snapshots.filter(date__gte=timezone.localdate() - timedelta(days=RANGES[range_key]))
+
+        records = [
+            {'date': day.isoformat(), 'value': float(market_value), 'invested': float(cost_basis)}
+            for day, market_value, cost_basis in snapshots.order_by('date').values_list(
+                'date', 'market_value', 'cost_basis'
+            )
+        ]
+        return lttb_downsample(records, max_points, value_key='value')
+
+    @staticmethod
+    def get_close_prices(symbols, start, end):
+        """
+        Cierres diarios de los símbolos entre start y end: {símbolo: (fechas, cierres)}.
+        Sincroniza cada símbolo con Yahoo antes de leer (en paralelo, con el pool)
+        """
+        from apps.stocks.models import PriceBar
+
+        symbols = sorted(set(symbols))
+
+        def sync(symbol):
+            try:
+                PriceHistoryService.sync(symbol)
+            except Exception as e:
+                # Se valora con las barras que ya estén guardadas
+                logger.warning(f"No se pudo sincronizar el histórico de {symbol}: {str(e)}")
+
+        yahoo_pool.run_all([lambda symbol=symbol: sync(symbol) for symbol in symbols])
+
+        prices = {}
+        # Margen hacia atrás para fines de semana y feriados al inicio del rango
+        bars = PriceBar.objects.filter(
+            symbol__in=symbols, date__gte=start - timedelta(days=10), date__lte=end
+        ).order_by('symbol', 'date').values_list('symbol', 'date', 'close')
+        for symbol, rows in groupby(bars, key=lambda bar: bar[0]):
+            dates, closes = [], []
+            for _, day, close in rows:
+                dates.append(day)
+                closes.append(close)
+            prices[symbol] = (dates, closes)
+        return prices
+
+    @staticmethod
+    def close_on(prices, symbol, day):
+        """Último cierre del símbolo en o antes de `day` (None si no hay)"""
+        dates, closes = prices.get(symbol, ((), ()))
+        i = bisect.bisect_right(dates, day) - 1
+        return Decimal(str(closes[i])) if i >= 0 else None
+
+    @staticmethod
+    def value_positions(positions, prices, day):
+        """
+        (valor de mercado, costo) de las posiciones al cierre de `day`.
+        Un símbolo sin cierre se valora a su costo
+        """
+        market_value = Decimal('0')
+        cost_basis = Decimal('0')
+        for position in positions:
+            if position.shares <= 0:
+                continue
+            close = PortfolioHistoryService.close_on(prices, position.symbol, day)
+            market_value += (position.shares * close).quantize(CENT) if close is not None else position.cost_basis
+            cost_basis += position.cost_basis
+        return market_value, cost_basis
+
+    @staticmethod
+    def _save(snapshots):
+        from apps.portfolio.models import PortfolioValueSnapshot
+
+        PortfolioValueSnapshot.objects.bulk_create(
+            snapshots,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['user', 'date'],
+            update_fields=['market_value', 'cost_basis'],
+        )
+        return len(snapshots)
+
+    @staticmethod
+    def snapshot(day=None):
+        """
+        Guarda el valor de cada portafolio al cierre de `day` (hoy por defecto) usando
+        el libro de posiciones actual. Retorna cuántos portafolios se guardaron
+        """
+        from apps.portfolio.models import Position, PortfolioValueSnapshot
+
+        day = day or timezone.localdate()
+        positions = list(Position.objects.order_by('user_id'))
+        prices = PortfolioHistoryService.get_close_prices(
+            [position.symbol for position in positions if position.shares > 0], day, day
+        )
+
+        snapshots = []
+        for user_id, user_positions in groupby(positions, key=lambda position: position.user_id):
+            market_value, cost_basis = PortfolioHistoryService.value_positions(user_positions, prices, day)
+            snapshots.append(PortfolioValueSnapshot(
+                user_id=user_id, date=day, market_value=market_value, cost_basis=cost_basis
+            ))
+        return PortfolioHistoryService._save(snapshots)
+
+    @staticmethod
+    def backfill(start, end=None, user_ids=None):
+        """
+        Reconstruye los valores diarios entre start y end recorriendo una sola vez las
+        transacciones completadas de cada usuario. Retorna cuántas filas se guardaron
+        """
+        from apps.portfolio.models import Portfolio, Position, PortfolioValueSnapshot, StockTransaction
+
+        end = end or timezone.localdate()
+        transactions = StockTransaction.objects.filter(status='completed')
+        portfolios = Portfolio.objects.all()
+        if user_ids is not None:
+            transactions = transactions.filter(user_id__in=user_ids)
+            portfolios = portfolios.filter(user_id__in=user_ids)
+        methods = dict(portfolios.values_list('user_id', 'cost_method'))
+        prices = PortfolioHistoryService.get_close_prices(
+            transactions.order_by().values_list('symbol', flat=True).distinct(), start, end
+        )
+
+        rows = transactions.order_by('user_id', 'created_at', 'id').values_list(
+            'user_id', 'symbol', 'transaction_type', 'shares', 'total', 'created_at'
+        ).iterator(chunk_size=2000)
+        saved = 0
+        for user_id, user_rows in groupby(rows, key=lambda row: row[0]):
+            user_rows = [
+                (symbol, transaction_type, shares, total, timezone.localtime(created_at).date())
+                for _, symbol, transaction_type, shares, total, created_at in user_rows
+            ]
+            positions = {}
+            method = methods.get(user_id, 'average')
+            snapshots = []
+            next_row = 0
+            day = max(start, user_rows[0][4])
+            while day <= end:
+                while next_row < len(user_rows) and user_rows[next_row][4] <= day:
+                    symbol, transaction_type, shares, total, _ = user_rows[next_row]
+                    position = positions.setdefault(symbol, Position(
+                        symbol=symbol, shares=Decimal('0'), cost_basis=Decimal('0'), realized_pnl=Decimal('0')
+                    ))
+                    PositionService.apply_fill(position, transaction_type, shares, total, method)
+                    next_row += 1
+                market_value, cost_basis = PortfolioHistoryService.value_positions(positions.values(), prices, day)
+                snapshots.append(PortfolioValueSnapshot(
+                    user_id=user_id, date=day, market_value=market_value, cost_basis=cost_basis
+                ))
+                day += timedelta(days=1)
+            saved += PortfolioHistoryService._save(snapshots)
+        return saved
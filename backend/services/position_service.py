@@ -0,0 +1,206 @@
+import logging
+from decimal import Decimal
+
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+CENT = Decimal('0.01')
+SHARE = Decimal('0.0001')
+
+# Campos de StockTransaction que afectan a la posición
+LEDGER_FIELDS = ('symbol', 'transaction_type', 'shares', 'total', 'status')
+
+
+class PositionService:
+    """
+    Libro de posiciones (modelo Position) con el método de costo de cada usuario
+    (Portfolio.cost_method).
+
+    - Compra: suma acciones y costo; con FIFO o LIFO abre un lote nuevo.
+    - Venta: descuenta el costo de las acciones vendidas (costo promedio, o los
+      lotes más antiguos / más nuevos) y acumula la diferencia con lo cobrado en
+      realized_pnl de la posición y de la transacción. Vender más de lo que se
+      tiene solo cierra la posición (como el cálculo anterior de los holdings).
+    Cada transacción completada se aplica en O(lotes consumidos); el historial
+    completo solo se recorre al reconstruir o al cambiar de método.
+    """
+
+    @staticmethod
+    def get_cost_method(user_id):
+        """Método de costo del usuario (costo promedio si no tiene portafolio)"""
+        from apps.portfolio.models import Portfolio
+
+        method = Portfolio.objects.filter(user_id=user_id).values_list('cost_method', flat=True).first()
+        return method or 'average'
+
+    @staticmethod
+    def apply_fill(position, transaction_type, shares, total, method='average'):
+        """
+        Aplica una compra o venta sobre la posición (sin guardar).
+        Retorna la ganancia realizada por la venta (None en compras)
+        """
+        if transaction_type == 'buy':
+            position.shares += shares
+            position.cost_basis += total
+            if method != 'average':
+                position.lots.append([str(shares.quantize(SHARE)), str(total.quantize(CENT))])
+            return None
+
+        sold = min(shares, position.shares)
+        if sold <= 0 or shares <= 0:
+            return Decimal('0')
+        if method == 'average':
+            cost = (position.cost_basis * sold / position.shares).quantize(CENT)
+        else:
+            cost = PositionService._consume_lots(position.lots, sold, newest_first=(method == 'lifo'))
+        proceeds = (total * sold / shares).quantize(CENT)
+        realized = proceeds - cost
+        position.realized_pnl += realized
+        position.shares -= sold
+        position.cost_basis -= cost
+        if position.shares == 0:
+            # Sin residuos de redondeo en posiciones cerradas
+            position.cost_basis = Decimal('0')
+        return realized
+
+    @staticmethod
+    def _consume_lots(lots, shares, newest_first=False):
+        """
+        Saca `shares` acciones de los lotes [[acciones, costo], ...] (del más antiguo
+        o del más nuevo). Retorna el costo de las acciones sacadas
+        """
+        index = -1 if newest_first else 0
+        cost = Decimal('0')
+        remaining = shares
+        while remaining > 0 and lots:
+            lot_shares, lot_cost = Decimal(lots[index][0]), Decimal(lots[index][1])
+            if lot_shares <= remaining:
+                lots.pop(index)
+                cost += lot_cost
+                remaining -= lot_shares
+            else:
+                part = (lot_cost * remaining / lot_shares).quantize(CENT)
+                lots[index] = [str((lot_shares - remaining).quantize(SHARE)), str(lot_cost - part)]
+                cost += part
+                remaining = Decimal('0')
+        return cost
+
+    @staticmethod
+    def apply_transaction(stock_transaction):
+        """
+        Aplica una transacción completada a la posición del usuario y guarda la
+        ganancia realizada de las ventas en la transacción. Bloquea la fila de la
+        posición, así dos operaciones simultáneas del mismo símbolo no se pisan
+        """
+        from apps.portfolio.models import Position, StockTransaction
+
+        with transaction.atomic():
+            position, _ = Position.objects.get_or_create(
+                user_id=stock_transaction.user_id,
+                symbol=stock_transaction.symbol,
+                defaults={
+                    'name': stock_transaction.name,
+                    'cost_method': lambda: PositionService.get_cost_method(stock_transaction.user_id),
+                },
+            )
+            position = Position.objects.select_for_update().get(pk=position.pk)
+            realized = PositionService.apply_fill(
+                position,
+                stock_transaction.transaction_type,
+                stock_transaction.shares,
+                stock_transaction.total,
+                position.cost_method,
+            )
+            if stock_transaction.name:
+                position.name = stock_transaction.name
+            position.save(update_fields=['name', 'shares', 'cost_basis', 'realized_pnl', 'lots', 'updated_at'])
+            if realized is not None:
+                StockTransaction.objects.filter(pk=stock_transaction.pk).update(realized_pnl=realized)
+                stock_transaction.realized_pnl = realized
+        return position
+
+    @staticmethod
+    def replay(transactions, methods=None, realized=None):
+        """
+        Posiciones que resultan de las transacciones dadas, en orden cronológico.
+        Cada fila es (user_id, symbol, name, transaction_type, shares, total[, id]);
+        `methods` es {user_id: método de costo} (costo promedio por defecto). Si se
+        pasa `realized` se completa con {id: ganancia realizada} de cada venta.
+        Retorna {(user_id, symbol): Position} sin guardar
+        """
+        from apps.portfolio.models import Position
+
+        methods = methods or {}
+        positions = {}
+        for user_id, symbol, name, transaction_type, shares, total, *rest in transactions:
+            key = (user_id, symbol)
+            position = positions.get(key)
+            if position is None:
+                position = positions[key] = Position(
+                    user_id=user_id, symbol=symbol, name=name, cost_method=methods.get(user_id, 'average'),
+                    shares=Decimal('0'), cost_basis=Decimal('0'), realized_pnl=Decimal('0'),
+                )
+            pnl = PositionService.apply_fill(position, transaction_type, shares, total, position.cost_method)
+            if realized is not None and pnl is not None:
+                realized[rest[0]] = pnl
+            if name:
+                position.name = name
+        return positions
+
+    @staticmethod
+    def rebuild(user_ids=None, symbols=None):
+        """
+        Reconstruye las posiciones (y la ganancia realizada de cada venta) desde las
+        transacciones completadas. Sin argumentos reconstruye todo el libro.
+        Retorna el número de posiciones
+        """
+        from apps.portfolio.models import Portfolio, Position, StockTransaction
+
+        scope = StockTransaction.objects.all()
+        positions = Position.objects.all()
+        portfolios = Portfolio.objects.all()
+        if user_ids is not None:
+            scope = scope.filter(user_id__in=user_ids)
+            positions = positions.filter(user_id__in=user_ids)
+            portfolios = portfolios.filter(user_id__in=user_ids)
+        if symbols is not None:
+            scope = scope.filter(symbol__in=symbols)
+            positions = positions.filter(symbol__in=symbols)
+
+        with transaction.atomic():
+            # Bloquea las posiciones a reemplazar mientras se recalculan
+            list(positions.select_for_update().values_list('pk', flat=True))
+            realized = {}
+            rebuilt = PositionService.replay(
+                scope.filter(status='completed').order_by('created_at', 'id').values_list(
+                    'user_id', 'symbol', 'name', 'transaction_type', 'shares', 'total', 'id'
+                ).iterator(chunk_size=2000),
+                methods=dict(portfolios.values_list('user_id', 'cost_method')),
+                realized=realized,
+            )
+            positions.delete()
+            Position.objects.bulk_create(rebuilt.values(), batch_size=1000)
+
+            # Solo se escriben las ventas cuya ganancia cambió (las no completadas quedan en NULL)
+            changed = [
+                StockTransaction(pk=pk, realized_pnl=realized.get(pk))
+                for pk, current in scope.filter(transaction_type='sell').values_list('pk', 'realized_pnl')
+                if current != realized.get(pk)
+            ]
+            StockTransaction.objects.bulk_update(changed, ['realized_pnl'], batch_size=1000)
+
+        logger.info(f"Posiciones reconstruidas: {len(rebuilt)}")
+        return len(rebuilt)
+
+    @staticmethod
+    def set_cost_method(user_id, method):
+        """Cambia el método de costo del usuario y recalcula sus posiciones y ganancias"""
+        from apps.portfolio.models import Portfolio
+        from services.dashboard_cache_service import DashboardCacheService
+
+        with transaction.atomic():
+            Portfolio.objects.update_or_create(user_id=user_id, defaults={'cost_method': method})
+            count = PositionService.rebuild(user_ids=[user_id])
+            DashboardCacheService.invalidate(user_id)
+        return count
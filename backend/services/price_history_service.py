@@ -0,0 +1,209 @@
+import logging
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Max
+
+from services.cache_service import CacheService
+from services.single_flight import SingleFlight, upstream_flight
+from services.upstream_pool import yahoo_pool
+from services.resilience import yahoo_guard
+
+logger = logging.getLogger(__name__)
+
+# Marca de la última sincronización de cada símbolo con Yahoo
+sync_cache = CacheService('price_history')
+
+# Símbolos con un backfill encolado en el pool (uno por símbolo y proceso)
+_pending_backfills = set()
+_pending_lock = threading.Lock()
+
+
+class PriceHistoryService:
+    """
+    Almacén local de barras diarias OHLCV (modelo PriceBar).
+
+    El backfill completo de un símbolo nuevo corre en segundo plano en el pool de
+    Yahoo; mientras tanto las peticiones descargan solo la ventana que piden. Con
+    barras guardadas solo se piden a Yahoo las posteriores a la última, y como
+    mucho una vez cada PRICE_HISTORY_SYNC_INTERVAL segundos.
+    """
+
+    @staticmethod
+    def get_daily_history(symbol, start=None, fields=('close', 'open', 'high', 'low', 'volume')):
+        """
+        Retorna las barras diarias del símbolo desde `start` (date) en orden cronológico,
+        con la misma forma que YahooFinanceService.history_to_records
+        """
+        from apps.stocks.models import PriceBar
+
+        symbol = symbol.upper()
+        try:
+            if start is not None and not PriceHistoryService.is_stored(symbol):
+                PriceHistoryService.backfill_in_background(symbol)
+                return PriceHistoryService.fetch_window(symbol, start, fields)
+            PriceHistoryService.sync(symbol)
+        except Exception as e:
+            # Sin Yahoo (circuito abierto, rate limit, caída) se sirve lo que ya está guardado
+            logger.warning(f"No se pudo sincronizar el histórico de {symbol}: {str(e)}")
+
+        bars = PriceBar.objects.filter(symbol=symbol)
+        if start is not None:
+            bars = bars.filter(date__gte=start)
+        rows = list(bars.order_by('date').values_list('date', *fields))
+        if not rows:
+            return []
+
+        # Por columnas, como history_to_records: un redondeo por columna y filas zipeadas
+        columns = list(zip(*rows))
+        values = [np.array(columns[0], dtype='datetime64[D]').astype(str).tolist()]
+        for field, column in zip(fields, columns[1:]):
+            if field == 'volume':
+                values.append(list(column))
+            else:
+                values.append(np.array(column, dtype='float64').round(2).tolist())
+        keys = ('date',) + tuple(fields)
+        return [dict(zip(keys, row)) for row in zip(*values)]
+
+    @staticmethod
+    def is_stored(symbol):
+        """True si el símbolo ya tiene barras guardadas"""
+        from apps.stocks.models import PriceBar
+
+        return bool(sync_cache.get(f"synced:{symbol}")) or PriceBar.objects.filter(symbol=symbol).exists()
+
+    @staticmethod
+    def fetch_window(symbol, start, fields=('close', 'open', 'high', 'low', 'volume')):
+        """Descarga de Yahoo las barras diarias desde `start` sin guardarlas"""
+        from services.yahoo_finance_service import YahooFinanceService
+
+        def fetch():
+            ticker = yahoo_pool.ticker(symbol)
+            return yahoo_guard.call(lambda: ticker.history(start=start.isoformat(), interval='1d'))
+
+        hist = upstream_flight.do(
+            SingleFlight.make_key('history_window', symbol, {'start': start.isoformat()}),
+            fetch,
+        )
+        return YahooFinanceService.history_to_records(hist, fields=fields)
+
+    @staticmethod
+    def backfill_in_background(symbol):
+        """Encola en el pool de Yahoo la sincronización completa del símbolo (una vez por símbolo)"""
+        with _pending_lock:
+            if symbol in _pending_backfills:
+                return
+            _pending_backfills.add(symbol)
+
+        def run():
+            close_old_connections()
+            try:
+                PriceHistoryService.sync(symbol)
+            except Exception as e:
+                logger.warning(f"Falló el backfill de histórico de {symbol}: {str(e)}")
+            finally:
+                with _pending_lock:
+                    _pending_backfills.discard(symbol)
+                close_old_connections()
+
+        try:
+            yahoo_pool.submit(run)
+        except Exception as e:
+            with _pending_lock:
+                _pending_backfills.discard(symbol)
+            logger.warning(f"No se pudo encolar el backfill de histórico de {symbol}: {str(e)}")
+
+    @staticmethod
+    def pending_backfills():
+        """Cantidad de backfills encolados o en curso en este proceso"""
+        with _pending_lock:
+            return len(_pending_backfills)
+
+    @staticmethod
+    def get_last_year(symbol, fields=('close', 'open', 'high', 'low', 'volume')):
+        """Atajo para el histórico de 1 año que usan /history y /detail"""
+        return PriceHistoryService.get_daily_history(
+            symbol, start=date.today() - timedelta(days=365), fields=fields
+        )
+
+    @staticmethod
+    def sync(symbol):
+        """
+        Sincroniza el símbolo con Yahoo si no se hizo recientemente.
+
+        Sin barras guardadas se hace el backfill (PRICE_HISTORY_BACKFILL_PERIOD);
+        con barras se piden solo las fechas desde la última guardada, que se
+        reescribe porque la barra del día puede estar incompleta.
+        """
+        symbol = symbol.upper()
+        if sync_cache.get(f"synced:{symbol}"):
+            return 0
+
+        # Un solo backfill/sincronización por símbolo aunque lleguen muchas peticiones a la vez
+        return upstream_flight.do(
+            SingleFlight.make_key('history_sync', symbol),
+            lambda: PriceHistoryService._sync(symbol),
+            shared=True,
+        )
+
+    @staticmethod
+    def _sync(symbol):
+        """Descarga de Yahoo las barras faltantes del símbolo y las guarda"""
+        from apps.stocks.models import PriceBar
+
+        if sync_cache.get(f"synced:{symbol}"):
+            return 0
+
+        last_date = PriceBar.objects.filter(symbol=symbol).aggregate(last=Max('date'))['last']
+        ticker = yahoo_pool.ticker(symbol)
+        if last_date is None:
+            hist = yahoo_guard.call(lambda: ticker.history(
+                period=getattr(settings, 'PRICE_HISTORY_BACKFILL_PERIOD', 'max')
+            ))
+            logger.info(f"Backfill de histórico para {symbol}: {len(hist)} barras")
+        else:
+            hist = yahoo_guard.call(lambda: ticker.history(start=last_date.isoformat(), interval='1d'))
+
+        stored = PriceHistoryService.store_bars(symbol, hist)
+        sync_cache.set(
+            f"synced:{symbol}", True,
+            timeout=getattr(settings, 'PRICE_HISTORY_SYNC_INTERVAL', 900)
+        )
+        return stored
+
+    @staticmethod
+    def store_bars(symbol, hist):
+        """Guarda (o actualiza) las barras de un DataFrame de yfinance. Retorna cuántas se escribieron"""
+        from apps.stocks.models import PriceBar
+
+        if hist is None or hist.empty:
+            return 0
+
+        frame = hist[['Open', 'High', 'Low', 'Close', 'Volume']].dropna()
+        index = frame.index
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        dates = index.to_numpy(dtype='datetime64[D]').astype(object)
+
+        bars = [
+            PriceBar(symbol=symbol, date=bar_date, open=o, high=h, low=l, close=c, volume=int(v))
+            for bar_date, o, h, l, c, v in zip(
+                dates,
+                frame['Open'].to_numpy(dtype='float64').tolist(),
+                frame['High'].to_numpy(dtype='float64').tolist(),
+                frame['Low'].to_numpy(dtype='float64').tolist(),
+                frame['Close'].to_numpy(dtype='float64').tolist(),
+                frame['Volume'].to_numpy(dtype='int64').tolist(),
+            )
+        ]
+        PriceBar.objects.bulk_create(
+            bars,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['symbol', 'date'],
+            update_fields=['open', 'high', 'low', 'close', 'volume', 'updated_at'],
+        )
+        return len(bars)
@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import weakref
+from collections import Counter
+
+from django.conf import settings
+
+from services.async_market_service import AsyncMarketService
+
+logger = logging.getLogger(__name__)
+
+# Campos que cuentan como cambio de cotización (lastUpdate cambia en cada consulta)
+DELTA_FIELDS = ('price', 'change', 'changePercent', 'volume', 'marketCap')
+
+
+def quote_signature(quote):
+    if quote is None:
+        return None
+    return tuple(quote.get(field) for field in DELTA_FIELDS)
+
+
+class QuoteSubscriber:
+    """
+    Suscriptor del stream. Acumula las cotizaciones pendientes por símbolo (la más
+    reciente gana), así un cliente lento no hace crecer la memoria: recibe el último
+    estado de cada símbolo cuando vuelve a leer.
+    """
+
+    def __init__(self, symbols):
+        self.symbols = frozenset(symbols)
+        self._pending = {}
+        self._event = asyncio.Event()
+
+    def push(self, quotes):
+        for symbol, quote in quotes.items():
+            if symbol in self.symbols:
+                self._pending[symbol] = quote
+        if self._pending:
+            self._event.set()
+
+    async def next_changes(self, timeout):
+        """Espera hasta timeout segundos por cambios; retorna {} si no hubo ninguno"""
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return {}
+        self._event.clear()
+        changes, self._pending = self._pending, {}
+        return changes
+
+
+class QuoteStreamHub:
+    """
+    Un único poller por proceso (event loop) para todos los clientes del stream.
+
+    Cada QUOTE_STREAM_INTERVAL segundos consulta las cotizaciones de la unión de los
+    símbolos observados y reparte solo las que cambiaron. El costo hacia Yahoo es
+    O(símbolos) y no O(clientes × símbolos); el poller se detiene sin suscriptores.
+    """
+
+    def __init__(self):
+        self._subscribers = set()
+        self._watched = Counter()
+        self._last = {}
+        self._task = None
+        self._stats = {'polls': 0, 'errors': 0, 'deltas': 0}
+
+    def subscribe(self, symbols):
+        subscriber = QuoteSubscriber(symbols)
+        self._subscribers.add(subscriber)
+        self._watched.update(subscriber.symbols)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        if subscriber not in self._subscribers:
+            return
+        self._subscribers.discard(subscriber)
+        self._watched.subtract(subscriber.symbols)
+        for symbol in subscriber.symbols:
+            if self._watched[symbol] <= 0:
+                del self._watched[symbol]
+                self._last.pop(symbol, None)
+        if not self._subscribers and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def snapshot(self, subscriber):
+        """Estado actual de los símbolos del suscriptor (consulta los que aún no se conocen)"""
+        missing = [symbol for symbol in subscriber.symbols if symbol not in self._last]
+        if missing:
+            quotes = await AsyncMarketService.get_quotes(missing)
+            for symbol, quote in quotes.items():
+                self._last.setdefault(symbol, quote)
+        return {symbol: self._last[symbol] for symbol in subscriber.symbols if symbol in self._last}
+
+    async def _run(self):
+        interval = getattr(settings, 'QUOTE_STREAM_INTERVAL', 5)
+        while True:
+            await asyncio.sleep(interval)
+            await self.poll()
+
+    async def poll(self):
+        """Consulta los símbolos observados y envía los cambios a los suscriptores"""
+        symbols = list(self._watched)
+        if not symbols:
+            return
+        self._stats['polls'] += 1
+        try:
+            quotes = await AsyncMarketService.get_quotes(symbols)
+        except Exception as e:
+            self._stats['errors'] += 1
+            logger.warning(f"Error actualizando cotizaciones del stream: {str(e)}")
+            return
+
+        changed = {
+            symbol: quote for symbol, quote in quotes.items()
+            if symbol in self._watched and quote_signature(self._last.get(symbol)) != quote_signature(quote)
+        }
+        if not changed:
+            return
+        self._last.update(changed)
+        self._stats['deltas'] += len(changed)
+        for subscriber in list(self._subscribers):
+            subscriber.push(changed)
+
+    def stats(self):
+        return {
+            'subscribers': len(self._subscribers),
+            'watched_symbols': len(self._watched),
+            **self._stats,
+        }
+
+
+_hubs = weakref.WeakKeyDictionary()
+
+
+def get_quote_hub():
+    """Hub del event loop actual"""
+    loop = asyncio.get_running_loop()
+    hub = _hubs.get(loop)
+    if hub is None:
+        hub = QuoteStreamHub()
+        _hubs[loop] = hub
+    return hub
@@ -0,0 +1,258 @@
+import time
+import threading
+import logging
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """El circuito está abierto: no se llama al servicio externo"""
+
+
+class RateLimitedError(Exception):
+    """No hubo token disponible a tiempo para llamar al servicio externo"""
+
+
+def is_throttle_error(error):
+    """True si el error corresponde a un HTTP 429 / rate limit de Yahoo"""
+    try:
+        from yfinance.exceptions import YFRateLimitError
+        if isinstance(error, YFRateLimitError):
+            return True
+    except ImportError:
+        pass
+    response = getattr(error, 'response', None)
+    if getattr(response, 'status_code', None) == 429:
+        return True
+    return 'Too Many Requests' in str(error)
+
+
+def is_network_error(error):
+    """True si el error es de conexión o timeout (el servicio externo no respondió)"""
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    try:
+        from curl_cffi.requests import exceptions as curl_exceptions
+        if isinstance(error, (curl_exceptions.ConnectionError, curl_exceptions.Timeout)):
+            return True
+    except ImportError:
+        pass
+    try:
+        from requests import exceptions as requests_exceptions
+        if isinstance(error, (requests_exceptions.ConnectionError, requests_exceptions.Timeout)):
+            return True
+    except ImportError:
+        pass
+    return False
+
+
+def is_upstream_failure(error):
+    """
+    True si el error indica un problema del servicio externo (red, timeout, 5xx, 429).
+    Cualquier otro error (4xx, símbolo inexistente o deslistado, respuesta que no se
+    pudo interpretar) es de la petición y no abre el circuito.
+    """
+    if is_throttle_error(error) or is_network_error(error):
+        return True
+    status_code = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status_code is not None and status_code >= 500
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker clásico: closed -> open tras N fallos seguidos, open -> half_open
+    después de recovery_timeout segundos, y half_open deja pasar una sola llamada de prueba.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_threshold=5, recovery_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'failures': 0, 'rejected': 0, 'opened': 0}
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = False
+        return self._state
+
+    def allow(self):
+        """Indica si se puede llamar al servicio externo ahora"""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                self._stats['calls'] += 1
+                return True
+            if state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                self._stats['calls'] += 1
+                return True
+            self._stats['rejected'] += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info(f"Circuito {self.name} cerrado")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._stats['failures'] += 1
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self._stats['opened'] += 1
+                    logger.warning(f"Circuito {self.name} abierto tras {self._failures} fallos")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+    def release_trial(self):
+        """Libera la llamada de prueba si terminó sin éxito ni fallo del servicio externo"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['state'] = self._current_state()
+            stats['consecutive_failures'] = self._failures
+            if self._state == self.OPEN:
+                stats['retry_in'] = round(max(0.0, self.recovery_timeout - (time.monotonic() - self._opened_at)), 1)
+        return stats
+
+
+class AdaptiveTokenBucket:
+    """
+    Token bucket cuya tasa se adapta (AIMD): se reduce a la mitad con cada 429
+    y crece de forma aditiva con cada llamada exitosa hasta la tasa máxima.
+    """
+
+    def __init__(self, rate, capacity, min_rate=0.5):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.min_rate = float(min_rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._stats = {'throttled': 0, 'timeouts': 0}
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def acquire(self, timeout=0):
+        """Toma un token esperando hasta timeout segundos. Retorna False si no lo consiguió"""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if time.monotonic() + wait > deadline:
+                with self._lock:
+                    self._stats['timeouts'] += 1
+                return False
+            time.sleep(wait)
+
+    def on_throttled(self):
+        """El servicio respondió 429: reducir la tasa y vaciar el bucket"""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = 0
+            self._stats['throttled'] += 1
+        logger.warning(f"Rate limit de Yahoo: tasa reducida a {self.rate:.2f} req/s")
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+    def stats(self):
+        with self._lock:
+            self._refill()
+            return {
+                'rate': round(self.rate, 3),
+                'max_rate': self.max_rate,
+                'tokens': round(self._tokens, 2),
+                **self._stats,
+            }
+
+
+class UpstreamGuard:
+    """Envuelve cada llamada al servicio externo con circuit breaker y rate limiter"""
+
+    def __init__(self, name, breaker, limiter):
+        self.name = name
+        self.breaker = breaker
+        self.limiter = limiter
+
+    def call(self, fn):
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"Circuito {self.name} abierto")
+        if not self.limiter.acquire(timeout=getattr(settings, 'YAHOO_RATE_ACQUIRE_TIMEOUT', 2)):
+            self.breaker.release_trial()
+            raise RateLimitedError(f"Límite de peticiones a {self.name} alcanzado")
+
+        try:
+            result = fn()
+        except Exception as e:
+            if is_throttle_error(e):
+                self.limiter.on_throttled()
+            if is_upstream_failure(e):
+                self.breaker.record_failure()
+            else:
+                self.breaker.release_trial()
+            raise
+
+        self.breaker.record_success()
+        self.limiter.on_success()
+        return result
+
+    def stats(self):
+        return {
+            'circuit': self.breaker.stats(),
+            'rate_limiter': self.limiter.stats(),
+        }
+
+
+def build_yahoo_guard():
+    """Crea el guard de Yahoo Finance a partir de los settings"""
+    return UpstreamGuard(
+        'yahoo',
+        CircuitBreaker(
+            'yahoo',
+            failure_threshold=getattr(settings, 'YAHOO_CIRCUIT_FAILURE_THRESHOLD', 5),
+            recovery_timeout=getattr(settings, 'YAHOO_CIRCUIT_RECOVERY_TIMEOUT', 30),
+        ),
+        AdaptiveTokenBucket(
+            rate=getattr(settings, 'YAHOO_RATE_LIMIT', 5),
+            capacity=getattr(settings, 'YAHOO_RATE_BURST', 10),
+            min_rate=getattr(settings, 'YAHOO_RATE_MIN', 0.5),
+        ),
+    )
+
+
+yahoo_guard = build_yahoo_guard()
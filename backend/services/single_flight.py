@@ -0,0 +1,123 @@
+import json
+import time
+import uuid
+import threading
+import logging
+
+from django.conf import settings
+
+from services.cache_service import CacheService
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """Llamada en curso compartida por el líder y sus seguidores"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Agrupa llamadas concurrentes idénticas en una sola ejecución (single-flight).
+
+    Dentro del proceso, los hilos que piden la misma clave mientras hay una llamada
+    en curso esperan su resultado en lugar de repetirla. Con shared=True y Redis
+    disponible, la coordinación se extiende a otros workers mediante un lock en
+    Redis: quien no obtiene el lock espera a que el líder publique el resultado.
+    """
+
+    def __init__(self, namespace='singleflight'):
+        self.cache = CacheService(namespace)
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'shared': 0, 'remote_shared': 0}
+
+    @staticmethod
+    def make_key(operation, symbol, params=None):
+        """Clave (operación, símbolo, parámetros) estable para cualquier orden de parámetros"""
+        key = f"{operation}:{symbol.upper()}"
+        if params:
+            key += ':' + json.dumps(params, sort_keys=True, separators=(',', ':'))
+        return key
+
+    def do(self, key, fn, shared=False):
+        """Ejecuta fn() una sola vez por clave entre los llamadores concurrentes"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self._stats['calls'] += 1
+            else:
+                call.waiters += 1
+                self._stats['shared'] += 1
+
+        if not leader:
+            if not call.event.wait(getattr(settings, 'SINGLE_FLIGHT_WAIT_TIMEOUT', 30)):
+                raise TimeoutError(f"Tiempo de espera agotado para {key}")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            if shared and self.cache.backend == 'redis':
+                call.result = self._do_shared(key, fn)
+            else:
+                call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    def _do_shared(self, key, fn):
+        """Coordina la llamada entre workers con un lock en Redis"""
+        lock_key = f"lock:{key}"
+        result_key = f"result:{key}"
+        token = uuid.uuid4().hex
+        lock_timeout = getattr(settings, 'SINGLE_FLIGHT_LOCK_TIMEOUT', 30)
+
+        if self.cache.add(lock_key, token, lock_timeout):
+            try:
+                result = fn()
+                self.cache.set(
+                    result_key, {'result': result},
+                    timeout=getattr(settings, 'SINGLE_FLIGHT_RESULT_TTL', 5)
+                )
+                return result
+            finally:
+                # Si el lock expiró y lo tomó otro worker, no se borra el suyo
+                self.cache.delete_if(lock_key, token)
+
+        # Otro worker está haciendo la misma llamada: esperar su resultado
+        deadline = time.monotonic() + getattr(settings, 'SINGLE_FLIGHT_WAIT_TIMEOUT', 30)
+        while time.monotonic() < deadline:
+            published = self.cache.get(result_key)
+            if published is not None:
+                with self._lock:
+                    self._stats['remote_shared'] += 1
+                return published['result']
+            if self.cache.get(lock_key) is None:
+                # El líder terminó sin publicar (error o resultado expirado)
+                break
+            time.sleep(0.05)
+        return fn()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._calls)
+        return stats
+
+
+# Instancia compartida para las llamadas a Yahoo Finance
+upstream_flight = SingleFlight('upstream')
@@ -0,0 +1,220 @@
+import re
+import time
+import bisect
+import math
+import heapq
+import threading
+import logging
+import unicodedata
+from collections import Counter, defaultdict
+from itertools import chain
+
+from django.conf import settings
+
+from services.cache_service import CacheService
+
+logger = logging.getLogger(__name__)
+
+# Versión del directorio: `load_symbols` la cambia y cada proceso reconstruye su índice
+directory_cache = CacheService('symbols')
+
+# Palabras que no aportan al buscar por nombre de empresa
+NAME_STOPWORDS = frozenset({
+    'inc', 'corp', 'corporation', 'co', 'company', 'ltd', 'limited', 'plc', 'the', 'class',
+    'common', 'stock', 'shares', 'ordinary', 'holdings', 'group', 'sa', 'nv', 'ag', 'se', 'of',
+})
+
+# Tipos de coincidencia, en orden de relevancia
+MATCH_EXACT = 0
+MATCH_SYMBOL_PREFIX = 1
+MATCH_NAME_PREFIX = 2
+MATCH_FUZZY = 3
+
+
+def normalize(text):
+    """Minúsculas, sin acentos y solo letras/números separados por espacios"""
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(re.split(r'[^a-z0-9]+', text.lower())).strip()
+
+
+def trigrams(text):
+    """Trigramas de cada palabra con relleno (como pg_trgm)"""
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class SymbolIndex:
+    """
+    Índice en memoria del directorio de símbolos para el typeahead.
+
+    - Prefijos: arreglos ordenados de claves (símbolo, palabras del nombre, nombre
+      completo) con búsqueda binaria; equivale a recorrer un trie pero con una
+      fracción de la memoria.
+    - Aproximado: índice invertido de trigramas para errores de tipeo ("microsft").
+    Las consultas no tocan la base de datos ni Yahoo.
+    """
+
+    def __init__(self, entries, popular=()):
+        self.entries = entries
+        popular_rank = {symbol: i for i, symbol in enumerate(popular)}
+        # Posición en el ranking estático: populares primero, luego acciones, luego símbolos cortos
+        order = sorted(
+            range(len(entries)),
+            key=lambda i: (
+                popular_rank.get(entries[i]['symbol'], len(popular_rank)),
+                entries[i]['assetClass'] != 'stock',
+                len(entries[i]['symbol']),
+                entries[i]['symbol'],
+            )
+        )
+        self._rank = [0] * len(entries)
+        for position, entry_id in enumerate(order):
+            self._rank[entry_id] = position
+        self._by_symbol = {}
+        symbol_keys = []
+        name_keys = []
+        self._postings = defaultdict(list)
+        self._gram_counts = []
+
+        for entry_id, entry in enumerate(entries):
+            symbol = entry['symbol'].lower()
+            self._by_symbol[symbol] = entry_id
+            compact = re.sub(r'[^a-z0-9]', '', symbol)
+            symbol_keys.append((symbol, entry_id))
+            if compact != symbol:
+                self._by_symbol.setdefault(compact, entry_id)
+                symbol_keys.append((compact, entry_id))
+
+            name = normalize(entry['name'])
+            words = [word for word in name.split() if word not in NAME_STOPWORDS]
+            for word in set(words):
+                name_keys.append((word, entry_id))
+            if name:
+                name_keys.append((name, entry_id))
+
+            grams = trigrams(' '.join([compact] + words))
+            self._gram_counts.append(len(grams))
+            for gram in grams:
+                self._postings[gram].append(entry_id)
+
+        symbol_keys.sort()
+        name_keys.sort()
+        self._symbol_keys = [key for key, _ in symbol_keys]
+        self._symbol_ids = [entry_id for _, entry_id in symbol_keys]
+        self._name_keys = [key for key, _ in name_keys]
+        self._name_ids = [entry_id for _, entry_id in name_keys]
+
+    def __len__(self):
+        return len(self.entries)
+
+    @classmethod
+    def from_directory(cls):
+        """Construye el índice desde el modelo Symbol (o solo los populares si está vacío)"""
+        from apps.stocks.models import Symbol
+        from services.yahoo_finance_service import YahooFinanceService
+
+        popular = YahooFinanceService.POPULAR_STOCKS + YahooFinanceService.POPULAR_CRYPTOS
+        entries = [
+            {'symbol': symbol, 'name': name, 'exchange': exchange, 'assetClass': asset_class}
+            for symbol, name, exchange, asset_class in Symbol.objects.values_list(
+                'symbol', 'name', 'exchange', 'asset_class'
+            )
+        ]
+        if not entries:
+            entries = [
+                {'symbol': symbol, 'name': symbol, 'exchange': '',
+                 'assetClass': YahooFinanceService.get_asset_class(symbol)}
+                for symbol in popular
+            ]
+        return cls(entries, popular=popular)
+
+    def _prefix_ids(self, keys, ids, prefix, limit):
+        """Los `limit` ids mejor rankeados cuyas claves empiezan con prefix"""
+        start = bisect.bisect_left(keys, prefix)
+        end = bisect.bisect_left(keys, prefix + '\x7f', lo=start)
+        return heapq.nsmallest(limit, set(ids[start:end]), key=self._rank.__getitem__)
+
+    def _fuzzy(self, query, limit):
+        """Coincidencias por trigramas: fracción de los trigramas de la consulta presentes"""
+        query_grams = trigrams(query)
+        if len(query_grams) < 3:
+            return []
+        hits = Counter(chain.from_iterable(self._postings.get(gram, ()) for gram in query_grams))
+
+        min_hits = math.ceil(getattr(settings, 'SYMBOL_FUZZY_MIN_SIMILARITY', 0.5) * len(query_grams))
+        scored = []
+        # most_common ordena en C; se corta al bajar del umbral o al completar `limit`
+        # (los empates con el último se desempatan por Jaccard)
+        for entry_id, count in hits.most_common():
+            if count < min_hits or (len(scored) >= limit and count < scored[-1][0]):
+                break
+            jaccard = count / (len(query_grams) + self._gram_counts[entry_id] - count)
+            scored.append((count, jaccard, entry_id))
+        scored.sort(key=lambda item: (-item[0], -item[1]))
+        return [(entry_id, count / len(query_grams)) for count, _, entry_id in scored[:limit]]
+
+    def search(self, query, limit=10, fuzzy=True):
+        """
+        Retorna hasta `limit` entradas ordenadas por relevancia: símbolo exacto,
+        prefijo de símbolo, prefijo de nombre y por último coincidencia aproximada
+        """
+        query = normalize(query)
+        if not query:
+            return []
+        best = {}
+
+        def add(entry_id, match):
+            if entry_id not in best or match < best[entry_id]:
+                best[entry_id] = match
+
+        compact = query.replace(' ', '')
+        exact = self._by_symbol.get(compact)
+        if exact is not None:
+            add(exact, MATCH_EXACT)
+        for entry_id in self._prefix_ids(self._symbol_keys, self._symbol_ids, compact, limit):
+            add(entry_id, MATCH_SYMBOL_PREFIX)
+        for entry_id in self._prefix_ids(self._name_keys, self._name_ids, query, limit):
+            add(entry_id, MATCH_NAME_PREFIX)
+        if fuzzy and len(best) < limit:
+            for entry_id, _ in self._fuzzy(query, limit):
+                add(entry_id, MATCH_FUZZY)
+
+        ranked = sorted(best, key=lambda entry_id: (best[entry_id], self._rank[entry_id]))
+        return [self.entries[entry_id] for entry_id in ranked[:limit]]
+
+_index = None
+_index_version = None
+_index_checked_at = 0.0
+_index_lock = threading.Lock()
+
+
+def get_symbol_index():
+    """
+    Índice del proceso. Se construye en la primera consulta y se reconstruye cuando
+    `load_symbols` publica una versión nueva (se revisa cada SYMBOL_INDEX_CHECK_INTERVAL s)
+    """
+    global _index, _index_version, _index_checked_at
+
+    now = time.monotonic()
+    if _index is not None and now - _index_checked_at < getattr(settings, 'SYMBOL_INDEX_CHECK_INTERVAL', 60):
+        return _index
+
+    with _index_lock:
+        if _index is not None and now - _index_checked_at < getattr(settings, 'SYMBOL_INDEX_CHECK_INTERVAL', 60):
+            return _index
+        version = directory_cache.get('version')
+        if _index is None or version != _index_version:
+            started = time.monotonic()
+            _index = SymbolIndex.from_directory()
+            _index_version = version
+            logger.info(f"Índice de símbolos construido: {len(_index)} símbolos en {time.monotonic() - started:.2f}s")
+        _index_checked_at = now
+    return _index
+
+
+def publish_directory_version():
+    """Marca el directorio como modificado para que los procesos reconstruyan su índice"""
+    directory_cache.set('version', time.time())
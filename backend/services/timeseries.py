@@ -0,0 +1,115 @@
+"""
+Utilidades para series de tiempo (histórico OHLCV y valor de portafolio).
+
+Las funciones trabajan sobre listas de dicts ordenadas cronológicamente con
+la forma que devuelven las vistas: {'date', 'open', 'high', 'low', 'close', 'volume'}.
+"""
+from datetime import date
+
+import numpy as np
+
+
+def aggregate_buckets(records, starts):
+    """
+    Agrega registros OHLCV en cubetas contiguas que empiezan en los índices `starts`.
+
+    Cada cubeta conserva la fecha y el open del primer registro, el close del último,
+    el máximo de high, el mínimo de low y la suma de volume.
+    """
+    if not records:
+        return []
+    starts = np.asarray(starts, dtype='int64')
+    ends = np.append(starts[1:], len(records)) - 1
+    fields = [key for key in records[0] if key != 'date']
+
+    columns = {}
+    for field in fields:
+        values = np.fromiter((record[field] for record in records), dtype='float64', count=len(records))
+        if field == 'high':
+            columns[field] = np.maximum.reduceat(values, starts).round(2).tolist()
+        elif field == 'low':
+            columns[field] = np.minimum.reduceat(values, starts).round(2).tolist()
+        elif field == 'volume':
+            columns[field] = np.add.reduceat(values, starts).astype('int64').tolist()
+        elif field == 'open':
+            columns[field] = values[starts].tolist()
+        else:
+            # close y cualquier otro valor puntual: el último de la cubeta
+            columns[field] = values[ends].tolist()
+
+    keys = ['date'] + fields
+    dates = [records[i]['date'] for i in starts]
+    return [dict(zip(keys, row)) for row in zip(dates, *(columns[field] for field in fields))]
+
+
+def ohlc_downsample(records, max_points):
+    """Reduce la serie a lo sumo a max_points cubetas OHLC de tamaño similar"""
+    if max_points is None or len(records) <= max_points:
+        return records
+    starts = np.unique(np.linspace(0, len(records), max_points, endpoint=False).astype('int64'))
+    return aggregate_buckets(records, starts)
+
+
+def lttb_indices(values, threshold):
+    """
+    Índices seleccionados por Largest-Triangle-Three-Buckets.
+
+    Conserva el primer y último punto y, en cada cubeta intermedia, el punto que forma
+    el triángulo de mayor área con el punto elegido antes y el promedio de la cubeta siguiente.
+    """
+    n = len(values)
+    if threshold is None or threshold >= n or threshold < 3:
+        return list(range(n))
+
+    y = np.asarray(values, dtype='float64')
+    bucket_size = (n - 2) / (threshold - 2)
+    selected = [0]
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+
+        avg_x = (end + next_end - 1) / 2
+        avg_y = y[end:next_end].mean()
+
+        xs = np.arange(start, end)
+        areas = np.abs((a - avg_x) * (y[start:end] - y[a]) - (a - xs) * (avg_y - y[a]))
+        a = start + int(areas.argmax())
+        selected.append(a)
+    selected.append(n - 1)
+    return selected
+
+
+def lttb_downsample(records, max_points, value_key='close'):
+    """Reduce la serie a max_points registros originales preservando su forma visual"""
+    if max_points is None or len(records) <= max_points:
+        return records
+    values = [record[value_key] for record in records]
+    return [records[i] for i in lttb_indices(values, max_points)]
+
+
+DOWNSAMPLE_METHODS = {
+    'ohlc': ohlc_downsample,
+    'lttb': lttb_downsample,
+}
+
+
+def resample(records, interval):
+    """Agrupa barras diarias en semanas ('1wk') o meses ('1mo')"""
+    if not records or interval not in ('1wk', '1mo'):
+        return records
+
+    def key(record):
+        if interval == '1mo':
+            return record['date'][:7]
+        return date.fromisoformat(record['date'][:10]).isocalendar()[:2]
+
+    starts = []
+    previous = None
+    for i, record in enumerate(records):
+        current = key(record)
+        if current != previous:
+            starts.append(i)
+            previous = current
+    return aggregate_buckets(records, starts)
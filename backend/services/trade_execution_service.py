@@ -0,0 +1,422 @@
+import time
+import uuid
+import random
+import logging
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+from django.utils import timezone
+
+from services.yahoo_finance_service import YahooFinanceService, quote_age
+
+logger = logging.getLogger(__name__)
+
+CENT = Decimal('0.01')
+
+
+class TradeError(Exception):
+    """La orden no se puede ejecutar (el mensaje se muestra al usuario)"""
+
+
+class InsufficientFundsError(TradeError):
+    """Balance disponible menor al total de la compra"""
+
+
+class InsufficientSharesError(TradeError):
+    """Se intenta vender más acciones de las que hay en la posición"""
+
+
+class QuoteUnavailableError(TradeError):
+    """No hay cotización para el símbolo"""
+
+
+class TradeExecutionService:
+    """
+    Ejecución de órdenes de mercado del lado del servidor.
+
+    El precio sale de la caché de cotizaciones (se refresca si tiene más de
+    TRADE_QUOTE_MAX_AGE segundos), nunca del cliente. Dentro de una sola
+    transacción de base de datos se bloquean el balance y la posición con
+    select_for_update (siempre en ese orden, así dos órdenes del mismo usuario no
+    se bloquean mutuamente), se validan fondos o acciones, se escribe la
+    StockTransaction (la señal actualiza la posición) y se ajusta el balance.
+
+    Las órdenes límite y stop (modelo Order) siguen el mismo orden de bloqueo:
+    `place_order` aparta el balance de las compras, `fill_order` las ejecuta
+    cuando OrderMatcher las dispara y `cancel_order` devuelve lo apartado.
+    """
+
+    @staticmethod
+    def quote_age(quote):
+        """Segundos desde lastUpdate de la cotización (infinito si no se puede saber)"""
+        return quote_age(quote)
+
+    @staticmethod
+    def get_trade_quotes(symbols):
+        """
+        Cotizaciones recientes de los símbolos con una sola consulta a la caché; las
+        que tienen más de TRADE_QUOTE_MAX_AGE segundos se refrescan juntas en un lote.
+        Un símbolo sin cotización reciente no aparece en el resultado: con Yahoo caído
+        el refresco devuelve la última cotización conocida, que no sirve como precio
+        """
+        symbols = list(dict.fromkeys(symbols))
+        quotes = YahooFinanceService.get_quotes(symbols)
+        max_age = getattr(settings, 'TRADE_QUOTE_MAX_AGE', 60)
+        stale = [
+            symbol for symbol in symbols
+            if quotes.get(symbol) is not None and TradeExecutionService.quote_age(quotes[symbol]) > max_age
+        ]
+        if stale:
+            quotes.update(YahooFinanceService.refresh_quotes(stale))
+        return {
+            symbol: quote for symbol, quote in quotes.items()
+            if quote and quote.get('price') and TradeExecutionService.quote_age(quote) <= max_age
+        }
+
+    @staticmethod
+    def get_trade_quote(symbol):
+        """
+        Cotización reciente del símbolo (la cotización en caché se refresca si es vieja).
+        Lanza QuoteUnavailableError si no hay una de menos de TRADE_QUOTE_MAX_AGE segundos
+        """
+        quote = TradeExecutionService.get_trade_quotes([symbol]).get(symbol)
+        if quote is None:
+            raise QuoteUnavailableError(f"No hay cotización reciente disponible para {symbol}")
+        return quote
+
+    @staticmethod
+    def execute(user, symbol, transaction_type, shares):
+        """Ejecuta una compra o venta a precio de mercado. Retorna la StockTransaction creada"""
+        symbol = symbol.upper()
+        quote = TradeExecutionService.get_trade_quote(symbol)
+        price = Decimal(str(quote['price'])).quantize(CENT)
+        total = (shares * price).quantize(CENT)
+        return TradeExecutionService._with_retries(
+            lambda: TradeExecutionService._execute_locked(
+                user, symbol, quote.get('name') or symbol, transaction_type, shares, price, total
+            ),
+            f"{transaction_type} {symbol}",
+        )
+
+    @staticmethod
+    def execute_batch(user, orders):
+        """
+        Ejecuta una lista de órdenes de mercado ({symbol, transaction_type, shares}) en
+        una sola transacción: una consulta de cotizaciones para todos los símbolos,
+        un bloqueo del balance y de las posiciones, y un bulk_create.
+
+        Las órdenes se evalúan en el orden recibido contra el balance y las posiciones
+        que van dejando las anteriores (igual que enviarlas una por una). Retorna, por
+        orden, la StockTransaction creada o el TradeError que la rechazó
+        """
+        orders = [dict(order, symbol=order['symbol'].upper()) for order in orders]
+        quotes = TradeExecutionService.get_trade_quotes(order['symbol'] for order in orders)
+        return TradeExecutionService._with_retries(
+            lambda: TradeExecutionService._execute_batch_locked(user, orders, quotes),
+            f"lote de {len(orders)} órdenes",
+        )
+
+    @staticmethod
+    def _with_retries(execute, description):
+        # Ante un deadlock o un lock que no se obtuvo a tiempo se reintenta la
+        # transacción completa unas pocas veces
+        retries = getattr(settings, 'TRADE_LOCK_RETRIES', 5)
+        for attempt in range(retries + 1):
+            try:
+                return execute()
+            except OperationalError as e:
+                # Dentro de una transacción externa no se puede reintentar
+                if attempt == retries or connection.in_atomic_block:
+                    raise
+                logger.info(f"Reintentando {description} por bloqueo: {str(e)}")
+                time.sleep(random.uniform(0, 0.01 * 2 ** attempt))
+
+    @staticmethod
+    def _lock_balance(user):
+        """Balance del usuario (o id de usuario) bloqueado hasta el final de la transacción en curso"""
+        from apps.users.models import UserBalance
+
+        return UserBalance.lock(getattr(user, 'pk', user))
+
+    @staticmethod
+    def _execute_locked(user, symbol, name, transaction_type, shares, price, total):
+        from apps.portfolio.models import Position, StockTransaction
+
+        with transaction.atomic():
+            balance = TradeExecutionService._lock_balance(user)
+            position = Position.objects.select_for_update().filter(user=user, symbol=symbol).first()
+            held = position.shares if position is not None else Decimal('0')
+            if transaction_type == 'sell':
+                # Las acciones de las órdenes de venta abiertas (stop-loss, etc.) no se pueden usar
+                held -= TradeExecutionService._committed_shares(user, [symbol]).get(symbol, Decimal('0'))
+            TradeExecutionService._check(balance.available_balance, held, symbol, transaction_type, shares, total)
+
+            if transaction_type == 'buy':
+                balance.available_balance -= total
+            else:
+                balance.available_balance += total
+            stock_transaction = StockTransaction.objects.create(
+                user=user,
+                symbol=symbol,
+                name=name,
+                transaction_type=transaction_type,
+                shares=shares,
+                price_per_share=price,
+                total=total,
+                status='completed',
+            )
+            balance.save(update_fields=['available_balance', 'updated_at'])
+        return stock_transaction
+
+    @staticmethod
+    def _committed_shares(user, symbols):
+        """Acciones comprometidas en órdenes de venta abiertas, por símbolo (una consulta)"""
+        from django.db.models import Sum
+        from apps.portfolio.models import Order
+
+        return dict(
+            Order.objects.filter(user=user, symbol__in=symbols, transaction_type='sell', status='open')
+            .order_by().values('symbol').annotate(shares=Sum('shares')).values_list('symbol', 'shares')
+        )
+
+    @staticmethod
+    def _check(available, held, symbol, transaction_type, shares, total):
+        """Lanza TradeError si no alcanzan los fondos o las acciones"""
+        if transaction_type == 'buy':
+            if available < total:
+                raise InsufficientFundsError(
+                    f"Fondos insuficientes: se necesitan ${total} y hay ${available}"
+                )
+        elif held < shares:
+            raise InsufficientSharesError(
+                f"Acciones insuficientes de {symbol}: se quieren vender {shares} y hay {held}"
+            )
+
+    @staticmethod
+    def _execute_batch_locked(user, orders, quotes):
+        from apps.portfolio.models import Position, StockTransaction
+        from services.dashboard_cache_service import DashboardCacheService
+        from services.position_service import PositionService
+
+        results = []
+        with transaction.atomic():
+            balance = TradeExecutionService._lock_balance(user)
+            symbols = sorted({order['symbol'] for order in orders})
+            # Siempre en orden de símbolo, así dos lotes del mismo usuario no se bloquean mutuamente
+            positions = {
+                position.symbol: position
+                for position in Position.objects.select_for_update().filter(
+                    user=user, symbol__in=symbols
+                ).order_by('symbol')
+            }
+            existing = set(positions)
+            committed = {}
+            if any(order['transaction_type'] == 'sell' for order in orders):
+                committed = TradeExecutionService._committed_shares(user, symbols)
+            cost_method = None
+
+            rows = []
+            for order in orders:
+                symbol, transaction_type, shares = order['symbol'], order['transaction_type'], order['shares']
+                quote = quotes.get(symbol)
+                try:
+                    if quote is None:
+                        raise QuoteUnavailableError(f"No hay cotización reciente disponible para {symbol}")
+                    price = Decimal(str(quote['price'])).quantize(CENT)
+                    total = (shares * price).quantize(CENT)
+                    position = positions.get(symbol)
+                    held = position.shares if position is not None else Decimal('0')
+                    if transaction_type == 'sell':
+                        held -= committed.get(symbol, Decimal('0'))
+                    TradeExecutionService._check(
+                        balance.available_balance, held, symbol, transaction_type, shares, total
+                    )
+                except TradeError as e:
+                    results.append(e)
+                    continue
+
+                name = quote.get('name') or symbol
+                if position is None:
+                    cost_method = cost_method or PositionService.get_cost_method(user.id)
+                    position = positions[symbol] = Position(
+                        user=user, symbol=symbol, name=name, cost_method=cost_method,
+                        shares=Decimal('0'), cost_basis=Decimal('0'), realized_pnl=Decimal('0'),
+                    )
+                # bulk_create no dispara las señales: la posición, la ganancia realizada
+                # y el balance se actualizan acá
+                realized = PositionService.apply_fill(position, transaction_type, shares, total, position.cost_method)
+                position.name = name
+                if transaction_type == 'buy':
+                    balance.available_balance -= total
+                else:
+                    balance.available_balance += total
+                row = StockTransaction(
+                    user=user,
+                    symbol=symbol,
+                    name=name,
+                    transaction_type=transaction_type,
+                    shares=shares,
+                    price_per_share=price,
+                    total=total,
+                    status='completed',
+                    realized_pnl=realized,
+                )
+                rows.append(row)
+                results.append(row)
+
+            if rows:
+                # Todo el lote comparte created_at casi exacto: ids crecientes mantienen el
+                # orden de ejecución al reconstruir por (created_at, id)
+                for row, pk in zip(rows, sorted(uuid.uuid4() for _ in rows)):
+                    row.id = pk
+                StockTransaction.objects.bulk_create(rows)
+                touched = {row.symbol for row in rows}
+                now = timezone.now()
+                for symbol in touched & existing:
+                    # bulk_update no aplica auto_now
+                    positions[symbol].updated_at = now
+                Position.objects.bulk_create([positions[symbol] for symbol in touched - existing])
+                Position.objects.bulk_update(
+                    [positions[symbol] for symbol in touched & existing],
+                    ['name', 'shares', 'cost_basis', 'realized_pnl', 'lots', 'updated_at'],
+                )
+                balance.save(update_fields=['available_balance', 'updated_at'])
+                DashboardCacheService.invalidate(user.id)
+        return results
+
+    @staticmethod
+    def place_order(user, symbol, transaction_type, order_type, shares, price):
+        """
+        Crea una orden límite o stop abierta. Una compra aparta shares * price del
+        balance disponible; una venta necesita acciones que no estén ya comprometidas
+        en otras ventas abiertas. Retorna la Order creada
+        """
+        symbol = symbol.upper()
+        quote = TradeExecutionService.get_trade_quote(symbol)
+        return TradeExecutionService._with_retries(
+            lambda: TradeExecutionService._place_order_locked(
+                user, symbol, quote.get('name') or symbol, transaction_type, order_type, shares, price
+            ),
+            f"orden {order_type} {transaction_type} {symbol}",
+        )
+
+    @staticmethod
+    def _place_order_locked(user, symbol, name, transaction_type, order_type, shares, price):
+        from apps.portfolio.models import Order, Position
+
+        with transaction.atomic():
+            balance = TradeExecutionService._lock_balance(user)
+            reserved = Decimal('0')
+            if transaction_type == 'buy':
+                reserved = (shares * price).quantize(CENT)
+                TradeExecutionService._check(balance.available_balance, None, symbol, 'buy', shares, reserved)
+                balance.available_balance -= reserved
+                balance.save(update_fields=['available_balance', 'updated_at'])
+            else:
+                position = Position.objects.select_for_update().filter(user=user, symbol=symbol).first()
+                committed = TradeExecutionService._committed_shares(user, [symbol]).get(symbol, Decimal('0'))
+                held = (position.shares if position is not None else Decimal('0')) - committed
+                TradeExecutionService._check(None, held, symbol, 'sell', shares, None)
+
+            return Order.objects.create(
+                user=user,
+                symbol=symbol,
+                name=name,
+                order_type=order_type,
+                transaction_type=transaction_type,
+                shares=shares,
+                price=price,
+                reserved=reserved,
+            )
+
+    @staticmethod
+    def cancel_order(user, order_id):
+        """
+        Cancela una orden abierta del usuario y devuelve el balance apartado.
+        Lanza Order.DoesNotExist si no es del usuario y TradeError si ya no está abierta
+        """
+        from apps.portfolio.models import Order
+
+        def cancel():
+            with transaction.atomic():
+                balance = TradeExecutionService._lock_balance(user)
+                order = Order.objects.select_for_update().get(pk=order_id, user=user)
+                if order.status != 'open':
+                    raise TradeError(f"La orden ya no está abierta ({order.get_status_display()})")
+                TradeExecutionService._release(balance, order)
+                balance.save(update_fields=['available_balance', 'updated_at'])
+                order.status = 'cancelled'
+                order.save(update_fields=['status', 'reserved', 'updated_at'])
+            return order
+
+        return TradeExecutionService._with_retries(cancel, f"cancelación de la orden {order_id}")
+
+    @staticmethod
+    def fill_order(order_id, price):
+        """
+        Ejecuta una orden disparada al precio de la cotización que la disparó.
+        Si ya no hay fondos o acciones suficientes la orden queda rechazada con el
+        motivo; si ya no estaba abierta no hace nada. Retorna la Order
+        """
+        from apps.portfolio.models import Order
+
+        user_id = Order.objects.filter(pk=order_id).values_list('user_id', flat=True).get()
+        return TradeExecutionService._with_retries(
+            lambda: TradeExecutionService._fill_order_locked(user_id, order_id, price),
+            f"ejecución de la orden {order_id}",
+        )
+
+    @staticmethod
+    def _fill_order_locked(user_id, order_id, price):
+        from apps.portfolio.models import Order, Position, StockTransaction
+
+        with transaction.atomic():
+            # Mismo orden de bloqueo que las órdenes de mercado: balance, orden, posición
+            balance = TradeExecutionService._lock_balance(user_id)
+            order = Order.objects.select_for_update().get(pk=order_id)
+            if order.status != 'open':
+                return order
+
+            total = (order.shares * price).quantize(CENT)
+            position = Position.objects.select_for_update().filter(user_id=user_id, symbol=order.symbol).first()
+            held = position.shares if position is not None else Decimal('0')
+            try:
+                TradeExecutionService._check(
+                    balance.available_balance + order.reserved, held,
+                    order.symbol, order.transaction_type, order.shares, total
+                )
+            except TradeError as e:
+                TradeExecutionService._release(balance, order)
+                balance.save(update_fields=['available_balance', 'updated_at'])
+                order.status = 'rejected'
+                order.message = str(e)[:255]
+                order.save(update_fields=['status', 'reserved', 'message', 'updated_at'])
+                return order
+
+            TradeExecutionService._release(balance, order)
+            if order.transaction_type == 'buy':
+                balance.available_balance -= total
+            else:
+                balance.available_balance += total
+            order.transaction = StockTransaction.objects.create(
+                user_id=user_id,
+                symbol=order.symbol,
+                name=order.name,
+                transaction_type=order.transaction_type,
+                shares=order.shares,
+                price_per_share=price,
+                total=total,
+                status='completed',
+            )
+            balance.save(update_fields=['available_balance', 'updated_at'])
+            order.status = 'filled'
+            order.filled_at = timezone.now()
+            order.save(update_fields=['status', 'reserved', 'transaction', 'filled_at', 'updated_at'])
+        return order
+
+    @staticmethod
+    def _release(balance, order):
+        """Devuelve al balance lo apartado por la orden (sin guardar)"""
+        balance.available_balance += order.reserved
+        order.reserved = Decimal('0')
@@ -0,0 +1,165 @@
+import atexit
+import asyncio
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import yfinance as yf
+from curl_cffi import requests as curl_requests
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamPool:
+    """
+    Executor acotado y sesión HTTP keep-alive compartidos por todo el proceso.
+
+    Evita crear un ThreadPoolExecutor por petición y abrir conexiones nuevas en cada
+    yf.Ticker: la sesión de curl_cffi mantiene un handle (y sus conexiones TLS) por
+    hilo, así que el tamaño del pool de conexiones es el número de hilos del executor.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._executor = None
+        self._session = None
+        self._slots = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stats = {'submitted': 0, 'started': 0, 'completed': 0, 'failed': 0, 'rejected': 0}
+        self._closed = False
+
+    @property
+    def max_workers(self):
+        return getattr(settings, 'YAHOO_POOL_MAX_WORKERS', 8)
+
+    @property
+    def max_queue(self):
+        return getattr(settings, 'YAHOO_POOL_MAX_QUEUE', 256)
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self._closed:
+                        raise RuntimeError(f"El pool {self.name} ya fue cerrado")
+                    self._slots = threading.BoundedSemaphore(self.max_workers + self.max_queue)
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix=f"{self.name}-pool",
+                    )
+        return self._executor
+
+    @property
+    def session(self):
+        """Sesión curl_cffi compartida (la que usa yfinance para todas sus peticiones)"""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = curl_requests.Session(impersonate='chrome')
+        return self._session
+
+    def ticker(self, symbol):
+        """yf.Ticker que reutiliza la sesión compartida"""
+        return yf.Ticker(symbol, session=self.session)
+
+    def in_worker(self):
+        """True si el hilo actual es un worker de este pool"""
+        return getattr(self._local, 'worker', False)
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Encola fn en el executor compartido.
+
+        Si la cola está llena espera hasta YAHOO_POOL_SUBMIT_TIMEOUT segundos y luego
+        lanza RuntimeError, para que la sobrecarga no crezca sin límite.
+        """
+        executor = self.executor
+        if not self._slots.acquire(timeout=getattr(settings, 'YAHOO_POOL_SUBMIT_TIMEOUT', 5)):
+            self._count('rejected')
+            raise RuntimeError(f"Cola del pool {self.name} llena")
+        return self._submit_acquired(executor, fn, args, kwargs)
+
+    async def run_async(self, fn, *args, **kwargs):
+        """
+        Equivalente asyncio de submit para las vistas ASGI: espera el cupo y el
+        resultado sin bloquear el event loop
+        """
+        executor = self.executor
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + getattr(settings, 'YAHOO_POOL_SUBMIT_TIMEOUT', 5)
+        while not self._slots.acquire(blocking=False):
+            if loop.time() >= deadline:
+                self._count('rejected')
+                raise RuntimeError(f"Cola del pool {self.name} llena")
+            await asyncio.sleep(0.01)
+        return await asyncio.wrap_future(self._submit_acquired(executor, fn, args, kwargs))
+
+    def _submit_acquired(self, executor, fn, args, kwargs):
+        """Encola fn cuando ya se tomó un cupo de la cola"""
+        self._count('submitted')
+
+        def run():
+            self._local.worker = True
+            self._count('started')
+            try:
+                result = fn(*args, **kwargs)
+                self._count('completed')
+                return result
+            except Exception:
+                self._count('failed')
+                raise
+            finally:
+                self._slots.release()
+
+        try:
+            return executor.submit(run)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def run_all(self, calls):
+        """
+        Ejecuta en paralelo una lista de funciones sin argumentos y retorna sus resultados
+        en el mismo orden. Desde un worker del pool se ejecutan en línea para no bloquearlo
+        esperando tareas que necesitan otro worker.
+        """
+        if len(calls) <= 1 or self.in_worker():
+            return [call() for call in calls]
+        futures = [self.submit(call) for call in calls]
+        return [future.result() for future in futures]
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        """Métricas del pool: hilos, tareas activas y profundidad de la cola"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['max_workers'] = self.max_workers
+        stats['max_queue'] = self.max_queue
+        stats['active'] = stats['started'] - stats['completed'] - stats['failed']
+        stats['queue_depth'] = stats['submitted'] - stats['started']
+        return stats
+
+    def shutdown(self, wait=True):
+        """Cierra el executor y la sesión HTTP (se llama al terminar el proceso)"""
+        with self._lock:
+            self._closed = True
+            executor, self._executor = self._executor, None
+            session, self._session = self._session, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=not wait)
+        if session is not None:
+            try:
+                session.close()
+            except Exception as e:
+                logger.warning(f"Error cerrando la sesión HTTP de {self.name}: {str(e)}")
+
+
+# Pool compartido para las llamadas a Yahoo Finance
+yahoo_pool = UpstreamPool('yahoo')
+atexit.register(yahoo_pool.shutdown)
@@ -1,11 +1,69 @@
-import yfinance as yf
+import re
 import logging
-from datetime import datetime, timedelta
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import threading
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+
+from services.cache_service import CacheService
+from services.price_history_service import PriceHistoryService
+from services.timeseries import DOWNSAMPLE_METHODS, resample
+from services.single_flight import SingleFlight, upstream_flight
+from services.upstream_pool import yahoo_pool
+from services.resilience import CircuitOpenError, RateLimitedError, yahoo_guard
 
 logger = logging.getLogger(__name__)
 
+# Caché compartida de cotizaciones (Redis o LRU en memoria)
+quote_cache = CacheService('quotes', executor=yahoo_pool)
+
+# Endpoint de Yahoo que acepta varios símbolos separados por coma
+QUOTE_BATCH_URL = 'https://query1.finance.yahoo.com/v7/finance/quote'
+
+# Campos del histórico OHLCV y su columna en los DataFrames de yfinance
+HISTORY_FIELDS = ('close', 'open', 'high', 'low', 'volume')
+HISTORY_COLUMNS = {
+    'open': 'Open',
+    'high': 'High',
+    'low': 'Low',
+    'close': 'Close',
+    'volume': 'Volume',
+}
+
+# Periodos aceptados por /api/stocks/history/ y su duración en días (None = todo)
+HISTORY_PERIODS = {
+    '1d': 1, '5d': 7, '1mo': 31, '3mo': 92, '6mo': 183, 'ytd': None,
+    '1y': 365, '2y': 730, '5y': 1826, '10y': 3653, 'max': None,
+}
+HISTORY_INTERVALS = (
+    '1m', '2m', '5m', '15m', '30m', '60m', '90m', '1h', '1d', '1wk', '1mo'
+)
+# Consultas con forma de ticker (AAPL, BRK.B, BTC-USD, ^GSPC): se prueban tal cual en Yahoo
+TICKER_PATTERN = re.compile(r'^\^?[A-Z0-9]{1,5}([.=-][A-Z0-9]{1,4})?$')
+
+# Días hacia atrás que Yahoo entrega por intervalo intradía; fuera de ese rango
+# responde vacío en lugar de un error
+INTRADAY_MAX_DAYS = {
+    '1m': 7, '2m': 60, '5m': 60, '15m': 60, '30m': 60, '90m': 60, '60m': 730, '1h': 730,
+}
+
+
+def quote_age(quote):
+    """Segundos desde lastUpdate de la cotización (infinito si no se puede saber)"""
+    try:
+        return (datetime.now() - datetime.fromisoformat(quote['lastUpdate'])).total_seconds()
+    except (KeyError, TypeError, ValueError):
+        return float('inf')
+
+
+def safe_number(val, decimals=2, default='N/A'):
+    """Convierte a número redondeado o retorna default"""
+    try:
+        if val is None:
+            return default
+        return round(float(val), decimals)
+    except (TypeError, ValueError):
+        return default
+
 
 class YahooFinanceService:
     """Servicio para obtener datos de Yahoo Finance"""
@@ -24,63 +82,234 @@ class YahooFinanceService:
         'BTC-USD', 'ETH-USD', 'BNB-USD', 'XRP-USD', 'ADA-USD'
     ]
     
+    @staticmethod
+    def get_asset_class(symbol):
+        """Clasifica un símbolo como 'crypto' o 'stock' para elegir su TTL de caché"""
+        symbol = symbol.upper()
+        if symbol in YahooFinanceService.POPULAR_CRYPTOS or symbol.endswith('-USD'):
+            return 'crypto'
+        return 'stock'
+    
+    @staticmethod
+    def get_quote_ttl(symbol):
+        """TTL en segundos de la cotización según la clase de activo"""
+        ttls = getattr(settings, 'QUOTE_CACHE_TTLS', {})
+        return ttls.get(YahooFinanceService.get_asset_class(symbol), 60)
+    
     @staticmethod
     def get_stock_data(symbol):
-        """Obtiene datos de una acción específica"""
+        """Obtiene datos de una acción específica (con caché y stale-while-revalidate)"""
+        symbol = symbol.upper()
+        return YahooFinanceService.get_quotes([symbol]).get(symbol)
+    
+    @staticmethod
+    def get_quotes(symbols):
+        """
+        Obtiene cotizaciones de varios símbolos usando la caché compartida.
+        
+        Los símbolos que no están en caché se piden a Yahoo en lotes (una petición
+        por cada QUOTE_BATCH_SIZE símbolos). Retorna {símbolo: cotización}.
+        """
+        symbols = list(dict.fromkeys(symbol.upper() for symbol in symbols))
+        keys = {f"quote:{symbol}": symbol for symbol in symbols}
+        
+        loaded = {}
+        
+        def loader(missing_keys):
+            quotes = YahooFinanceService._fetch_quotes([keys[key] for key in missing_keys])
+            loaded.update({f"quote:{symbol}": quote for symbol, quote in quotes.items()})
+            return {key: loaded[key] for key in missing_keys if key in loaded}
+        
+        cached = quote_cache.get_many_or_set(
+            list(keys),
+            loader,
+            ttl=YahooFinanceService._quote_entry_ttl(loaded),
+            stale_ttl=getattr(settings, 'QUOTE_CACHE_STALE_TTL', 300),
+        )
+        return {keys[key]: quote for key, quote in cached.items()}
+    
+    @staticmethod
+    def refresh_quotes(symbols):
+        """Pide cotizaciones frescas a Yahoo (sin leer la caché) y las guarda en la caché"""
+        symbols = list(dict.fromkeys(symbol.upper() for symbol in symbols))
+        quotes = YahooFinanceService._fetch_quotes(symbols)
+        entries = {f"quote:{symbol}": quote for symbol, quote in quotes.items()}
+        quote_cache.set_many_entries(
+            entries,
+            ttl=YahooFinanceService._quote_entry_ttl(entries),
+            stale_ttl=getattr(settings, 'QUOTE_CACHE_STALE_TTL', 300),
+        )
+        return quotes
+    
+    @staticmethod
+    def _quote_entry_ttl(entries):
+        """
+        TTL de cada entrada quote:SÍMBOLO contado desde el lastUpdate de la cotización.
+        Una cotización recién pedida dura get_quote_ttl; la última conocida que se sirve
+        con el circuito abierto se guarda ya vencida, así la próxima lectura la revalida
+        """
+        def ttl(key):
+            symbol = key.split(':', 1)[1]
+            return max(0, YahooFinanceService.get_quote_ttl(symbol) - quote_age(entries.get(key)))
+        return ttl
+    
+    @staticmethod
+    def get_cache_stats():
+        """Retorna los contadores de la caché de cotizaciones, del single-flight y del pool"""
+        stats = quote_cache.stats()
+        stats['single_flight'] = upstream_flight.stats()
+        stats['pool'] = yahoo_pool.stats()
+        return stats
+    
+    @staticmethod
+    def _build_quote(symbol, price, previous_close, name, volume, market_cap, currency):
+        """Arma el diccionario de cotización que consumen las vistas"""
+        current_price = price or 0
+        if current_price == 0:
+            return None
+        
+        if previous_close is None:
+            previous_close = current_price
+        change = current_price - previous_close
+        change_percent = (change / previous_close * 100) if previous_close > 0 else 0
+        
+        return {
+            'symbol': symbol,
+            'name': name or symbol,
+            'price': round(current_price, 2),
+            'change': round(change, 2),
+            'changePercent': round(change_percent, 2),
+            'volume': volume or 0,
+            'marketCap': market_cap or 0,
+            'currency': currency or 'USD',
+            'lastUpdate': datetime.now().isoformat()
+        }
+    
+    @staticmethod
+    def _fetch_quotes(symbols):
+        """Obtiene cotizaciones de Yahoo en lotes de QUOTE_BATCH_SIZE símbolos (en paralelo si hay varios)"""
+        batch_size = getattr(settings, 'QUOTE_BATCH_SIZE', 50)
+        chunks = [symbols[start:start + batch_size] for start in range(0, len(symbols), batch_size)]
+        quotes = {}
+        for chunk_quotes in yahoo_pool.run_all([
+            lambda chunk=chunk: YahooFinanceService._fetch_quotes_chunk(chunk) for chunk in chunks
+        ]):
+            quotes.update(chunk_quotes)
+        return quotes
+    
+    @staticmethod
+    def _fetch_quotes_chunk(chunk):
+        """
+        Obtiene un lote de cotizaciones.
+        
+        Si la petición por lotes falla se hace una petición por símbolo; con el circuito
+        abierto o sin cupo en el rate limiter se sirve la última cotización conocida.
+        """
         try:
-            ticker = yf.Ticker(symbol)
+            # Peticiones concurrentes por el mismo lote comparten una sola llamada
+            quotes = upstream_flight.do(
+                SingleFlight.make_key('quotes', ','.join(sorted(chunk))),
+                lambda: YahooFinanceService._fetch_quotes_batch(chunk),
+                shared=True,
+            )
+        except (CircuitOpenError, RateLimitedError) as e:
+            logger.info(f"Sirviendo últimas cotizaciones conocidas: {str(e)}")
+            return YahooFinanceService.get_last_known_quotes(chunk)
+        except Exception as e:
+            logger.warning(f"Error en petición por lotes ({len(chunk)} símbolos), usando peticiones individuales: {str(e)}")
+            quotes = YahooFinanceService._fetch_quotes_individually(chunk)
+            missing = [symbol for symbol in chunk if symbol not in quotes]
+            if missing:
+                quotes.update(YahooFinanceService.get_last_known_quotes(missing))
+            return quotes
+        
+        YahooFinanceService._remember_quotes(quotes)
+        return quotes
+    
+    @staticmethod
+    def _remember_quotes(quotes):
+        """Guarda la última cotización conocida de cada símbolo (respaldo con el circuito abierto)"""
+        quote_cache.set_many(
+            {f"lkg:{symbol}": quote for symbol, quote in quotes.items()},
+            timeout=getattr(settings, 'QUOTE_LKG_TTL', 7 * 24 * 3600),
+        )
+    
+    @staticmethod
+    def get_last_known_quotes(symbols):
+        """Últimas cotizaciones obtenidas con éxito para los símbolos dados"""
+        known = quote_cache.get_many([f"lkg:{symbol}" for symbol in symbols])
+        return {key.split(':', 1)[1]: quote for key, quote in known.items()}
+    
+    @staticmethod
+    def get_upstream_status():
+        """Estado del circuit breaker y del rate limiter de Yahoo Finance"""
+        return yahoo_guard.stats()
+    
+    @staticmethod
+    def _fetch_quotes_batch(symbols):
+        """Obtiene cotizaciones de varios símbolos con una sola petición al endpoint de quotes"""
+        from yfinance.data import YfData
+        
+        data = yahoo_guard.call(lambda: YfData(session=yahoo_pool.session).get_raw_json(
+            QUOTE_BATCH_URL,
+            params={'symbols': ','.join(symbols), 'formatted': 'false'}
+        ))
+        results = (data.get('quoteResponse') or {}).get('result') or []
+        
+        quotes = {}
+        for item in results:
+            symbol = (item.get('symbol') or '').upper()
+            quote = YahooFinanceService._build_quote(
+                symbol,
+                price=item.get('regularMarketPrice'),
+                previous_close=item.get('regularMarketPreviousClose'),
+                name=item.get('longName') or item.get('shortName'),
+                volume=item.get('regularMarketVolume'),
+                market_cap=item.get('marketCap'),
+                currency=item.get('currency'),
+            )
+            if quote:
+                quotes[symbol] = quote
+        return quotes
+    
+    @staticmethod
+    def _fetch_quotes_individually(symbols):
+        """Obtiene cotizaciones con una petición ticker.info por símbolo usando el pool compartido"""
+        results = yahoo_pool.run_all([
+            lambda symbol=symbol: YahooFinanceService._fetch_stock_data(symbol) for symbol in symbols
+        ])
+        return {symbol: data for symbol, data in zip(symbols, results) if data}
+    
+    @staticmethod
+    def _fetch_stock_data(symbol):
+        """Obtiene datos de una acción directamente de Yahoo Finance"""
+        try:
+            ticker = yahoo_pool.ticker(symbol)
             
             # Obtener información actual
-            info = ticker.info
-            current_price = info.get('currentPrice', 0)
-            previous_close = info.get('previousClose', current_price)
-            
-            if current_price == 0:
-                return None
-            
-            change = current_price - previous_close
-            change_percent = (change / previous_close * 100) if previous_close > 0 else 0
-            
-            return {
-                'symbol': symbol,
-                'name': info.get('longName', symbol),
-                'price': round(current_price, 2),
-                'change': round(change, 2),
-                'changePercent': round(change_percent, 2),
-                'volume': info.get('volume', 0),
-                'marketCap': info.get('marketCap', 0),
-                'currency': info.get('currency', 'USD'),
-                'lastUpdate': datetime.now().isoformat()
-            }
+            info = yahoo_guard.call(lambda: ticker.info)
+            return YahooFinanceService._build_quote(
+                symbol,
+                price=info.get('currentPrice', 0),
+                previous_close=info.get('previousClose'),
+                name=info.get('longName'),
+                volume=info.get('volume'),
+                market_cap=info.get('marketCap'),
+                currency=info.get('currency'),
+            )
         except Exception as e:
             logger.error(f"Error obteniendo datos de {symbol}: {str(e)}")
             return None
     
     @staticmethod
     def get_multiple_stocks(symbols):
-        """Obtiene datos de múltiples acciones en paralelo"""
-        stocks = []
-        
-        # Usar ThreadPoolExecutor para hacer peticiones en paralelo
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            # Enviar todas las peticiones
-            future_to_symbol = {
-                executor.submit(YahooFinanceService.get_stock_data, symbol): symbol 
-                for symbol in symbols
-            }
-            
-            # Recopilar resultados conforme se completan
-            for future in as_completed(future_to_symbol):
-                try:
-                    data = future.result()
-                    if data:
-                        stocks.append(data)
-                except Exception as e:
-                    symbol = future_to_symbol[future]
-                    logger.error(f"Error procesando {symbol}: {str(e)}")
-                    continue
-        
-        return stocks
+        """Obtiene datos de múltiples acciones con peticiones por lotes, en el orden recibido"""
+        try:
+            quotes = YahooFinanceService.get_quotes(symbols)
+        except Exception as e:
+            logger.error(f"Error obteniendo cotizaciones: {str(e)}")
+            return []
+        return [quotes[symbol.upper()] for symbol in symbols if symbol.upper() in quotes]
     
     @staticmethod
     def get_popular_stocks():
@@ -106,182 +335,317 @@ class YahooFinanceService:
     
     @staticmethod
     def search_stock(query):
-        """Busca acciones por símbolo o nombre"""
-        try:
-            ticker = yf.Ticker(query.upper())
-            info = ticker.info
-            
-            if not info:
-                return None
-            
-            current_price = info.get('currentPrice', 0)
-            previous_close = info.get('previousClose', current_price)
-            
-            if current_price == 0:
-                return None
-            
-            change = current_price - previous_close
-            change_percent = (change / previous_close * 100) if previous_close > 0 else 0
-            
-            return {
-                'symbol': query.upper(),
-                'name': info.get('longName', query.upper()),
-                'price': round(current_price, 2),
-                'change': round(change, 2),
-                'changePercent': round(change_percent, 2),
-                'volume': info.get('volume', 0),
-                'marketCap': info.get('marketCap', 0),
-                'currency': info.get('currency', 'USD'),
-                'lastUpdate': datetime.now().isoformat()
-            }
-        except Exception as e:
-            logger.error(f"Error buscando {query}: {str(e)}")
-            return None
+        """
+        Busca acciones por símbolo o nombre.
+        
+        Resuelve la consulta con el directorio local (sin llamar a Yahoo) y solo pide
+        la cotización en vivo del resultado elegido. Del directorio solo se acepta de
+        entrada un símbolo exacto, o un prefijo del nombre si la consulta no tiene forma
+        de ticker; cualquier otra consulta se pide a Yahoo tal cual (T es AT&T, no TSLA)
+        y si Yahoo no la conoce se usa la mejor coincidencia por prefijo o aproximada.
+        """
+        from services.symbol_index import get_symbol_index, normalize
+        
+        query = query.strip()
+        index = get_symbol_index()
+        matches = index.search(query, limit=1, fuzzy=False)
+        hit = matches[0] if matches else None
+        if hit is not None:
+            compact = normalize(query).replace(' ', '')
+            exact_symbol = normalize(hit['symbol']).replace(' ', '') == compact
+            name_prefix = (
+                not TICKER_PATTERN.match(query.upper())
+                and normalize(hit['name']).startswith(normalize(query))
+            )
+            if not (exact_symbol or name_prefix):
+                hit = None
+        
+        # Comparte la caché de cotizaciones con get_stock_data
+        stock = YahooFinanceService.get_stock_data(hit['symbol'] if hit else query)
+        if not stock and hit is None:
+            matches = index.search(query, limit=1)
+            hit = matches[0] if matches else None
+            if hit:
+                stock = YahooFinanceService.get_stock_data(hit['symbol'])
+        
+        if stock and hit:
+            stock = dict(stock)
+            if stock.get('name') in (None, '', stock.get('symbol')):
+                stock['name'] = hit['name']
+            stock['exchange'] = hit['exchange']
+            stock['assetClass'] = hit['assetClass']
+        return stock
+    
+    @staticmethod
+    def history_to_records(hist, fields=HISTORY_FIELDS, intraday=False):
+        """
+        Convierte un DataFrame OHLCV de yfinance en la lista de dicts que consumen las vistas.
+        
+        Trabaja por columnas: el redondeo y el formato de fecha se hacen una vez por
+        columna y las filas se arman zipeando arrays, en lugar de iterar con iterrows.
+        Las filas con valores faltantes se descartan. Con intraday=True la fecha
+        incluye hora y minuto (YYYY-MM-DDTHH:MM).
+        """
+        if hist is None or hist.empty:
+            return []
+        
+        columns = [HISTORY_COLUMNS[field] for field in fields]
+        frame = hist[columns].dropna()
+        if frame.empty:
+            return []
+        
+        # Fecha local del mercado formateada como YYYY-MM-DD sin pasar por strftime
+        index = frame.index
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        unit = 'datetime64[m]' if intraday else 'datetime64[D]'
+        values = [index.to_numpy(dtype=unit).astype(str).tolist()]
+        for field, column in zip(fields, columns):
+            if field == 'volume':
+                values.append(frame[column].to_numpy(dtype='int64').tolist())
+            else:
+                values.append(frame[column].to_numpy(dtype='float64').round(2).tolist())
+        
+        keys = ('date',) + tuple(fields)
+        return [dict(zip(keys, row)) for row in zip(*values)]
     
     @staticmethod
     def get_historical_data(symbol):
         """Obtiene datos históricos de 1 año para una acción"""
         try:
-            ticker = yf.Ticker(symbol.upper())
-            
-            # Obtener histórico de 1 año
-            hist = ticker.history(period='1y')
-            
-            if hist.empty:
-                logger.warning(f"No hay datos históricos para {symbol}")
-                return []
-            
-            historical_data = []
-            for date, row in hist.iterrows():
-                try:
-                    historical_data.append({
-                        'date': date.strftime('%Y-%m-%d'),
-                        'close': round(float(row['Close']), 2),
-                        'open': round(float(row['Open']), 2),
-                        'high': round(float(row['High']), 2),
-                        'low': round(float(row['Low']), 2),
-                        'volume': int(row['Volume'])
-                    })
-                except Exception as e:
-                    logger.warning(f"Error procesando fila histórica para {symbol}: {str(e)}")
-                    continue
-            
-            logger.info(f"Histórico obtenido para {symbol}: {len(historical_data)} días")
-            return historical_data
+            # Histórico desde el almacén local: solo se piden a Yahoo las barras nuevas
+            historical_data = PriceHistoryService.get_last_year(symbol)
+        except Exception as e:
+            logger.warning(f"Almacén de histórico no disponible para {symbol}, consultando Yahoo: {str(e)}")
+            historical_data = YahooFinanceService._fetch_historical_data(symbol)
+        
+        if not historical_data:
+            logger.warning(f"No hay datos históricos para {symbol}")
+            return []
+        
+        logger.info(f"Histórico obtenido para {symbol}: {len(historical_data)} días")
+        return historical_data
+    
+    @staticmethod
+    def check_history_range(period, interval):
+        """Lanza ValueError si el periodo o el intervalo no existen o Yahoo no da esa combinación"""
+        if period not in HISTORY_PERIODS:
+            raise ValueError(f"Periodo inválido: {period}")
+        if interval not in HISTORY_INTERVALS:
+            raise ValueError(f"Intervalo inválido: {interval}")
+        max_days = INTRADAY_MAX_DAYS.get(interval)
+        if max_days is None:
+            return
+        days = HISTORY_PERIODS[period]
+        if period == 'ytd':
+            days = (date.today() - date(date.today().year, 1, 1)).days + 1
+        if days is None or days > max_days:
+            raise ValueError(
+                f"El intervalo {interval} solo está disponible para los últimos {max_days} días; "
+                f"use un periodo más corto o un intervalo mayor"
+            )
+    
+    @staticmethod
+    def get_history(symbol, period='1y', interval='1d', max_points=None, method='ohlc'):
+        """
+        Obtiene el histórico para cualquier periodo e intervalo, reducido a max_points.
+        
+        Los intervalos diarios, semanales y mensuales salen del almacén local de barras
+        diarias; los intradía se piden a Yahoo y se cachean brevemente. Si la serie
+        supera max_points se agrega en cubetas OHLC (method='ohlc') o se seleccionan
+        puntos con LTTB (method='lttb').
+        """
+        YahooFinanceService.check_history_range(period, interval)
+        if method not in DOWNSAMPLE_METHODS:
+            raise ValueError(f"Método de reducción inválido: {method}")
+        
+        symbol = symbol.upper()
+        if interval in ('1d', '1wk', '1mo'):
+            days = HISTORY_PERIODS[period]
+            if period == 'ytd':
+                start = date(date.today().year, 1, 1)
+            elif days is None:
+                start = None
+            else:
+                start = date.today() - timedelta(days=days)
+            try:
+                records = PriceHistoryService.get_daily_history(symbol, start=start)
+            except Exception as e:
+                logger.warning(f"Almacén de histórico no disponible para {symbol}, consultando Yahoo: {str(e)}")
+                records = YahooFinanceService._fetch_historical_data(symbol, period=period)
+            records = resample(records, interval)
+        else:
+            records = quote_cache.get_or_set(
+                f"history:{symbol}:{period}:{interval}",
+                lambda: upstream_flight.do(
+                    SingleFlight.make_key('history', symbol, {'period': period, 'interval': interval}),
+                    lambda: YahooFinanceService._fetch_historical_data(symbol, period=period, interval=interval),
+                    shared=True,
+                ) or None,
+                ttl=getattr(settings, 'INTRADAY_HISTORY_CACHE_TTL', 60),
+            ) or []
+        
+        return DOWNSAMPLE_METHODS[method](records, max_points)
+    
+    @staticmethod
+    def _fetch_historical_data(symbol, period='1y', interval='1d'):
+        """Descarga el histórico directamente de Yahoo Finance"""
+        try:
+            ticker = yahoo_pool.ticker(symbol.upper())
+            hist = yahoo_guard.call(lambda: ticker.history(period=period, interval=interval))
+            return YahooFinanceService.history_to_records(
+                hist, intraday=interval not in ('1d', '5d', '1wk', '1mo', '3mo')
+            )
         except Exception as e:
             logger.error(f"Error obteniendo histórico para {symbol}: {str(e)}")
             return []
     
     @staticmethod
     def get_stock_detail(symbol):
-        """Obtiene información detallada de una acción incluyendo histórico"""
+        """
+        Obtiene información detallada de una acción incluyendo histórico.
+        
+        El detalle se arma con tres componentes cacheados por separado:
+        - cotización (get_quotes): segundos, según QUOTE_CACHE_TTLS
+        - fundamentales (ticker.info): horas, FUNDAMENTALS_CACHE_TTL
+        - histórico de 1 año (almacén de barras diarias): DETAIL_HISTORY_CACHE_TTL
+        Los componentes que faltan se piden en paralelo; con la caché caliente
+        una vista de detalle cuesta a lo sumo una consulta de cotización.
+        """
+        symbol = symbol.upper()
+        quote, fundamentals, historical_data = yahoo_pool.run_all([
+            lambda: YahooFinanceService._detail_component('cotización', symbol, YahooFinanceService.get_quotes, [symbol]),
+            lambda: YahooFinanceService._detail_component('fundamentales', symbol, YahooFinanceService.get_fundamentals, symbol),
+            lambda: YahooFinanceService._detail_component('histórico', symbol, YahooFinanceService.get_detail_history, symbol),
+        ])
+        return YahooFinanceService._build_detail(
+            symbol, (quote or {}).get(symbol), fundamentals, historical_data or []
+        )
+    
+    @staticmethod
+    def _detail_component(name, symbol, loader, *args):
+        """Carga un componente del detalle; si falla retorna None y el detalle queda parcial"""
         try:
-            ticker = yf.Ticker(symbol.upper())
-            info = ticker.info
-            
-            # Función auxiliar para convertir a número seguro
-            def safe_number(val, decimals=2, default='N/A'):
-                try:
-                    if val is None:
-                        return default
-                    num = float(val)
-                    return round(num, decimals)
-                except (TypeError, ValueError):
-                    return default
-            
-            # Obtener precio actual
-            current_price = safe_number(info.get('currentPrice') or info.get('regularMarketPrice'))
-            
-            # Si no hay precio, intentar obtenerlo del histórico
-            if current_price == 'N/A':
-                try:
-                    hist = ticker.history(period='1d')
-                    if not hist.empty:
-                        price_val = float(hist['Close'].iloc[-1])
-                        current_price = round(price_val, 2)
-                except:
-                    pass
-            
-            # Obtener datos históricos para gráficas
-            historical_data = []
-            try:
-                hist = ticker.history(period='1y')
-                if not hist.empty:
-                    for date, row in hist.iterrows():
-                        try:
-                            historical_data.append({
-                                'date': date.strftime('%Y-%m-%d'),
-                                'close': round(float(row['Close']), 2),
-                                'high': round(float(row['High']), 2),
-                                'low': round(float(row['Low']), 2),
-                                'volume': int(row['Volume'])
-                            })
-                        except:
-                            continue
-            except Exception as e:
-                logger.warning(f"No se pudo obtener histórico para {symbol}: {str(e)}")
-            
-            # Calcular cambio
-            previous_close = safe_number(info.get('previousClose') or info.get('regularMarketPreviousClose'))
-            
-            if isinstance(current_price, (int, float)) and isinstance(previous_close, (int, float)):
-                change = round(current_price - previous_close, 2)
+            return loader(*args)
+        except Exception as e:
+            logger.warning(f"No se pudo obtener {name} de {symbol}: {str(e)}")
+            return None
+    
+    @staticmethod
+    def get_fundamentals(symbol):
+        """
+        Datos que cambian poco (sector, industria, descripción, beta, P/E, dividendos),
+        en caché FUNDAMENTALS_CACHE_TTL segundos y servibles vencidos hasta
+        FUNDAMENTALS_STALE_TTL mientras se refrescan en segundo plano
+        """
+        symbol = symbol.upper()
+        return quote_cache.get_or_set(
+            f"fundamentals:{symbol}",
+            lambda: upstream_flight.do(
+                SingleFlight.make_key('fundamentals', symbol),
+                lambda: YahooFinanceService._fetch_fundamentals(symbol),
+                shared=True,
+            ),
+            ttl=getattr(settings, 'FUNDAMENTALS_CACHE_TTL', 6 * 3600),
+            stale_ttl=getattr(settings, 'FUNDAMENTALS_STALE_TTL', 24 * 3600),
+        )
+    
+    @staticmethod
+    def _fetch_fundamentals(symbol):
+        """Obtiene ticker.info de Yahoo y conserva solo los campos que usa el detalle"""
+        ticker = yahoo_pool.ticker(symbol)
+        info = yahoo_guard.call(lambda: ticker.info)
+        if not info:
+            return None
+        
+        dividend_yield = info.get('dividendYield')
+        if dividend_yield and isinstance(dividend_yield, (int, float)):
+            dividend_yield = round(dividend_yield * 100, 2)
+        else:
+            dividend_yield = 'N/A'
+        
+        return {
+            'name': info.get('longName') or info.get('shortName') or symbol,
+            'sector': info.get('sector') or 'N/A',
+            'industry': info.get('industry') or 'N/A',
+            'avgVolume': info.get('averageVolume') or 'N/A',
+            'beta': safe_number(info.get('beta')),
+            'pe': safe_number(info.get('trailingPE')),
+            'dividend': safe_number(info.get('dividendRate')),
+            'dividendYield': dividend_yield,
+            '52WeekHigh': safe_number(info.get('fiftyTwoWeekHigh')),
+            '52WeekLow': safe_number(info.get('fiftyTwoWeekLow')),
+            'description': info.get('longBusinessSummary') or 'No disponible',
+            'currency': info.get('currency') or 'USD',
+            # Respaldo de la cotización si el endpoint de quotes no responde
+            'price': safe_number(info.get('currentPrice') or info.get('regularMarketPrice')),
+            'previousClose': safe_number(info.get('previousClose') or info.get('regularMarketPreviousClose')),
+            'volume': info.get('volume') or 'N/A',
+            'marketCap': info.get('marketCap') or 'N/A',
+        }
+    
+    @staticmethod
+    def get_detail_history(symbol):
+        """Histórico de 1 año del detalle (almacén local), en caché DETAIL_HISTORY_CACHE_TTL segundos"""
+        symbol = symbol.upper()
+        return quote_cache.get_or_set(
+            f"detail_history:{symbol}",
+            lambda: PriceHistoryService.get_last_year(
+                symbol, fields=('close', 'high', 'low', 'volume')
+            ) or None,
+            ttl=getattr(settings, 'DETAIL_HISTORY_CACHE_TTL', 900),
+        )
+    
+    @staticmethod
+    def _build_detail(symbol, quote, fundamentals, historical_data):
+        """Arma el detalle con los componentes disponibles ('N/A' en lo que falte)"""
+        fundamentals = fundamentals or {}
+        
+        if quote:
+            price = quote['price']
+            change = quote['change']
+            change_percent = quote['changePercent']
+            volume = quote['volume'] or fundamentals.get('volume', 'N/A')
+            market_cap = quote['marketCap'] or fundamentals.get('marketCap', 'N/A')
+        else:
+            price = fundamentals.get('price', 'N/A')
+            # Sin cotización ni info: último cierre del histórico (sin otra llamada a Yahoo)
+            if price == 'N/A' and historical_data:
+                price = historical_data[-1]['close']
+            previous_close = fundamentals.get('previousClose', 'N/A')
+            if isinstance(price, (int, float)) and isinstance(previous_close, (int, float)):
+                change = round(price - previous_close, 2)
                 change_percent = round((change / previous_close * 100) if previous_close > 0 else 0, 2)
             else:
                 change = 'N/A'
                 change_percent = 'N/A'
-            
-            # Obtener dividendo yield de forma segura
-            dividend_yield = info.get('dividendYield')
-            if dividend_yield and isinstance(dividend_yield, (int, float)):
-                dividend_yield = round(dividend_yield * 100, 2)
-            else:
-                dividend_yield = 'N/A'
-            
-            return {
-                'symbol': symbol.upper(),
-                'name': info.get('longName') or info.get('shortName') or symbol.upper(),
-                'sector': info.get('sector') or 'N/A',
-                'industry': info.get('industry') or 'N/A',
-                'price': current_price,
-                'change': change,
-                'changePercent': change_percent,
-                'volume': info.get('volume') or 'N/A',
-                'avgVolume': info.get('averageVolume') or 'N/A',
-                'marketCap': info.get('marketCap') or 'N/A',
-                'beta': safe_number(info.get('beta')),
-                'pe': safe_number(info.get('trailingPE')),
-                'dividend': safe_number(info.get('dividendRate')),
-                'dividendYield': dividend_yield,
-                '52WeekHigh': safe_number(info.get('fiftyTwoWeekHigh')),
-                '52WeekLow': safe_number(info.get('fiftyTwoWeekLow')),
-                'description': info.get('longBusinessSummary') or 'No disponible',
-                'currency': info.get('currency') or 'USD',
-                'historicalData': historical_data[-365:] if historical_data else [],
-                'lastUpdate': datetime.now().isoformat()
-            }
-        except Exception as e:
-            logger.error(f"Error obteniendo detalles de {symbol}: {str(e)}")
-            # Retornar datos parciales
-            return {
-                'symbol': symbol.upper(),
-                'name': symbol.upper(),
-                'sector': 'N/A',
-                'industry': 'N/A',
-                'price': 'N/A',
-                'change': 'N/A',
-                'changePercent': 'N/A',
-                'volume': 'N/A',
-                'avgVolume': 'N/A',
-                'marketCap': 'N/A',
-                'beta': 'N/A',
-                'pe': 'N/A',
-                'dividend': 'N/A',
-                'dividendYield': 'N/A',
-                '52WeekHigh': 'N/A',
-                '52WeekLow': 'N/A',
-                'description': f'No se pudo cargar información para {symbol}',
-                'currency': 'USD',
-                'historicalData': [],
-                'lastUpdate': datetime.now().isoformat()
-            }
+            volume = fundamentals.get('volume', 'N/A')
+            market_cap = fundamentals.get('marketCap', 'N/A')
+        
+        if fundamentals:
+            description = fundamentals['description']
+        else:
+            description = f'No se pudo cargar información para {symbol}'
+        
+        return {
+            'symbol': symbol,
+            'name': fundamentals.get('name') or (quote or {}).get('name') or symbol,
+            'sector': fundamentals.get('sector', 'N/A'),
+            'industry': fundamentals.get('industry', 'N/A'),
+            'price': price,
+            'change': change,
+            'changePercent': change_percent,
+            'volume': volume,
+            'avgVolume': fundamentals.get('avgVolume', 'N/A'),
+            'marketCap': market_cap,
+            'beta': fundamentals.get('beta', 'N/A'),
+            'pe': fundamentals.get('pe', 'N/A'),
+            'dividend': fundamentals.get('dividend', 'N/A'),
+            'dividendYield': fundamentals.get('dividendYield', 'N/A'),
+            '52WeekHigh': fundamentals.get('52WeekHigh', 'N/A'),
+            '52WeekLow': fundamentals.get('52WeekLow', 'N/A'),
+            'description': description,
+            'currency': fundamentals.get('currency') or (quote or {}).get('currency') or 'USD',
+            'historicalData': historical_data[-365:],
+            'lastUpdate': datetime.now().isoformat()
+        }